@@ -0,0 +1,94 @@
+"""
+RLC Cloud Repos - cloud-init Config Module
+
+Runs the repo configuration inside cloud-init instead of as a bootcmd
+subprocess: no second interpreter is started and the provider, region and
+instance id come straight from the datasource cloud-init already holds,
+so `cloud-init query` is never forked.
+
+cloud-init only runs modules listed in its configuration. Add the module
+to `cloud_init_modules` in /etc/cloud/cloud.cfg, ahead of `bootcmd`:
+
+    cloud_init_modules:
+      - rlc_cloud_repos
+      - bootcmd
+      ...
+
+Options for the run can be given as command line arguments:
+
+    rlc_cloud_repos:
+      args: [--background, --revalidate, --probe]
+
+The bootcmd entry in 20_rlc-cloud-repos.cfg stays as the fallback for
+images that don't list the module; it is skipped on boots where the
+module already ran.
+"""
+
+import logging
+from pathlib import Path
+from typing import Any, Dict, List
+
+from rlc.cloud_repos.main import configure, parse_args
+
+try:
+    from cloudinit.settings import PER_ALWAYS
+except ImportError:  # pragma: no cover - only imported by cloud-init
+    PER_ALWAYS = "always"
+
+# Written on each boot the module runs; the bootcmd fallback checks it
+RAN_MARKER = "/run/rlc-cloud-repos/cloud-init-module"
+DEFAULT_ARGS = ["--background", "--revalidate"]
+
+meta = {
+    "id": "cc_rlc_cloud_repos",
+    "distros": ["all"],
+    "frequency": PER_ALWAYS,
+    "activate_by_schema_keys": [],
+}
+frequency = PER_ALWAYS
+
+logger = logging.getLogger(__name__)
+
+
+def datasource_metadata(cloud) -> Dict[str, str]:
+    """
+    Reads provider, region, instance id and zone from cloud-init's datasource.
+
+    Args:
+        cloud: cloud-init's Cloud object passed to handle().
+
+    Returns:
+        dict[str, str]: Keys 'provider', 'region', 'instance_id' and 'zone'
+    """
+    datasource = cloud.datasource
+    return {
+        "provider": datasource.cloud_name or "",
+        "region": getattr(datasource, "region", None) or "",
+        "instance_id": cloud.get_instance_id() or "",
+        # Free here, unlike from the command line; used by the cost model
+        "zone": getattr(datasource, "availability_zone", None) or "",
+    }
+
+
+def handle(name: str, cfg: Dict[str, Any], cloud, args: List[str]) -> None:
+    """
+    cloud-init entry point.
+
+    Args:
+        name (str): Module name as configured.
+        cfg (dict): Merged cloud-init configuration.
+        cloud: cloud-init's Cloud object.
+        args (list): Extra arguments from the module list entry.
+    """
+    module_cfg = cfg.get("rlc_cloud_repos") or {}
+    parsed_args = parse_args([str(arg) for arg in module_cfg.get("args", DEFAULT_ARGS)])
+
+    marker = Path(RAN_MARKER)
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    marker.touch()
+
+    metadata = datasource_metadata(cloud)
+    logger.debug("%s: datasource metadata %s", name, metadata)
+    if configure(parsed_args, metadata) != 0:
+        # cloud-init reports the module as failed, the boot carries on
+        raise RuntimeError("RLC repo configuration failed")
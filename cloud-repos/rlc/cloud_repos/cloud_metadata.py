@@ -2,34 +2,117 @@
 """
 RLC Cloud Repos - Cloud Metadata Detection
 
-Extracts normalized cloud provider and region from cloud-init query.
+Extracts normalized cloud provider and region. The provider is read from
+the DMI identifiers in sysfs when they identify a known cloud, so
+cloud-init only has to be asked for the region.
 """
 
 import logging
 import subprocess
-from typing import Dict
+from pathlib import Path
+from typing import Dict, Tuple
+
+# cloud-init caches the instance id here; machine-id is the fallback
+INSTANCE_ID_PATHS = ("/var/lib/cloud/data/instance-id", "/etc/machine-id")
+# A wedged cloud-init must not hang the boot forever
+CLOUD_INIT_TIMEOUT = 30
+DMI_ID_PATH = "/sys/class/dmi/id"
+# Azure sets this fixed chassis asset tag on every VM
+AZURE_ASSET_TAG = "7783-7084-3265-9085-8269-3286-77"
+# (DMI file, value, exact match, provider), checked in order
+DMI_SIGNATURES: Tuple[Tuple[str, str, bool, str], ...] = (
+    ("sys_vendor", "Amazon EC2", True, "aws"),
+    ("chassis_asset_tag", AZURE_ASSET_TAG, True, "azure"),
+    ("sys_vendor", "Google", False, "gcp"),
+    ("product_name", "Google Compute Engine", True, "gcp"),
+    ("chassis_asset_tag", "OracleCloud.com", True, "oracle"),
+)
+# cloud-init's names for clouds whose mirror map section is named otherwise
+PROVIDER_ALIASES = {"gce": "gcp", "ec2": "aws", "oci": "oracle"}
 
 logger = logging.getLogger(__name__)
 
 
+def get_instance_id() -> str:
+    """
+    Reads a stable identifier for this instance without querying cloud-init.
+
+    Returns:
+        str: The instance id, or an empty string if none is available.
+    """
+    for path in INSTANCE_ID_PATHS:
+        try:
+            instance_id = Path(path).read_text().strip()
+        except OSError:
+            continue
+        if instance_id:
+            return instance_id
+    return ""
+
+
+def normalize_provider(provider: str) -> str:
+    """
+    Maps a provider name to the one used by the mirror map and IP indexes.
+
+    Returns:
+        str: Lower-case provider name, e.g. 'gcp' for cloud-init's 'gce'.
+    """
+    provider = provider.strip().lower()
+    return PROVIDER_ALIASES.get(provider, provider)
+
+
+def get_dmi_provider() -> str:
+    """
+    Identifies the cloud provider from the DMI identifiers in sysfs.
+
+    Returns:
+        str: 'aws', 'azure', 'gcp' or 'oracle', or an empty string if the
+        DMI data is missing or doesn't match a known cloud.
+    """
+    values: Dict[str, str] = {}
+    for name, expected, exact, provider in DMI_SIGNATURES:
+        if name not in values:
+            try:
+                values[name] = (Path(DMI_ID_PATH) / name).read_text().strip()
+            except OSError:
+                values[name] = ""
+        value = values[name]
+        if value == expected if exact else value.startswith(expected):
+            logger.debug("DMI %s=%r identifies %s", name, value, provider)
+            return provider
+    return ""
+
+
 def get_cloud_metadata() -> Dict[str, str]:
     """
-    Detects the cloud environment using cloud-init's query tool.
+    Detects the cloud environment from DMI data and cloud-init's query tool.
+
+    cloud-init is only asked for the provider when the DMI data doesn't
+    identify it.
 
     Returns:
-        dict[str, str]: Dictionary with keys 'provider' and 'region'
+        dict[str, str]: Dictionary with keys 'provider', 'region' and
+        'instance_id'
 
     Raises:
-        RuntimeError: If cloud-init query fails.
+        RuntimeError: If cloud-init query fails or times out.
     """
     try:
-        provider = subprocess.check_output(
-            ["cloud-init", "query", "cloud_name"], text=True
-        ).strip()
+        provider = get_dmi_provider()
+        if not provider:
+            provider = subprocess.check_output(
+                ["cloud-init", "query", "cloud_name"],
+                text=True,
+                timeout=CLOUD_INIT_TIMEOUT,
+            ).strip()
         region = subprocess.check_output(
-            ["cloud-init", "query", "region"], text=True
+            ["cloud-init", "query", "region"], text=True, timeout=CLOUD_INIT_TIMEOUT
         ).strip()
-        return {"provider": provider, "region": region}
-    except subprocess.CalledProcessError as e:
+        return {
+            "provider": normalize_provider(provider),
+            "region": region,
+            "instance_id": get_instance_id(),
+        }
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
         logger.error("Failed to query cloud-init: %s", e)
         raise RuntimeError("cloud-init must be available and functional")
@@ -0,0 +1,121 @@
+"""
+RLC Cloud Repos - Egress Cost Model
+
+Providers bill traffic differently depending on where it goes. The map's
+`default` entry can describe egress prices per provider (USD per GB) for
+four tiers, and where mirrors live:
+
+    default:
+      egress:
+        aws: {same_zone: 0.0, same_region: 0.01, cross_region: 0.02,
+              internet: 0.09}
+      locations:
+        https://depot.us-east-1.prod.ciqws.com: {provider: aws,
+                                                  region: us-east-1}
+
+A mirror's tier follows from its location relative to the instance:
+`same_zone` needs both zones known and equal, `same_region` and
+`cross_region` need the same provider, and everything else, including
+mirrors without a location, is `internet`.
+
+With `--cost-weight W` candidates are ranked by
+W * cost + (1 - W) * latency, both scaled to the most expensive and slowest
+candidate. Latency is measured with `--probe` and modeled from the tier
+otherwise. Mirrors the map has no price for are never taken for free: they
+count as the most expensive candidate.
+"""
+
+from typing import Any, Dict, List, Optional
+
+TIERS = ("same_zone", "same_region", "cross_region", "internet")
+# Typical round trips per tier, used when latency isn't measured
+MODELED_LATENCY = {
+    "same_zone": 0.001,
+    "same_region": 0.002,
+    "cross_region": 0.06,
+    "internet": 0.1,
+}
+
+
+def tier(metadata: Dict[str, str], mirror_map: Dict[str, Any], url: str) -> str:
+    """
+    Classifies the network path from the instance to a mirror.
+
+    Returns:
+        str: One of TIERS.
+    """
+    locations = (mirror_map.get("default") or {}).get("locations") or {}
+    location = locations.get(url) or {}
+    provider = (location.get("provider") or "").lower()
+    if not provider or provider != metadata["provider"].lower():
+        return "internet"
+    if location.get("region") != metadata["region"]:
+        return "cross_region"
+    zone = metadata.get("zone")
+    if zone and location.get("zone") == zone:
+        return "same_zone"
+    return "same_region"
+
+
+def cost_per_gb(
+    metadata: Dict[str, str], mirror_map: Dict[str, Any], url: str
+) -> Optional[float]:
+    """
+    Looks up the egress price of pulling from a mirror.
+
+    Prices come from the provider's section of `default.egress`, or its
+    `default` section for tiers the provider doesn't list.
+
+    Returns:
+        Optional[float]: USD per GB, or None if the map has no price.
+    """
+    egress = (mirror_map.get("default") or {}).get("egress") or {}
+    path = tier(metadata, mirror_map, url)
+    for section in (metadata["provider"].lower(), "default"):
+        price = (egress.get(section) or {}).get(path)
+        if price is not None:
+            return float(price)
+    return None
+
+
+def rank_by_cost(
+    metadata: Dict[str, str],
+    mirror_map: Dict[str, Any],
+    urls: List[str],
+    weight: float,
+    latencies: Optional[Dict[str, Optional[float]]] = None,
+) -> List[str]:
+    """
+    Orders mirrors by a mix of egress cost and latency.
+
+    The sort is stable, so candidates that score the same keep their
+    order, and with it the pool's consistent hashing.
+
+    Args:
+        urls (List[str]): Candidates in selection order.
+        weight (float): Share of cost in the score, from 0 to 1.
+        latencies (dict): Measured latency per URL; None for mirrors that
+            did not answer, which rank last. Modeled when not given. Any
+            lower-is-better speed measure works, such as seconds per byte.
+
+    Returns:
+        List[str]: Reordered candidates.
+    """
+    prices = {url: cost_per_gb(metadata, mirror_map, url) for url in urls}
+    max_cost = max((p for p in prices.values() if p is not None), default=0.0) or 1.0
+    # Unpriced mirrors rank like the most expensive one, not like free ones
+    costs = {url: max_cost if price is None else price for url, price in prices.items()}
+    if latencies is None:
+        latencies = {
+            url: MODELED_LATENCY[tier(metadata, mirror_map, url)] for url in urls
+        }
+    answering = [url for url in urls if latencies.get(url) is not None]
+    max_latency = max((latencies[url] for url in answering), default=0.0) or 1.0
+
+    def score(url: str) -> float:
+        return weight * costs[url] / max_cost + (1 - weight) * (
+            latencies[url] / max_latency
+        )
+
+    silent = [url for url in urls if latencies.get(url) is None]
+    return sorted(answering, key=score) + silent
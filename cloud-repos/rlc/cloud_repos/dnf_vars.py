@@ -7,17 +7,33 @@ URL construction using system and cloud metadata.
 Variables Managed:
 - baseurl1: Primary mirror URL
 - baseurl2: Global fallback mirror
+- <class>_baseurl1, <class>_baseurl2: The same for each repo class in the
+  mirror map, for repos that route e.g. bulk package traffic separately
 - region: Cloud region
 """
 
 import logging
+import os
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
 BACKUP_SUFFIX = ".bak"
 
 logger = logging.getLogger(__name__)
 
 
+def _tmp_path(path: Path) -> Path:
+    # Hidden, so dnf never picks it up as a variable of its own
+    return path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+
+def _discard(path: Path) -> None:
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+
 def _write_dnf_var(basepath: Path, name: str, value: str):
     """
     Creates or updates a DNF variable file with a given value.
@@ -27,6 +43,10 @@ def _write_dnf_var(basepath: Path, name: str, value: str):
       (appending '.bak') before being overwritten.
     - If the file already contains the desired value, no action is taken.
 
+    The new value is written to a temporary file and renamed into place, so
+    a concurrent dnf run sees either the old or the new value, never a
+    missing or partially written file.
+
     Args:
         name (str): Name of the DNF variable (e.g., 'region', 'baseurl1').
         value (str): Value to set for the DNF variable.
@@ -47,29 +67,45 @@ def _write_dnf_var(basepath: Path, name: str, value: str):
         if current_value == value:
             logger.debug(f"DNF var '{name}' already set correctly.")
             return
-        # Backup
+        # Backup a copy so the variable itself never goes missing
         try:
             backup_path = path.with_suffix(path.suffix + BACKUP_SUFFIX)
-            path.rename(backup_path)
+            tmp_backup = _tmp_path(backup_path)
+            tmp_backup.write_text(f"{current_value}\n")
+            tmp_backup.rename(backup_path)
             logger.info(f"Backed up existing DNF var '{name}' to '{backup_path.name}'")
         except Exception as e:
             logger.error(f"Cannot backup DNF var '{name}' ({e}), skipping")
+            _discard(tmp_backup)
             # return
 
+    tmp_var = _tmp_path(path)
     try:
-        path.write_text(f"{value}\n")
+        tmp_var.write_text(f"{value}\n")
+        os.replace(str(tmp_var), str(path))
         logger.info(f"Wrote DNF var '{name}': {value}")
     except Exception as e:
         logger.error(f"Cannot write to DNF var '{name}' ({e}), skipping")
+        _discard(tmp_var)
 
 
-def ensure_all_dnf_vars(basepath: Path, primary_url: str, backup_url: str):
+def ensure_all_dnf_vars(
+    basepath: Path,
+    primary_url: str,
+    backup_url: str,
+    class_mirrors: Optional[Dict[str, Tuple[str, str]]] = None,
+):
     """
     Sets DNF variables for the primary and backup mirror URLs.
 
     Args:
         primary_url (str): Preferred mirror.
         backup_url (str): Fallback mirror.
+        class_mirrors (dict): (primary, backup) per repo class, written as
+            <class>_baseurl1 and <class>_baseurl2.
     """
     _write_dnf_var(basepath, "baseurl1", primary_url)
     _write_dnf_var(basepath, "baseurl2", backup_url)
+    for name, (class_primary, class_backup) in (class_mirrors or {}).items():
+        _write_dnf_var(basepath, f"{name}_baseurl1", class_primary)
+        _write_dnf_var(basepath, f"{name}_baseurl2", class_backup)
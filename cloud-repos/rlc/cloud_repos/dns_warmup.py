@@ -0,0 +1,73 @@
+"""
+RLC Cloud Repos - DNS Warm-up
+
+On a fresh instance the first dnf request also pays for a cold DNS lookup
+of the mirror hostnames. With `--warm-dns` the selected mirrors' hostnames
+are resolved (A and AAAA) concurrently right after selection, so a caching
+resolver on the instance (systemd-resolved, nscd, dnsmasq) already holds
+the answers when dnf asks. The lookups are bounded by a short budget and
+lookups still running then are abandoned.
+"""
+
+import functools
+import logging
+import socket
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from rlc.cloud_repos.probe import run_bounded
+
+DEFAULT_WARMUP_TIMEOUT = 0.5
+FAMILIES = (("A", socket.AF_INET), ("AAAA", socket.AF_INET6))
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_time(host: str, family: int) -> Optional[float]:
+    """
+    Resolves a hostname for one address family and times it.
+
+    Returns:
+        Optional[float]: Seconds the lookup took, or None if it failed.
+    """
+    start = time.monotonic()
+    try:
+        socket.getaddrinfo(host, None, family, socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        logger.debug("Warm-up lookup of %s (%s) failed: %s", host, family, e)
+        return None
+    return round(time.monotonic() - start, 6)
+
+
+def warm_up(
+    urls: List[str], timeout: float = DEFAULT_WARMUP_TIMEOUT
+) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    Resolves the hostnames of the given URLs concurrently.
+
+    Args:
+        urls (List[str]): Mirror URLs; empty ones are skipped.
+        timeout (float): Overall time budget in seconds.
+
+    Returns:
+        Dict[str, Dict[str, Optional[float]]]: Per hostname, the lookup time
+        in seconds for "A" and "AAAA" (None if it failed or didn't finish).
+    """
+    hosts = [urlparse(url).hostname for url in urls if url]
+    hosts = list(dict.fromkeys(host for host in hosts if host))
+    if not hosts or timeout <= 0:
+        return {}
+
+    results = run_bounded(
+        {
+            (host, record): functools.partial(resolve_time, host, family)
+            for host in hosts
+            for record, family in FAMILIES
+        },
+        timeout,
+    )
+    times: Dict[str, Dict[str, Optional[float]]] = {host: {} for host in hosts}
+    for (host, record), took in results.items():
+        times[host][record] = took
+    return times
@@ -0,0 +1,195 @@
+"""
+RLC Cloud Repos - Mirror Freshness
+
+A mirror in the middle of a sync serves an old `repomd.xml`, which makes
+dnf re-download metadata and retry across baseurl1/baseurl2. With
+`--freshness` the candidates' `repomd.xml` is fetched concurrently and
+mirrors lagging behind the freshest candidate by more than a window are
+steered around.
+
+A mirror's freshness is the newest of the repomd `<revision>` (when it is
+a timestamp, as createrepo writes it) and the `<timestamp>` of its data
+entries. Validators (ETag, Last-Modified) are kept so repeated checks, for
+example from the resolver daemon, are conditional requests that cost a 304
+when nothing changed.
+"""
+
+import functools
+import logging
+import threading
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Set, Tuple
+
+from rlc.cloud_repos.probe import run_bounded
+from rlc.cloud_repos.url_utils import DEFAULT_REPO_PATH, mirror_object_url
+
+# Relative to the mirror URL; $releasever and $basearch are expanded
+DEFAULT_REPOMD_PATH = f"{DEFAULT_REPO_PATH}/repodata/repomd.xml"
+DEFAULT_FRESHNESS_TIMEOUT = 1.0
+DEFAULT_FRESHNESS_WINDOW = 3600.0
+MAX_REPOMD_SIZE = 256 * 1024
+
+logger = logging.getLogger(__name__)
+
+# repomd URL -> (ETag, Last-Modified, freshness)
+_validators: Dict[str, Tuple[Optional[str], Optional[str], Optional[float]]] = {}
+_validators_lock = threading.Lock()
+
+
+def parse_repomd(document: bytes) -> Optional[float]:
+    """
+    Extracts the freshness timestamp from a repomd.xml document.
+
+    Args:
+        document (bytes): Raw repomd.xml.
+
+    Returns:
+        Optional[float]: Newest revision or data timestamp (Unix time), or
+        None if the document has neither.
+    """
+    try:
+        root = ET.fromstring(document)
+    except ET.ParseError as e:
+        logger.debug("Invalid repomd.xml: %s", e)
+        return None
+    stamps = []
+    for element in root.iter():
+        # Tags are namespaced, {http://linux.duke.edu/metadata/repo}revision
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag in ("revision", "timestamp") and element.text:
+            try:
+                stamps.append(float(element.text.strip()))
+            except ValueError:
+                continue
+    return max(stamps) if stamps else None
+
+
+def largest_data_file(document: bytes) -> Optional[str]:
+    """
+    Finds the largest metadata file a repomd.xml document lists.
+
+    Args:
+        document (bytes): Raw repomd.xml.
+
+    Returns:
+        Optional[str]: Its location, relative to the repository (e.g.
+        "repodata/<checksum>-filelists.xml.gz"), or None if no entry has
+        a size.
+    """
+    try:
+        root = ET.fromstring(document)
+    except ET.ParseError as e:
+        logger.debug("Invalid repomd.xml: %s", e)
+        return None
+    largest: Tuple[int, Optional[str]] = (0, None)
+    for data in root:
+        if data.tag.rsplit("}", 1)[-1] != "data":
+            continue
+        href = size = None
+        for child in data:
+            tag = child.tag.rsplit("}", 1)[-1]
+            if tag == "location":
+                href = child.get("href")
+            elif tag == "size" and child.text and child.text.strip().isdigit():
+                size = int(child.text)
+        if href and size and size > largest[0]:
+            largest = (size, href)
+    return largest[1]
+
+
+def fetch_freshness(
+    url: str, timeout: float = DEFAULT_FRESHNESS_TIMEOUT
+) -> Optional[float]:
+    """
+    Fetches one repomd.xml, conditionally if it was fetched before.
+
+    Args:
+        url (str): repomd.xml URL.
+        timeout (float): Socket timeout in seconds.
+
+    Returns:
+        Optional[float]: The document's freshness, or None if unknown.
+    """
+    with _validators_lock:
+        etag, modified, freshness = _validators.get(url, (None, None, None))
+    request = urllib.request.Request(url)
+    if etag:
+        request.add_header("If-None-Match", etag)
+    if modified:
+        request.add_header("If-Modified-Since", modified)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            document = response.read(MAX_REPOMD_SIZE)
+            etag = response.headers.get("ETag")
+            modified = response.headers.get("Last-Modified")
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return freshness
+        logger.debug("No repomd.xml from %s: HTTP %s", url, e.code)
+        return None
+    except (OSError, ValueError) as e:
+        logger.debug("No repomd.xml from %s: %s", url, e)
+        return None
+
+    freshness = parse_repomd(document)
+    with _validators_lock:
+        _validators[url] = (etag, modified, freshness)
+    return freshness
+
+
+def fetch_all_freshness(
+    mirror_urls: List[str],
+    path: str = DEFAULT_REPOMD_PATH,
+    timeout: float = DEFAULT_FRESHNESS_TIMEOUT,
+) -> Dict[str, Optional[float]]:
+    """
+    Fetches the freshness of several mirrors concurrently.
+
+    The whole call is bounded by roughly `timeout`; mirrors that have not
+    answered by then count as unknown.
+
+    Args:
+        mirror_urls (List[str]): Mirror base URLs.
+        path (str): repomd.xml path relative to the mirrors.
+        timeout (float): Per-request and overall time budget in seconds.
+
+    Returns:
+        Dict[str, Optional[float]]: Freshness per mirror URL (None if unknown).
+    """
+    unique = list(dict.fromkeys(mirror_urls))
+    if not unique:
+        return {}
+
+    return run_bounded(
+        {
+            url: functools.partial(
+                fetch_freshness, mirror_object_url(url, path), timeout
+            )
+            for url in unique
+        },
+        timeout,
+    )
+
+
+def stale_mirrors(
+    freshness: Dict[str, Optional[float]], window: float = DEFAULT_FRESHNESS_WINDOW
+) -> Set[str]:
+    """
+    Finds the mirrors lagging behind the freshest one by more than `window`.
+
+    Mirrors of unknown freshness are never considered stale.
+
+    Args:
+        freshness (Dict[str, Optional[float]]): Output of fetch_all_freshness().
+        window (float): Tolerated lag in seconds.
+
+    Returns:
+        Set[str]: URLs of stale mirrors.
+    """
+    known = {url: stamp for url, stamp in freshness.items() if stamp is not None}
+    if not known:
+        return set()
+    newest = max(known.values())
+    return {url for url, stamp in known.items() if newest - stamp > window}
@@ -0,0 +1,399 @@
+"""
+RLC Cloud Repos - Region Inference from Instance IP
+
+Some clouds return an empty region from cloud-init. This module maps the
+instance's public address to a provider region using a prebuilt prefix
+index generated from the providers' published IP ranges. The feeds only
+list public prefixes, so the address is asked from the provider's instance
+metadata service (IMDS); the address of the default route is only used
+when it is public itself, as the VPC address usually isn't.
+
+The index stores disjoint address intervals (most specific prefix wins) as
+sorted arrays, so a lookup is a single bisect. IPv6 prefixes are indexed on
+their upper 64 bits, which covers every routed cloud allocation.
+"""
+
+import array
+import bisect
+import ipaddress
+import json
+import logging
+import os
+import socket
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from rlc.cloud_repos.cloud_metadata import normalize_provider
+
+IP_INDEX_PATH = "/usr/share/rlc-cloud-repos/ip-prefixes.idx"
+INDEX_MAGIC = b"RLCIPX1\n"
+# Destinations used to find the source address of the default routes; no
+# packets are sent when "connecting" a UDP socket
+ROUTE_PROBES = ((socket.AF_INET, "192.0.2.1"), (socket.AF_INET6, "2001:db8::1"))
+IMDS_URL = "http://169.254.169.254"
+# Points the metadata service lookups elsewhere, e.g. at a proxy or stand-in
+IMDS_URL_ENV = "RLC_CLOUD_REPOS_IMDS_URL"
+IMDS_TIMEOUT = 1.0
+AWS_TOKEN_TTL_HEADER = "X-aws-ec2-metadata-token-ttl-seconds"
+
+logger = logging.getLogger(__name__)
+
+_loaded_indexes: Dict[str, "PrefixIndex"] = {}
+
+Interval = Tuple[int, int, int]
+
+
+def _flatten(blocks: List[Interval]) -> List[Interval]:
+    """
+    Turns nested CIDR blocks into disjoint intervals.
+
+    CIDR blocks either nest or don't overlap at all, so a stack of the
+    enclosing blocks is enough to let the innermost block win.
+
+    Args:
+        blocks (List[Interval]): (start, end, label) tuples.
+
+    Returns:
+        List[Interval]: Sorted, disjoint (start, end, label) tuples.
+    """
+    out: List[Interval] = []
+
+    def emit(start, end, label):
+        if start > end:
+            return
+        if out and out[-1][2] == label and out[-1][1] + 1 == start:
+            out[-1] = (out[-1][0], end, label)
+        else:
+            out.append((start, end, label))
+
+    stack: List[Tuple[int, int]] = []
+    cursor = 0
+    for start, end, label in sorted(blocks, key=lambda b: (b[0], b[0] - b[1])):
+        while stack and stack[-1][0] < start:
+            outer_end, outer_label = stack.pop()
+            emit(cursor, outer_end, outer_label)
+            cursor = max(cursor, outer_end + 1)
+        if stack:
+            emit(cursor, start - 1, stack[-1][1])
+        stack.append((end, label))
+        cursor = start
+    while stack:
+        outer_end, outer_label = stack.pop()
+        emit(cursor, outer_end, outer_label)
+        cursor = max(cursor, outer_end + 1)
+    return out
+
+
+class PrefixIndex:
+    """
+    Sorted interval index mapping addresses to (provider, region) labels.
+
+    Args:
+        labels (List[str]): Label table, entries are "provider/region".
+        v4 (List[Interval]): Disjoint IPv4 intervals.
+        v6 (List[Interval]): Disjoint intervals over IPv6 upper 64 bits.
+    """
+
+    def __init__(self, labels: List[str], v4: List[Interval], v6: List[Interval]):
+        self.labels = labels
+        self.v4 = tuple(
+            array.array(t, column) for t, column in zip("IIH", _columns(v4))
+        )
+        self.v6 = tuple(
+            array.array(t, column) for t, column in zip("QQH", _columns(v6))
+        )
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple[str, str, str]]) -> "PrefixIndex":
+        """
+        Builds an index from (prefix, provider, region) records.
+
+        Args:
+            records (Iterable): e.g. streamed from provider IP-range feeds.
+
+        Returns:
+            PrefixIndex: The index.
+        """
+        labels: List[str] = []
+        label_ids: Dict[str, int] = {}
+        v4, v6 = [], []
+        for prefix, provider, region in records:
+            label = f"{provider}/{region}"
+            if label not in label_ids:
+                label_ids[label] = len(labels)
+                labels.append(label)
+            network = ipaddress.ip_network(prefix, strict=False)
+            start = int(network.network_address)
+            end = int(network.broadcast_address)
+            if network.version == 4:
+                v4.append((start, end, label_ids[label]))
+            else:
+                v6.append((start >> 64, end >> 64, label_ids[label]))
+        return cls(labels, _flatten(v4), _flatten(v6))
+
+    def lookup(self, address: str) -> Optional[Tuple[str, str]]:
+        """
+        Finds the provider and region an address belongs to.
+
+        Args:
+            address (str): IPv4 or IPv6 address.
+
+        Returns:
+            Optional[Tuple[str, str]]: (provider, region), or None if the
+            address isn't in any indexed prefix.
+        """
+        ip = ipaddress.ip_address(address)
+        if ip.version == 4:
+            starts, ends, label_ids = self.v4
+            key = int(ip)
+        else:
+            starts, ends, label_ids = self.v6
+            key = int(ip) >> 64
+        position = bisect.bisect_right(starts, key) - 1
+        if position < 0 or key > ends[position]:
+            return None
+        provider, _, region = self.labels[label_ids[position]].partition("/")
+        return provider, region
+
+    def save(self, path: str) -> None:
+        """
+        Writes the index in its binary on-disk format.
+
+        Args:
+            path (str): Destination file.
+        """
+        header = {"labels": self.labels, "v4": len(self.v4[0]), "v6": len(self.v6[0])}
+        with open(path, "wb") as f:
+            f.write(INDEX_MAGIC)
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            for column in self.v4 + self.v6:
+                if sys.byteorder == "big":  # pragma: no cover
+                    column = array.array(column.typecode, column)
+                    column.byteswap()
+                column.tofile(f)
+
+    @classmethod
+    def load(cls, path: str) -> "PrefixIndex":
+        """
+        Reads an index written by save().
+
+        Args:
+            path (str): Index file.
+
+        Returns:
+            PrefixIndex: The index.
+
+        Raises:
+            ValueError: If the file is not a prefix index.
+        """
+        with open(path, "rb") as f:
+            if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError(f"{path} is not an IP prefix index")
+            header = json.loads(f.readline().decode("utf-8"))
+            index = cls(header["labels"], [], [])
+            columns = []
+            for typecode, count in zip(
+                "IIHQQH", [header["v4"]] * 3 + [header["v6"]] * 3
+            ):
+                column = array.array(typecode)
+                column.fromfile(f, count)
+                if sys.byteorder == "big":  # pragma: no cover
+                    column.byteswap()
+                columns.append(column)
+        index.v4 = tuple(columns[:3])
+        index.v6 = tuple(columns[3:])
+        return index
+
+
+def _columns(intervals: List[Interval]) -> List[List[int]]:
+    if not intervals:
+        return [[], [], []]
+    return [list(column) for column in zip(*intervals)]
+
+
+def get_instance_ips() -> List[str]:
+    """
+    Finds the source addresses this instance uses for its default routes.
+
+    Returns:
+        List[str]: IPv4 and/or IPv6 addresses, possibly empty.
+    """
+    addresses = []
+    for family, destination in ROUTE_PROBES:
+        try:
+            with socket.socket(family, socket.SOCK_DGRAM) as s:
+                s.connect((destination, 53))
+                addresses.append(s.getsockname()[0])
+        except OSError:
+            continue
+    return addresses
+
+
+def _remaining(deadline: float) -> Optional[float]:
+    timeout = deadline - time.monotonic()
+    return timeout if timeout > 0 else None
+
+
+def _imds_url() -> str:
+    return os.environ.get(IMDS_URL_ENV) or IMDS_URL
+
+
+def _imds_get(path: str, headers: Dict[str, str], deadline: float) -> Optional[str]:
+    timeout = _remaining(deadline)
+    if timeout is None:
+        return None
+    try:
+        request = urllib.request.Request(_imds_url() + path, headers=headers)
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.read().decode("utf-8").strip()
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        logger.debug("IMDS request for %s failed: %s", path, e)
+        return None
+
+
+def _aws_public_ips(deadline: float) -> List[str]:
+    timeout = _remaining(deadline)
+    if timeout is None:
+        return []
+    token_request = urllib.request.Request(
+        _imds_url() + "/latest/api/token",
+        method="PUT",
+        headers={AWS_TOKEN_TTL_HEADER: "60"},
+    )
+    try:
+        with urllib.request.urlopen(token_request, timeout=timeout) as response:
+            headers = {"X-aws-ec2-metadata-token": response.read().decode("utf-8")}
+    except (urllib.error.URLError, OSError) as e:
+        logger.debug("IMDS token request failed: %s", e)
+        return []
+    addresses = []
+    for path in ("/latest/meta-data/public-ipv4", "/latest/meta-data/ipv6"):
+        answer = _imds_get(path, headers, deadline)
+        if answer:
+            addresses.extend(answer.split())
+    return addresses
+
+
+def _azure_public_ips(deadline: float) -> List[str]:
+    answer = _imds_get(
+        "/metadata/instance/network?api-version=2021-02-01",
+        {"Metadata": "true"},
+        deadline,
+    )
+    interfaces = _json_or_none(answer) or {}
+    return [
+        address.get("publicIpAddress", "")
+        for interface in interfaces.get("interface", [])
+        for address in interface.get("ipv4", {}).get("ipAddress", [])
+    ]
+
+
+def _gcp_public_ips(deadline: float) -> List[str]:
+    answer = _imds_get(
+        "/computeMetadata/v1/instance/network-interfaces/?recursive=true",
+        {"Metadata-Flavor": "Google"},
+        deadline,
+    )
+    addresses = []
+    for interface in _json_or_none(answer) or []:
+        for config in interface.get("accessConfigs", []):
+            addresses.append(config.get("externalIp", ""))
+        for config in interface.get("ipv6AccessConfigs", []):
+            addresses.append(config.get("externalIpv6", ""))
+    return addresses
+
+
+def _json_or_none(answer: Optional[str]) -> Any:
+    try:
+        return json.loads(answer) if answer else None
+    except ValueError:
+        return None
+
+
+# OCI's metadata service doesn't report public addresses
+PUBLIC_IP_LOOKUPS = {
+    "aws": _aws_public_ips,
+    "azure": _azure_public_ips,
+    "gcp": _gcp_public_ips,
+}
+
+
+def get_public_ips(provider: str, timeout: float = IMDS_TIMEOUT) -> List[str]:
+    """
+    Finds this instance's public addresses.
+
+    They are asked from the provider's metadata service; addresses of the
+    default routes count too when they are public.
+
+    Args:
+        provider (str): Provider reported by cloud-init or DMI.
+        timeout (float): Time budget in seconds shared by all metadata
+            requests.
+
+    Returns:
+        List[str]: Public addresses, possibly empty.
+    """
+    lookup = PUBLIC_IP_LOOKUPS.get(normalize_provider(provider))
+    deadline = time.monotonic() + timeout
+    candidates = (lookup(deadline) if lookup else []) + get_instance_ips()
+    addresses = []
+    for candidate in candidates:
+        try:
+            is_global = ipaddress.ip_address(candidate.split("%")[0]).is_global
+        except ValueError:
+            continue
+        if is_global and candidate not in addresses:
+            addresses.append(candidate)
+    return addresses
+
+
+def load_index(path: Optional[str] = None) -> Optional[PrefixIndex]:
+    """
+    Loads the prefix index on first use and keeps it for later lookups.
+
+    Args:
+        path (Optional[str]): Index file, defaults to IP_INDEX_PATH.
+
+    Returns:
+        Optional[PrefixIndex]: The index, or None if it isn't installed.
+    """
+    path = path or IP_INDEX_PATH
+    if path not in _loaded_indexes:
+        try:
+            _loaded_indexes[path] = PrefixIndex.load(path)
+        except (OSError, ValueError) as e:
+            logger.debug("IP prefix index unavailable at %s: %s", path, e)
+            return None
+    return _loaded_indexes[path]
+
+
+def infer_region(
+    provider: str, addresses: Optional[List[str]] = None, path: Optional[str] = None
+) -> str:
+    """
+    Infers the region from the instance's public addresses.
+
+    Args:
+        provider (str): Provider reported by cloud-init; matches for other
+            providers are ignored unless it is empty.
+        addresses (Optional[List[str]]): Addresses to look up, defaults to
+            get_public_ips().
+        path (Optional[str]): Index file, defaults to IP_INDEX_PATH.
+
+    Returns:
+        str: The inferred region, or an empty string.
+    """
+    index = load_index(path)
+    if index is None:
+        return ""
+    provider = normalize_provider(provider)
+    if addresses is None:
+        addresses = get_public_ips(provider)
+    for address in addresses:
+        match = index.lookup(address)
+        if match and (not provider or match[0] == provider):
+            return match[1]
+    return ""
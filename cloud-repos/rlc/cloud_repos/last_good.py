@@ -0,0 +1,112 @@
+"""
+RLC Cloud Repos - Last-Known-Good Resolution
+
+Remembers the mirrors chosen by the last successful run together with the
+inputs that are cheap to check again: the instance id, the provider from
+DMI data and the mirror map file. When none of those changed, the stored
+mirrors can be applied in milliseconds and the full resolution (cloud-init,
+map, probes) only has to confirm them afterwards.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from rlc.cloud_repos.cloud_metadata import get_dmi_provider, get_instance_id
+from rlc.cloud_repos.repo_config import map_signature
+
+LAST_GOOD_PATH = "/var/lib/rlc-cloud-repos/last-good.json"
+
+ClassMirrors = Dict[str, Tuple[str, str]]
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(mirror_file_path: str) -> Dict[str, Any]:
+    """
+    Collects the resolution inputs that can be checked without cloud-init.
+
+    Args:
+        mirror_file_path (str): Mirror map in use.
+
+    Returns:
+        Dict[str, Any]: JSON-serialisable description of the inputs.
+    """
+    signature = map_signature(mirror_file_path)
+    return {
+        "instance_id": get_instance_id(),
+        "dmi_provider": get_dmi_provider(),
+        "mirror_file": os.path.abspath(mirror_file_path),
+        "mirror_file_signature": list(signature) if signature else None,
+    }
+
+
+def save(
+    inputs: Dict[str, Any],
+    metadata: Dict[str, str],
+    primary_url: str,
+    backup_url: str,
+    class_mirrors: Optional[ClassMirrors] = None,
+) -> None:
+    """
+    Records a successful resolution. Failures are logged, not raised, since
+    the resolution itself already succeeded.
+
+    Args:
+        inputs (Dict[str, Any]): fingerprint() taken for this run.
+        metadata (Dict[str, str]): Metadata the mirrors were resolved for.
+        primary_url (str): Chosen primary mirror.
+        backup_url (str): Chosen backup mirror.
+        class_mirrors (dict): Chosen (primary, backup) per repo class.
+    """
+    record = {
+        "inputs": inputs,
+        "metadata": metadata,
+        "baseurl1": primary_url,
+        "baseurl2": backup_url,
+        "classes": {name: list(urls) for name, urls in (class_mirrors or {}).items()},
+    }
+    path = Path(LAST_GOOD_PATH)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(json.dumps(record, sort_keys=True))
+        os.replace(str(tmp_path), str(path))
+    except OSError as e:
+        logger.warning("Cannot record last-known-good mirrors: %s", e)
+
+
+def load_record(inputs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Returns the last-known-good record if it was resolved from the same
+    inputs.
+
+    Args:
+        inputs (Dict[str, Any]): fingerprint() for the current run.
+
+    Returns:
+        Optional[Dict[str, Any]]: The record with "metadata", "baseurl1",
+        "baseurl2" and "classes" (a (primary, backup) tuple per repo class),
+        or None if nothing is recorded or the inputs changed.
+    """
+    try:
+        record = json.loads(Path(LAST_GOOD_PATH).read_text())
+    except (OSError, ValueError) as e:
+        logger.debug("No usable last-known-good record: %s", e)
+        return None
+    if not isinstance(record, dict) or record.get("inputs") != inputs:
+        return None
+    if not record.get("baseurl1"):
+        return None
+    record.setdefault("baseurl2", "")
+    classes = record.get("classes")
+    if not isinstance(classes, dict):
+        classes = {}
+    record["classes"] = {
+        name: (urls[0], urls[1])
+        for name, urls in classes.items()
+        if isinstance(urls, list) and len(urls) == 2
+    }
+    return record
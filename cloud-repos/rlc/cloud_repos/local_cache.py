@@ -0,0 +1,151 @@
+"""
+RLC Cloud Repos - Site-Local Cache Discovery
+
+Some sites run a caching proxy for the depot close to their instances.
+With `--local-cache` the tool looks for one before settling on the regional
+mirrors. Candidates come from three places:
+
+- a hint file, one URL per line, at CACHE_HINT_PATH; nothing shipped
+  writes it, the operator provides it, e.g. through cloud-init user data
+  (`write_files`) or a site DHCP hook of their own
+- a site list at LOCAL_CACHES_PATH mapping subnets to caches; entries
+  whose subnet holds one of this instance's addresses are candidates
+- the well-known name WELL_KNOWN_URL, resolved through the DNS search
+  domains; it only counts if it resolves to private addresses, so a
+  wildcard public record cannot pose as a site cache
+
+    # /etc/rlc-cloud-repos/local-caches.yaml
+    - subnet: 10.20.0.0/16
+      url: http://depot-cache.site-a.example:3142
+
+The candidates are checked concurrently within a short budget and the
+fastest one that answers becomes the primary mirror.
+"""
+
+import ipaddress
+import logging
+import time
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import urlparse
+
+import yaml
+
+from rlc.cloud_repos.ip_region import get_instance_ips
+from rlc.cloud_repos.private_endpoint import resolves_privately
+from rlc.cloud_repos.probe import fastest_answering, probe_mirror
+
+CACHE_HINT_PATH = "/run/rlc-cloud-repos/local-cache"
+LOCAL_CACHES_PATH = "/etc/rlc-cloud-repos/local-caches.yaml"
+WELL_KNOWN_URL = "http://rlc-depot-cache"
+DEFAULT_DISCOVERY_TIMEOUT = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+def _valid_url(url: str, source: str) -> bool:
+    """Checks that a configured cache is an http(s) URL with a host."""
+    parsed = urlparse(url) if isinstance(url, str) else None
+    if parsed and parsed.scheme in ("http", "https") and parsed.netloc:
+        return True
+    logger.warning("Ignoring local cache %r from %s: not an http(s) URL", url, source)
+    return False
+
+
+def hinted_caches(path: str = None) -> List[str]:
+    """
+    Reads cache URLs from the hint file.
+
+    Returns:
+        List[str]: URLs in file order, skipping malformed ones; empty if
+        there is no hint.
+    """
+    try:
+        text = Path(path or CACHE_HINT_PATH).read_text()
+    except OSError:
+        return []
+    lines = (line.strip() for line in text.splitlines())
+    return [
+        line
+        for line in lines
+        if line and not line.startswith("#") and _valid_url(line, "the hint file")
+    ]
+
+
+def subnet_caches(path: str = None, addresses: List[str] = None) -> List[str]:
+    """
+    Lists the caches configured for subnets this instance is on.
+
+    Args:
+        path (str): Site list, defaults to LOCAL_CACHES_PATH.
+        addresses (List[str]): Instance addresses, detected if not given.
+
+    Returns:
+        List[str]: URLs of matching, well-formed entries in file order.
+    """
+    try:
+        with open(path or LOCAL_CACHES_PATH, encoding="utf-8") as f:
+            entries = yaml.safe_load(f) or []
+    except OSError:
+        return []
+    except yaml.YAMLError as e:
+        logger.warning("Ignoring invalid local cache list: %s", e)
+        return []
+    if not isinstance(entries, list):
+        logger.warning("Ignoring local cache list: expected a list of entries")
+        return []
+
+    if addresses is None:
+        addresses = get_instance_ips()
+    instance_ips = [ipaddress.ip_address(a.split("%")[0]) for a in addresses]
+
+    caches = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            logger.warning("Ignoring invalid local cache entry %r", entry)
+            continue
+        try:
+            subnet = ipaddress.ip_network(entry["subnet"], strict=False)
+            url = entry["url"]
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning("Ignoring invalid local cache entry %r: %s", entry, e)
+            continue
+        if not _valid_url(url, "the site list"):
+            continue
+        if any(ip.version == subnet.version and ip in subnet for ip in instance_ips):
+            caches.append(url)
+    return caches
+
+
+def check_cache(url: str, timeout: float) -> Optional[float]:
+    """
+    Probes one cache candidate; the well-known name must also resolve
+    privately.
+
+    Returns:
+        Optional[float]: Probe latency in seconds, or None if unusable.
+    """
+    start = time.monotonic()
+    if url == WELL_KNOWN_URL and not resolves_privately(url):
+        return None
+    remaining = timeout - (time.monotonic() - start)
+    if remaining <= 0:
+        return None
+    return probe_mirror(url, remaining)
+
+
+def discover_local_cache(
+    timeout: float = DEFAULT_DISCOVERY_TIMEOUT,
+) -> Optional[str]:
+    """
+    Finds a site-local cache that answers.
+
+    Args:
+        timeout (float): Overall time budget in seconds.
+
+    Returns:
+        Optional[str]: The fastest answering cache, or None.
+    """
+    candidates = hinted_caches() + subnet_caches() + [WELL_KNOWN_URL]
+    logger.debug("Local cache candidates: %s", candidates)
+    return fastest_answering(candidates, check_cache, timeout)
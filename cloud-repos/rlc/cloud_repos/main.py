@@ -8,19 +8,38 @@ for optimized regional repo access.
 """
 
 import argparse
+import functools
+import hashlib
+import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
 from rlc.cloud_repos import __version__ as rlc_version
-from rlc.cloud_repos.cloud_metadata import get_cloud_metadata
+from rlc.cloud_repos import freshness, last_good, repo_config, throughput
+from rlc.cloud_repos.cloud_metadata import get_cloud_metadata, normalize_provider
+from rlc.cloud_repos.cost_model import cost_per_gb, rank_by_cost
 from rlc.cloud_repos.dnf_vars import ensure_all_dnf_vars
+from rlc.cloud_repos.dns_warmup import DEFAULT_WARMUP_TIMEOUT, warm_up
+from rlc.cloud_repos.ip_region import infer_region
+from rlc.cloud_repos.local_cache import DEFAULT_DISCOVERY_TIMEOUT, discover_local_cache
 from rlc.cloud_repos.log_utils import log_and_print, logger, setup_logging
-from rlc.cloud_repos.repo_config import load_mirror_map, select_mirror
+from rlc.cloud_repos.mirror_status import DEFAULT_STATUS_TIMEOUT, fetch_loads
+from rlc.cloud_repos.private_endpoint import DEFAULT_PRIVATE_TIMEOUT as PRIVATE_TIMEOUT
+from rlc.cloud_repos.private_endpoint import select_private_endpoint
+from rlc.cloud_repos.probe import DEFAULT_PROBE_TIMEOUT, probe_mirrors, rank_by_latency
+from rlc.cloud_repos.probe_cache import DEFAULT_CACHE_TTL, ProbeCache, cache_key
+from rlc.cloud_repos.readiness import clear_ready, mark_pending, mark_ready
+from rlc.cloud_repos.repo_config import load_mirror_map, region_entry, select_mirror
+from rlc.cloud_repos.run_report import RunReport
+from rlc.cloud_repos.single_flight import SingleFlight
 
 MARKERFILE = "/etc/rlc-cloud-repos/.configured"
 DEFAULT_MIRROR_PATH = "/usr/share/rlc-cloud-repos/ciq-mirrors.yaml"
 DNF_VARS_DIR = "/etc/dnf/vars"
+BACKGROUND_LOG = "/var/log/rlc-cloud-repos.log"
 
 
 def check_touchfile() -> bool:
@@ -47,32 +66,587 @@ def write_touchfile() -> None:
         f.write(f"Configured on {datetime.now().isoformat()}\n")
 
 
-def _configure_repos(mirror_file_path: str) -> None:
+def _probe_results(metadata, candidates, options):
     """
-    Core logic for detecting metadata, selecting mirrors, and configuring DNF vars.
+    Measures the candidates' latency, sharing probe results through the
+    fleet probe cache when one is configured.
+    """
+    probe = functools.partial(probe_mirrors, timeout=options.probe_timeout)
+    if options.probe_cache:
+        cache = ProbeCache(options.probe_cache, ttl=options.probe_cache_ttl)
+        key = cache_key(metadata["provider"], metadata["region"], candidates)
+        return cache.get_or_probe(key, candidates, probe)
+    return probe(candidates)
+
+
+def _rank_mirrors(metadata, candidates, options):
+    """
+    Reorders candidate mirrors by measured latency.
+    """
+    results = _probe_results(metadata, candidates, options)
+    if not any(latency is not None for latency in results.values()):
+        log_and_print("No mirror answered the probe, keeping map order", level="warn")
+        return candidates
+    return rank_by_latency(candidates, results)
+
+
+def _throughput_results(urls: List[str], options) -> Dict[str, Optional[float]]:
+    """
+    Measures the download speed of candidate mirrors.
+    """
+    results = throughput.probe_throughput(
+        urls,
+        options.throughput_path,
+        options.throughput_timeout,
+        options.throughput_bytes,
+        options.freshness_path,
+    )
+    if results and all(rate is None for rate in results.values()):
+        log_and_print(
+            "No mirror could be measured for throughput; is --throughput-path "
+            "or --freshness-path right?",
+            level="warning",
+        )
+    return results
+
+
+def detect_metadata(known: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Detects provider, region and instance id, inferring a missing region
+    from the instance's address.
+
+    Args:
+        known (dict): Metadata the caller already has, such as cloud-init's
+            datasource when running in-process; skips the cloud-init query.
     """
     # Detect provider + region via cloud-init query
-    metadata = get_cloud_metadata()
+    metadata = dict(known) if known else get_cloud_metadata()
+    metadata["provider"] = normalize_provider(metadata["provider"])
+    if not metadata["region"]:
+        # Some clouds don't report a region; try the instance's address
+        region = infer_region(metadata["provider"])
+        if region:
+            log_and_print(f"Inferred region {region} from instance IP")
+            metadata["region"] = region
+    return metadata
+
+
+# Private endpoint chosen per candidate list, and the site-local cache
+SiteMirrors = Tuple[Dict[Tuple[str, ...], Optional[str]], Optional[str]]
+
+
+def discover_site_mirrors(
+    metadata: Dict[str, str], mirror_map: Dict[str, Any], options
+) -> SiteMirrors:
+    """
+    Checks the private endpoints and looks for a site-local cache once for
+    the main set and every repo class, which would otherwise each repeat
+    the same checks against the same hosts.
+
+    Returns:
+        SiteMirrors: The endpoint chosen for each distinct list of private
+        candidates (None if none qualified), and the site-local cache
+        found with `--local-cache`, if any.
+    """
+    views = [mirror_map] + [
+        repo_config.class_map(mirror_map, name)
+        for name in repo_config.repo_classes(mirror_map)
+    ]
+    endpoints: Dict[Tuple[str, ...], Optional[str]] = {}
+    for view in views:
+        private = tuple(region_entry(metadata, view).get("private") or ())
+        if private and private not in endpoints:
+            endpoints[private] = select_private_endpoint(
+                list(private), options.private_timeout
+            )
+    cache = None
+    if options.local_cache:
+        cache = discover_local_cache(options.local_cache_timeout)
+    return endpoints, cache
+
+
+def resolve_mirrors(
+    metadata: Dict[str, str],
+    mirror_map: Dict[str, Any],
+    options,
+    policy: str = "latency",
+    site: Optional[SiteMirrors] = None,
+) -> Tuple[str, str]:
+    """
+    Picks the primary and backup mirrors for the given metadata.
+
+    Under the `latency` policy mirrors are ranked by latency with `--probe`;
+    under the `throughput` policy they are ranked by sustained download
+    speed with `--throughput`.
+
+    With `--mirror-status`, the load the mirrors advertise is taken into
+    account, and with `--freshness` mirrors serving outdated metadata are
+    avoided. With `--cost-weight`, every candidate is ranked by a mix of
+    egress cost and speed instead of speed alone, where speed is latency,
+    or measured throughput for `throughput` classes with `--throughput`.
+    A private endpoint that resolves privately and answers takes over as
+    primary, with the best public mirror as its backup. With
+    `--local-cache`, a site-local cache that answers goes ahead of both.
+    Both are looked up unless `site` passes in what discover_site_mirrors()
+    found.
+
+    Returns:
+        tuple[str, str]: (primary_url, backup_url)
+    """
+    if site is None:
+        site = discover_site_mirrors(metadata, mirror_map, options)
+    endpoints, cache = site
+    loads = None
+    candidates = repo_config.candidate_urls(metadata, mirror_map)
+    if options.mirror_status:
+        loads = fetch_loads(candidates, options.mirror_status_timeout)
+    if options.freshness:
+        stamps = freshness.fetch_all_freshness(
+            candidates, options.freshness_path, options.freshness_timeout
+        )
+        if stamps and all(stamp is None for stamp in stamps.values()):
+            log_and_print(
+                f"No mirror served {options.freshness_path}, freshness is not "
+                "checked; is --freshness-path right?",
+                level="warning",
+            )
+        stale = freshness.stale_mirrors(stamps, options.freshness_window)
+        if stale:
+            log_and_print(f"Avoiding stale mirrors: {', '.join(sorted(stale))}")
+            # Stale mirrors are steered around like saturated ones
+            loads = dict(loads or {})
+            loads.update((url, 1.0) for url in stale)
+    primary_url, backup_url = select_mirror(metadata, mirror_map, loads)
+    if options.cost_weight > 0:
+        # Selection order first, so equal scores keep the pool's hashing
+        pool = [u for u in dict.fromkeys([primary_url, backup_url] + candidates) if u]
+        latencies = None
+        if options.probe and policy == "latency":
+            latencies = _probe_results(metadata, pool, options)
+        elif options.throughput and policy == "throughput":
+            rates = _throughput_results(pool, options)
+            if any(rates.values()):
+                # Seconds per byte rank like latency, lower is better
+                latencies = {
+                    url: 1 / rate if rate else None for url, rate in rates.items()
+                }
+        ranked = rank_by_cost(
+            metadata, mirror_map, pool, min(options.cost_weight, 1.0), latencies
+        )
+        ranked = repo_config.shed_overloaded(ranked, loads) + [""]
+        primary_url, backup_url = ranked[0], ranked[1]
+    elif options.throughput and policy == "throughput":
+        results = _throughput_results([primary_url, backup_url], options)
+        ranked = throughput.rank_by_throughput([primary_url, backup_url], results)
+        primary_url, backup_url = repo_config.shed_overloaded(ranked, loads)[:2]
+    elif options.probe and policy == "latency":
+        ranked = _rank_mirrors(metadata, [primary_url, backup_url], options)
+        # Latency alone must not hand an overloaded mirror back its traffic
+        primary_url, backup_url = repo_config.shed_overloaded(ranked, loads)[:2]
+    private = tuple(region_entry(metadata, mirror_map).get("private") or ())
+    if private:
+        endpoint = endpoints.get(private)
+        if endpoint:
+            log_and_print(f"Using private endpoint {endpoint}")
+            primary_url, backup_url = endpoint, primary_url
+        else:
+            log_and_print("No private endpoint reachable, using public mirrors")
+    if cache:
+        log_and_print(f"Using site-local cache {cache}")
+        return cache, primary_url
+    return primary_url, backup_url
+
+
+def resolve_class_mirrors(
+    metadata: Dict[str, str],
+    mirror_map: Dict[str, Any],
+    options,
+    site: Optional[SiteMirrors] = None,
+) -> Dict[str, Tuple[str, str]]:
+    """
+    Picks the primary and backup mirrors of every repo class in the map.
+
+    Classes are resolved concurrently, each from its overlay of the map and
+    by its own policy: `latency` classes are probed like the main set with
+    `--probe`, `throughput` classes skip latency probing, since the time to
+    the first byte says little about bulk download speed, and are ranked by
+    measured throughput with `--throughput` instead. Private endpoints and
+    the site-local cache are looked up once for all classes, before they
+    are resolved, unless `site` passes them in.
+
+    Returns:
+        Dict[str, Tuple[str, str]]: (primary_url, backup_url) per class.
+    """
+    classes = repo_config.repo_classes(mirror_map)
+    if not classes:
+        return {}
+    if site is None:
+        site = discover_site_mirrors(metadata, mirror_map, options)
+
+    def resolve(name: str) -> Tuple[str, str]:
+        view = repo_config.class_map(mirror_map, name)
+        return resolve_mirrors(metadata, view, options, classes[name], site)
+
+    with ThreadPoolExecutor(max_workers=len(classes)) as pool:
+        return dict(zip(classes, pool.map(resolve, classes)))
+
+
+# Options that don't change what a run resolves and writes
+_UNKEYED_OPTIONS = ("background", "report")
+
+
+def _flight_key(
+    mirror_file_path: str, options, metadata: Optional[Dict[str, str]]
+) -> str:
+    """
+    Hashes the effective arguments of a run: a concurrent run's result is
+    only reused by runs that would have resolved the same way.
+    """
+    arguments = {
+        name: value
+        for name, value in sorted(vars(options).items())
+        if name not in _UNKEYED_OPTIONS
+    }
+    arguments["mirror_file"] = os.path.abspath(mirror_file_path)
+    arguments["metadata"] = metadata
+    encoded = json.dumps(arguments, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def _configure_repos(
+    mirror_file_path: str, options=None, metadata: Optional[Dict[str, str]] = None
+) -> Optional[Tuple[str, str]]:
+    """
+    Core logic for detecting metadata, selecting mirrors, and configuring DNF vars.
+
+    Concurrent runs are coordinated so that only one resolves; the others
+    wait for it and, if their arguments match, keep the vars it wrote.
+
+    Returns:
+        Optional[Tuple[str, str]]: (primary_url, backup_url) written, or None
+        if a concurrent run did the work.
+    """
+    options = options or parse_args([])
+    report = RunReport()
+    try:
+        key = _flight_key(mirror_file_path, options, metadata)
+        with SingleFlight(key=key) as flight:
+            if flight.shared:
+                log_and_print("Repos were configured by a concurrent run, reusing it")
+                # The run that did the work reports it
+                report = None
+                return None
+            mirrors = _resolve_and_write(mirror_file_path, options, report, metadata)
+            flight.complete()
+        report.fields["ok"] = True
+        return mirrors
+    except Exception as e:
+        report.fields["error"] = str(e)
+        raise
+    finally:
+        if report and options.report:
+            report.append_to(options.report)
+
+
+def configure_repos(
+    mirror_file_path: str, options, metadata: Optional[Dict[str, str]] = None
+) -> Optional[Tuple[str, str]]:
+    """
+    Resolves the mirrors and writes the DNF vars right away, for callers
+    that decide on their own when to, such as rlc-cloud-repos-reevaluate.
+    The marker file and the background and revalidation modes don't apply.
+
+    Args:
+        mirror_file_path (str): Mirror map to use.
+        options: Namespace with the resolution options, see
+            add_resolution_args().
+        metadata (dict): Provider, region and instance id if already known;
+            detected otherwise.
+
+    Returns:
+        Optional[Tuple[str, str]]: (primary_url, backup_url) written, or None
+        if a concurrent run did the work.
+    """
+    return _configure_repos(mirror_file_path, options, metadata)
+
+
+def _fallbacks(
+    metadata: Dict[str, str], mirror_map: Dict[str, Any], primary_url: str
+) -> List[str]:
+    """
+    Lists how a resolution departed from the straightforward path, see
+    run_report for the flags.
+    """
+    fallbacks = []
+    provider_map = mirror_map.get(metadata["provider"].lower())
+    if not metadata["region"]:
+        fallbacks.append("region_unknown")
+    if not provider_map:
+        fallbacks.append("provider_default")
+    elif metadata["region"] not in provider_map:
+        fallbacks.append("region_default")
+    entry = region_entry(metadata, mirror_map) or mirror_map.get("default") or {}
+    if entry.get("backup") and primary_url == entry["backup"]:
+        fallbacks.append("backup_promoted")
+    return fallbacks
+
+
+def _resolve_and_write(
+    mirror_file_path: str,
+    options,
+    report: RunReport,
+    known: Optional[Dict[str, str]] = None,
+) -> Tuple[str, str]:
+    """
+    Detects metadata, selects mirrors and writes the DNF vars and marker.
+
+    Returns:
+        Tuple[str, str]: (primary_url, backup_url)
+    """
+    inputs = last_good.fingerprint(mirror_file_path)
+
+    with report.phase("detect"):
+        metadata = detect_metadata(known)
     provider = metadata["provider"]
     region = metadata["region"]
+    report.fields.update(provider=provider, region=region)
     log_and_print(f"Using cloud metadata: provider={provider}, region={region}")
 
     # Load mirror map + resolve appropriate URL
-    mirror_map = load_mirror_map(mirror_file_path)
+    with report.phase("load_map"):
+        mirror_map = load_mirror_map(mirror_file_path, provider)
     log_and_print(f"Loaded mirror map from {mirror_file_path}")
 
-    primary_url, backup_url = select_mirror(
-        {"provider": provider, "region": region}, mirror_map
-    )
+    with report.phase("resolve"):
+        site = discover_site_mirrors(metadata, mirror_map, options)
+        primary_url, backup_url = resolve_mirrors(
+            metadata, mirror_map, options, repo_config.main_policy(mirror_map), site
+        )
+        class_mirrors = resolve_class_mirrors(metadata, mirror_map, options, site)
+    report.fields.update(mirror=primary_url, backup=backup_url)
+    cost = cost_per_gb(metadata, mirror_map, primary_url)
+    if cost is not None:
+        report.fields["cost_per_gb"] = cost
+    if class_mirrors:
+        report.fields["classes"] = {
+            name: {"mirror": urls[0], "backup": urls[1]}
+            for name, urls in class_mirrors.items()
+        }
+    report.fallbacks = _fallbacks(metadata, mirror_map, primary_url)
     log_and_print(f"Selected mirror URL: {primary_url}")
 
     # Set DNF vars
-    ensure_all_dnf_vars(DNF_VARS_DIR, primary_url, backup_url)
+    with report.phase("write"):
+        ensure_all_dnf_vars(DNF_VARS_DIR, primary_url, backup_url, class_mirrors)
     logger.info("DNF vars set for mirror=%s and backup=%s", primary_url, backup_url)
+    if options.warm_dns:
+        with report.phase("warm_dns"):
+            report.fields["dns"] = warm_up(
+                [primary_url, backup_url], options.warm_dns_timeout
+            )
+    last_good.save(inputs, metadata, primary_url, backup_url, class_mirrors)
 
     # Create marker file to prevent future reruns
     write_touchfile()
     log_and_print(f"Marker file written to {MARKERFILE}")
+    return primary_url, backup_url
+
+
+def _apply_last_good(mirror_file_path: str) -> bool:
+    """
+    Writes the last-known-good mirrors if the inputs they were resolved
+    from look unchanged.
+
+    Returns:
+        bool: True if the stored mirrors were applied.
+    """
+    record = last_good.load_record(last_good.fingerprint(mirror_file_path))
+    if record is None:
+        return False
+    ensure_all_dnf_vars(
+        DNF_VARS_DIR, record["baseurl1"], record["baseurl2"], record["classes"]
+    )
+    # The vars are usable now, dnf need not wait for the revalidation
+    mark_ready(True)
+    log_and_print(f"Applied last-known-good mirror URL: {record['baseurl1']}")
+    return True
+
+
+def _run_in_background(
+    mirror_file_path: str,
+    options,
+    track: bool = True,
+    metadata: Optional[Dict[str, str]] = None,
+) -> int:
+    """
+    Forks the configuration into a detached background process.
+
+    The parent returns straight away so cloud-init can carry on booting.
+    The child publishes its outcome through the readiness files, which
+    `rlc-cloud-repos-wait` and the dnf plugin wait on, unless `track` is
+    False because usable vars are already in place.
+
+    Returns:
+        int: 0 in the parent; the child never returns.
+    """
+    if track:
+        # Waiters must always see an outcome or a live pending run, so
+        # this process stands in as pending until the child's PID is known
+        mark_pending(os.getpid())
+        clear_ready()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid:
+        if track:
+            mark_pending(pid)
+        log_and_print(f"Configuring repos in the background (pid {pid})")
+        return 0
+
+    # Child: detach from cloud-init's session and output streams
+    exit_code = 1
+    try:
+        os.setsid()
+        log_fd = os.open(BACKGROUND_LOG, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        devnull_fd = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull_fd, 0)
+        os.dup2(log_fd, 1)
+        os.dup2(log_fd, 2)
+        _configure_repos(mirror_file_path, options, metadata)
+        exit_code = 0
+    except Exception as e:
+        logger.error("Configuration failed: %s", e, exc_info=True)
+    finally:
+        try:
+            if track:
+                mark_ready(exit_code == 0)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+
+def add_resolution_args(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the options controlling mirror resolution, shared by every
+    front end that resolves mirrors.
+    """
+    parser.add_argument("--mirror-file", help="Override path to mirror map YAML")
+    parser.add_argument(
+        "--probe",
+        action="store_true",
+        help="Probe the candidate mirrors and prefer the fastest one",
+    )
+    parser.add_argument(
+        "--probe-timeout",
+        type=float,
+        default=DEFAULT_PROBE_TIMEOUT,
+        help="Time budget in seconds for probing mirrors",
+    )
+    parser.add_argument(
+        "--probe-cache",
+        help="Shared directory or http(s) URL for fleet-wide probe results",
+    )
+    parser.add_argument(
+        "--probe-cache-ttl",
+        type=float,
+        default=DEFAULT_CACHE_TTL,
+        help="Seconds shared probe results stay fresh",
+    )
+    parser.add_argument(
+        "--mirror-status",
+        action="store_true",
+        help="Fetch the load the mirrors advertise and steer away from busy ones",
+    )
+    parser.add_argument(
+        "--mirror-status-timeout",
+        type=float,
+        default=DEFAULT_STATUS_TIMEOUT,
+        help="Time budget in seconds for fetching mirror status",
+    )
+    parser.add_argument(
+        "--cost-weight",
+        type=float,
+        default=0.0,
+        help="Share (0-1) of egress cost against latency when ranking mirrors; "
+        "needs a cost model in the map",
+    )
+    parser.add_argument(
+        "--freshness",
+        action="store_true",
+        help="Check the mirrors' repomd.xml and avoid mirrors with stale metadata",
+    )
+    parser.add_argument(
+        "--freshness-path",
+        default=freshness.DEFAULT_REPOMD_PATH,
+        help="repomd.xml path relative to the mirrors ($releasever and "
+        "$basearch are expanded)",
+    )
+    parser.add_argument(
+        "--freshness-window",
+        type=float,
+        default=freshness.DEFAULT_FRESHNESS_WINDOW,
+        help="Seconds a mirror may lag behind the freshest one",
+    )
+    parser.add_argument(
+        "--freshness-timeout",
+        type=float,
+        default=freshness.DEFAULT_FRESHNESS_TIMEOUT,
+        help="Time budget in seconds for fetching repomd.xml",
+    )
+    parser.add_argument(
+        "--throughput",
+        action="store_true",
+        help="Rank the mirrors of throughput repo classes, and of the main set "
+        "with the throughput policy, by download speed",
+    )
+    parser.add_argument(
+        "--throughput-path",
+        default=throughput.DEFAULT_THROUGHPUT_PATH,
+        help="Large object downloaded from the mirrors, relative to them "
+        "($releasever and $basearch are expanded); defaults to the largest "
+        "file listed in the repomd.xml at --freshness-path",
+    )
+    parser.add_argument(
+        "--throughput-timeout",
+        type=float,
+        default=throughput.DEFAULT_THROUGHPUT_TIMEOUT,
+        help="Time budget in seconds for measuring throughput",
+    )
+    parser.add_argument(
+        "--throughput-bytes",
+        type=int,
+        default=throughput.DEFAULT_THROUGHPUT_BYTES,
+        help="Bytes downloaded at most for measuring throughput, over all mirrors",
+    )
+    parser.add_argument(
+        "--warm-dns",
+        action="store_true",
+        help="Resolve the selected mirrors' hostnames to warm the resolver cache",
+    )
+    parser.add_argument(
+        "--warm-dns-timeout",
+        type=float,
+        default=DEFAULT_WARMUP_TIMEOUT,
+        help="Time budget in seconds for warming up DNS",
+    )
+    parser.add_argument(
+        "--private-timeout",
+        type=float,
+        default=PRIVATE_TIMEOUT,
+        help="Time budget in seconds for checking private endpoints (0 disables)",
+    )
+    parser.add_argument(
+        "--local-cache",
+        action="store_true",
+        help="Look for a site-local caching mirror and prefer it",
+    )
+    parser.add_argument(
+        "--local-cache-timeout",
+        type=float,
+        default=DEFAULT_DISCOVERY_TIMEOUT,
+        help="Time budget in seconds for finding a site-local cache",
+    )
 
 
 def parse_args(args=None):
@@ -89,42 +663,78 @@ def parse_args(args=None):
         description="RLC Cloud Repo Resolver version %s" % rlc_version,
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
-    parser.add_argument("--mirror-file", help="Override path to mirror map YAML")
+    add_resolution_args(parser)
     parser.add_argument(
         "--force",
         action="store_true",
         help="Force reconfiguration (ignore marker file)",
     )
+    parser.add_argument(
+        "--background",
+        action="store_true",
+        help="Return immediately and finish configuration in the background",
+    )
+    parser.add_argument(
+        "--report",
+        help="Append a JSON line describing each run to this file",
+    )
+    parser.add_argument(
+        "--revalidate",
+        action="store_true",
+        help="Apply the last-known-good mirrors at once if the inputs look "
+        "unchanged, then re-resolve in the background unless already "
+        "configured; resolve again despite the marker file if they changed",
+    )
     return parser.parse_args(args)
 
 
-def main(args=None) -> int:
+def configure(parsed_args, metadata: Optional[Dict[str, str]] = None) -> int:
     """
-    Entry point for RLC cloud repo resolver. Handles argument parsing and
-    calls the core configuration logic.
+    Configures the repos as requested by parsed command line options.
 
     Args:
-        args: Command line arguments (defaults to None, which uses sys.argv[1:])
+        parsed_args: Namespace from parse_args()
+        metadata (dict): Provider, region and instance id if already known,
+            as when running inside cloud-init; detected otherwise.
 
     Returns:
         int: 0 for success, 1 for failure
     """
-    setup_logging()
-
-    parsed_args = parse_args(args)
-
+    mirror_path = parsed_args.mirror_file or DEFAULT_MIRROR_PATH
+    applied = parsed_args.revalidate and _apply_last_good(mirror_path)
     if not parsed_args.force:
-        if check_touchfile():  # Skip configuration if marker file exists
+        # Under --revalidate, a configured instance whose inputs changed,
+        # e.g. one booted from a cloned image, is resolved again
+        if (applied or not parsed_args.revalidate) and check_touchfile():
             return 0
 
-    mirror_path = parsed_args.mirror_file or DEFAULT_MIRROR_PATH
+    if applied:
+        return _run_in_background(mirror_path, parsed_args, False, metadata)
+    if parsed_args.background:
+        return _run_in_background(mirror_path, parsed_args, metadata=metadata)
+
     try:
-        _configure_repos(mirror_path)
+        _configure_repos(mirror_path, parsed_args, metadata)
         return 0
     except Exception as e:
         logger.error("Configuration failed: %s", e, exc_info=True)
         return 1
 
 
+def main(args=None) -> int:
+    """
+    Entry point for RLC cloud repo resolver. Handles argument parsing and
+    calls the core configuration logic.
+
+    Args:
+        args: Command line arguments (defaults to None, which uses sys.argv[1:])
+
+    Returns:
+        int: 0 for success, 1 for failure
+    """
+    setup_logging()
+    return configure(parse_args(args))
+
+
 if __name__ == "__main__":
     sys.exit(main(sys.argv[1:]))  # pragma: no cover.git
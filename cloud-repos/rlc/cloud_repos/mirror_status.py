@@ -0,0 +1,119 @@
+"""
+RLC Cloud Repos - Mirror Load Status
+
+Mirrors may publish a small status document next to their content,
+`<mirror>/mirror-status.json`:
+
+    {"load": 0.42, "status": "ok"}
+
+`load` is the mirror's own estimate of how busy it is, from 0 (idle) to 1
+(saturated). `status` is "ok", "degraded" or "draining"; a draining mirror
+counts as fully loaded. Unknown fields are ignored and mirrors without the
+document are treated as having no opinion, so selection works as before.
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional, Tuple
+
+from rlc.cloud_repos.probe import run_bounded
+
+STATUS_DOCUMENT = "mirror-status.json"
+DEFAULT_STATUS_TIMEOUT = 1.0
+STATUS_CACHE_TTL = 30.0
+MAX_STATUS_SIZE = 4096
+
+logger = logging.getLogger(__name__)
+
+_status_cache: Dict[str, Tuple[float, Optional[float]]] = {}
+_status_cache_lock = threading.Lock()
+
+
+def parse_status(document: Any) -> Optional[float]:
+    """
+    Extracts the advertised load from a status document.
+
+    Args:
+        document (Any): Decoded JSON document.
+
+    Returns:
+        Optional[float]: Load clamped to 0-1, or None if the document does
+        not advertise one.
+    """
+    if not isinstance(document, dict):
+        return None
+    if document.get("status") == "draining":
+        return 1.0
+    load = document.get("load")
+    if isinstance(load, bool) or not isinstance(load, (int, float)):
+        return None
+    return min(max(float(load), 0.0), 1.0)
+
+
+def fetch_load(url: str, timeout: float = DEFAULT_STATUS_TIMEOUT) -> Optional[float]:
+    """
+    Fetches the advertised load of one mirror.
+
+    Args:
+        url (str): Mirror base URL.
+        timeout (float): Socket timeout in seconds.
+
+    Returns:
+        Optional[float]: The load, or None if the mirror doesn't publish a
+        usable status document.
+    """
+    status_url = f"{url.rstrip('/')}/{STATUS_DOCUMENT}"
+    try:
+        with urllib.request.urlopen(status_url, timeout=timeout) as response:
+            document = json.loads(response.read(MAX_STATUS_SIZE).decode("utf-8"))
+    except (OSError, ValueError) as e:
+        # URLError and socket timeouts are OSErrors too
+        logger.debug("No status document from %s: %s", url, e)
+        return None
+    return parse_status(document)
+
+
+def fetch_loads(
+    urls: List[str], timeout: float = DEFAULT_STATUS_TIMEOUT
+) -> Dict[str, Optional[float]]:
+    """
+    Fetches the advertised loads of several mirrors concurrently.
+
+    Answers are cached for STATUS_CACHE_TTL seconds, and the whole call is
+    bounded by roughly `timeout`; mirrors that have not answered by then
+    count as having no status.
+
+    Args:
+        urls (List[str]): Mirror base URLs.
+        timeout (float): Per-request and overall time budget in seconds.
+
+    Returns:
+        Dict[str, Optional[float]]: Load per URL (None if unknown).
+    """
+    now = time.monotonic()
+    loads: Dict[str, Optional[float]] = {}
+    missing = []
+    with _status_cache_lock:
+        for url in dict.fromkeys(urls):
+            cached = _status_cache.get(url)
+            if cached and now - cached[0] < STATUS_CACHE_TTL:
+                loads[url] = cached[1]
+            else:
+                missing.append(url)
+    if not missing:
+        return loads
+
+    fetched = run_bounded(
+        {url: functools.partial(fetch_load, url, timeout) for url in missing}, timeout
+    )
+
+    with _status_cache_lock:
+        for url, load in fetched.items():
+            _status_cache[url] = (now, load)
+    loads.update(fetched)
+    return loads
@@ -0,0 +1,84 @@
+"""
+RLC Cloud Repos - Private Endpoint Selection
+
+VPCs with a private endpoint to the depot can reach it without leaving the
+provider's network, which is faster and avoids egress charges. A map entry
+lists such endpoints as candidates; one is only used if its name resolves
+to private addresses from this instance and it answers.
+"""
+
+import ipaddress
+import logging
+import socket
+import time
+from typing import List, Optional
+from urllib.parse import urlparse
+
+from rlc.cloud_repos.probe import fastest_answering, probe_mirror
+
+DEFAULT_PRIVATE_TIMEOUT = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+def resolves_privately(url: str) -> bool:
+    """
+    Checks that a URL's host resolves, and only to private addresses.
+
+    Args:
+        url (str): Candidate endpoint URL.
+
+    Returns:
+        bool: False if the name doesn't resolve or any address is public.
+    """
+    parsed = urlparse(url)
+    if not parsed.hostname:
+        return False
+    try:
+        infos = socket.getaddrinfo(
+            parsed.hostname, parsed.port or 443, proto=socket.IPPROTO_TCP
+        )
+    except (socket.gaierror, UnicodeError) as e:
+        logger.debug("Private endpoint %s does not resolve: %s", url, e)
+        return False
+    addresses = {info[4][0] for info in infos}
+    # Scoped IPv6 addresses carry a %zone suffix ipaddress doesn't accept
+    return bool(addresses) and all(
+        ipaddress.ip_address(address.split("%")[0]).is_private for address in addresses
+    )
+
+
+def check_private_endpoint(url: str, timeout: float) -> Optional[float]:
+    """
+    Resolves and probes one private-endpoint candidate.
+
+    Returns:
+        Optional[float]: Probe latency in seconds, or None if the candidate
+        is public, unresolvable or not answering.
+    """
+    start = time.monotonic()
+    if not resolves_privately(url):
+        return None
+    remaining = timeout - (time.monotonic() - start)
+    if remaining <= 0:
+        return None
+    return probe_mirror(url, remaining)
+
+
+def select_private_endpoint(
+    candidates: List[str], timeout: float = DEFAULT_PRIVATE_TIMEOUT
+) -> Optional[str]:
+    """
+    Picks the fastest private endpoint that resolves privately and answers.
+
+    Candidates are checked concurrently and the whole call is bounded by
+    roughly `timeout`, so a VPC without the endpoint only costs that budget.
+
+    Args:
+        candidates (List[str]): Candidate URLs from the mirror map.
+        timeout (float): Overall time budget in seconds.
+
+    Returns:
+        Optional[str]: The chosen endpoint, or None to use public mirrors.
+    """
+    return fastest_answering(candidates, check_private_endpoint, timeout)
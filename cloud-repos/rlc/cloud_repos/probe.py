@@ -0,0 +1,193 @@
+"""
+RLC Cloud Repos - Mirror Probing
+
+Measures how quickly candidate mirrors answer so they can be ranked by
+latency instead of relying on the static map order alone.
+"""
+
+import functools
+import http.client
+import logging
+import queue
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+DEFAULT_PROBE_TIMEOUT = 2.0
+MAX_PROBE_WORKERS = 8
+
+logger = logging.getLogger(__name__)
+
+
+def run_bounded(
+    calls: Dict[Hashable, Callable[[], Any]], timeout: float
+) -> Dict[Hashable, Any]:
+    """
+    Runs independent calls concurrently within an overall time budget.
+
+    The calls run on daemon threads, at most MAX_PROBE_WORKERS at a time.
+    Calls still running when the budget is spent are abandoned: unlike
+    concurrent.futures workers, which the interpreter joins at exit, they
+    don't keep the process alive either, so a stalled lookup or download
+    can't hold up the boot past the budget.
+
+    Args:
+        calls (Dict[Hashable, Callable]): Calls without arguments, by key.
+        timeout (float): Overall time budget in seconds.
+
+    Returns:
+        Dict[Hashable, Any]: Result per key; None for calls that didn't
+        finish in time or raised.
+    """
+    deadline = time.monotonic() + timeout
+    pending: "queue.Queue" = queue.Queue()
+    for item in calls.items():
+        pending.put(item)
+    results: Dict[Hashable, Any] = {}
+    finished = threading.Condition()
+
+    def worker():
+        # Calls not started by the deadline are skipped altogether
+        while time.monotonic() < deadline:
+            try:
+                key, call = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = call()
+            except Exception:
+                logger.exception("Bounded call for %s failed", key)
+                result = None
+            with finished:
+                results[key] = result
+                finished.notify_all()
+
+    for _ in range(min(len(calls), MAX_PROBE_WORKERS)):
+        threading.Thread(target=worker, daemon=True).start()
+    with finished:
+        while len(results) < len(calls):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            finished.wait(remaining)
+        return {key: results.get(key) for key in calls}
+
+
+def probe_mirror(url: str, timeout: float = DEFAULT_PROBE_TIMEOUT) -> Optional[float]:
+    """
+    Measures the time it takes a mirror to answer a HEAD request.
+
+    Client errors (4xx) still prove the mirror is up and answering, so only
+    connection failures, timeouts and server errors (5xx) count as failures.
+
+    Args:
+        url (str): Mirror base URL.
+        timeout (float): Socket timeout in seconds.
+
+    Returns:
+        Optional[float]: Seconds until the response headers arrived, or None
+        if the mirror is unreachable, unhealthy or the URL is malformed.
+    """
+    start = time.monotonic()
+    try:
+        request = urllib.request.Request(url, method="HEAD")
+        with urllib.request.urlopen(request, timeout=timeout):
+            pass
+    except urllib.error.HTTPError as e:
+        if e.code >= 500:
+            logger.debug("Probe of %s failed with HTTP %s", url, e.code)
+            return None
+    except (
+        urllib.error.URLError,
+        http.client.HTTPException,
+        socket.timeout,
+        OSError,
+        # Malformed URLs, e.g. without a scheme
+        ValueError,
+    ) as e:
+        logger.debug("Probe of %s failed: %s", url, e)
+        return None
+    return time.monotonic() - start
+
+
+def probe_mirrors(
+    urls: List[str], timeout: float = DEFAULT_PROBE_TIMEOUT
+) -> Dict[str, Optional[float]]:
+    """
+    Probes all candidate mirrors concurrently.
+
+    The whole call is bounded by roughly `timeout`; mirrors that have not
+    answered by then are reported as unreachable.
+
+    Args:
+        urls (List[str]): Mirror base URLs.
+        timeout (float): Per-probe and overall time budget in seconds.
+
+    Returns:
+        Dict[str, Optional[float]]: Latency in seconds per URL (None if failed).
+    """
+    unique = list(dict.fromkeys(urls))
+    if not unique:
+        return {}
+
+    return run_bounded(
+        {url: functools.partial(probe_mirror, url, timeout) for url in unique},
+        timeout,
+    )
+
+
+def rank_by_latency(urls: List[str], results: Dict[str, Optional[float]]) -> List[str]:
+    """
+    Orders mirrors by measured latency.
+
+    Reachable mirrors come first, fastest first. Unreachable or unprobed
+    mirrors keep their original relative order at the end so the static map
+    still decides when probing tells us nothing.
+
+    Args:
+        urls (List[str]): Candidate URLs in map order.
+        results (Dict[str, Optional[float]]): Output of probe_mirrors().
+
+    Returns:
+        List[str]: Reordered candidate URLs.
+    """
+    reachable = [url for url in urls if results.get(url) is not None]
+    unreachable = [url for url in urls if results.get(url) is None]
+    return sorted(reachable, key=lambda url: results[url]) + unreachable
+
+
+def fastest_answering(
+    candidates: List[str],
+    check: Callable[[str, float], Optional[float]],
+    timeout: float,
+) -> Optional[str]:
+    """
+    Runs `check` on all candidates concurrently and picks the fastest.
+
+    The whole call is bounded by roughly `timeout`; candidates that have not
+    answered by then are skipped.
+
+    Args:
+        candidates (List[str]): Candidate URLs in preference order.
+        check (Callable): Takes a URL and a timeout and returns the
+            candidate's latency in seconds, or None if it doesn't qualify.
+        timeout (float): Overall time budget in seconds.
+
+    Returns:
+        Optional[str]: The fastest qualifying candidate, earlier candidates
+        winning ties, or None.
+    """
+    unique = list(dict.fromkeys(candidates))
+    if not unique or timeout <= 0:
+        return None
+
+    answers = run_bounded(
+        {url: functools.partial(check, url, timeout) for url in unique}, timeout
+    )
+    results = {url: latency for url, latency in answers.items() if latency is not None}
+    if not results:
+        return None
+    return min(unique, key=lambda url: results.get(url, float("inf")))
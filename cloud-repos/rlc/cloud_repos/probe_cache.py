@@ -0,0 +1,312 @@
+"""
+RLC Cloud Repos - Shared Probe Result Cache
+
+Lets a fleet of instances share mirror probe results so that a scale-out
+event does not turn into every instance probing every mirror at once.
+
+The cache lives either in a shared directory (e.g. an NFS/EFS mount) or
+behind a small HTTP endpoint that supports GET, PUT and DELETE. Entries
+expire after a TTL which every reader shortens by a random jitter, so
+refreshes are spread out instead of happening all at the same moment. Only
+the instance holding the refresh lease probes; everyone else keeps using
+the previous rankings or waits briefly for the lease holder to publish.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import socket
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_CACHE_TTL = 900.0
+DEFAULT_CACHE_JITTER = 0.2
+DEFAULT_LEASE_TTL = 30.0
+DEFAULT_LEADER_WAIT = 5.0
+# Stale entries are still served while somebody else refreshes them,
+# but only up to this multiple of the TTL
+MAX_STALE_FACTOR = 4
+POLL_INTERVAL = 0.1
+HTTP_TIMEOUT = 2.0
+
+logger = logging.getLogger(__name__)
+
+ProbeResults = Dict[str, Optional[float]]
+
+
+def cache_key(provider: str, region: str, urls: List[str]) -> str:
+    """
+    Builds the cache key for a set of candidates.
+
+    Instances only share results when they probe the same candidates from
+    the same location.
+
+    Args:
+        provider (str): Cloud provider name.
+        region (str): Cloud region.
+        urls (List[str]): Candidate mirror URLs.
+
+    Returns:
+        str: Filesystem and URL safe cache key.
+    """
+    digest = hashlib.sha256("\n".join(urls).encode("utf-8")).hexdigest()[:16]
+    location = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{provider}-{region}")
+    return f"{location}-{digest}"
+
+
+def _lease_holder() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class _DirectoryBackend:
+    """Stores entries and leases as files in a shared directory."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads((self.path / f"{key}.json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def write(self, key: str, entry: Dict[str, Any]) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path / f".{key}.{os.getpid()}.tmp"
+        tmp_path.write_text(json.dumps(entry))
+        # Readers never see a half written entry
+        os.replace(str(tmp_path), str(self.path / f"{key}.json"))
+
+    def acquire(self, key: str, lease_ttl: float) -> bool:
+        self.path.mkdir(parents=True, exist_ok=True)
+        lease_path = self.path / f"{key}.lease"
+        for _ in range(2):
+            try:
+                fd = os.open(
+                    str(lease_path), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644
+                )
+            except FileExistsError:
+                try:
+                    expired = time.time() - lease_path.stat().st_mtime > lease_ttl
+                except OSError:
+                    continue
+                if not expired:
+                    return False
+                # The previous holder died without releasing; break its lease
+                if not self._break(lease_path, lease_ttl):
+                    return False
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(_lease_holder())
+            return True
+        return False
+
+    def _break(self, lease_path: Path, lease_ttl: float) -> bool:
+        """
+        Moves an expired lease out of the way.
+
+        Another instance may have broken the same lease and taken a new one
+        between our check and the rename, so what was moved is checked
+        again: a live lease is put back, unless yet another instance took
+        the lease meanwhile, and the break is abandoned.
+
+        Returns:
+            bool: True if the moved lease was the expired one.
+        """
+        broken_path = lease_path.with_name(f".{lease_path.name}.{os.getpid()}.broken")
+        try:
+            os.rename(str(lease_path), str(broken_path))
+        except OSError:
+            # Somebody else broke it first; compete for the new lease
+            return True
+        try:
+            expired = time.time() - broken_path.stat().st_mtime > lease_ttl
+            if not expired:
+                try:
+                    os.link(str(broken_path), str(lease_path))
+                except OSError:
+                    pass
+            return expired
+        except OSError:
+            return False
+        finally:
+            try:
+                broken_path.unlink()
+            except OSError:
+                pass
+
+    def release(self, key: str) -> None:
+        try:
+            (self.path / f"{key}.lease").unlink()
+        except OSError:
+            pass
+
+
+class _HttpBackend:
+    """
+    Stores entries and leases on an HTTP endpoint.
+
+    Leases are created with `If-None-Match: *`, so the endpoint must answer
+    412 when the lease document already exists.
+    """
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+
+    def _request(
+        self,
+        method: str,
+        name: str,
+        body: Optional[Dict[str, Any]] = None,
+        headers=None,
+    ):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(
+            f"{self.url}/{name}", data=data, method=method, headers=headers or {}
+        )
+        if data is not None:
+            request.add_header("Content-Type", "application/json")
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+            payload = response.read()
+        return json.loads(payload.decode("utf-8")) if payload else None
+
+    def read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self._request("GET", f"{key}.json")
+        except (urllib.error.URLError, OSError, ValueError):
+            return None
+
+    def write(self, key: str, entry: Dict[str, Any]) -> None:
+        self._request("PUT", f"{key}.json", entry)
+
+    def acquire(self, key: str, lease_ttl: float) -> bool:
+        lease = {"holder": _lease_holder(), "expires": time.time() + lease_ttl}
+        for _ in range(2):
+            try:
+                self._request("PUT", f"{key}.lease", lease, {"If-None-Match": "*"})
+                return True
+            except urllib.error.HTTPError as e:
+                if e.code != 412:
+                    raise
+            try:
+                current = self._request("GET", f"{key}.lease")
+            except urllib.error.HTTPError:
+                continue
+            if current is not None and float(current["expires"]) > time.time():
+                return False
+            self.release(key)
+        return False
+
+    def release(self, key: str) -> None:
+        try:
+            self._request("DELETE", f"{key}.lease")
+        except (urllib.error.URLError, OSError):
+            pass
+
+
+class ProbeCache:
+    """
+    Fleet-shared cache of mirror probe results.
+
+    Args:
+        location (str): Shared directory path or http(s) URL of the cache.
+        ttl (float): Seconds an entry is considered fresh.
+        jitter (float): Fraction of the TTL by which each reader randomly
+            shortens its view of freshness, spreading refreshes over time.
+        lease_ttl (float): Seconds after which an unreleased refresh lease
+            is considered abandoned.
+        leader_wait (float): Seconds to wait for another instance's refresh
+            when there is no usable entry at all.
+    """
+
+    def __init__(
+        self,
+        location: str,
+        ttl: float = DEFAULT_CACHE_TTL,
+        jitter: float = DEFAULT_CACHE_JITTER,
+        lease_ttl: float = DEFAULT_LEASE_TTL,
+        leader_wait: float = DEFAULT_LEADER_WAIT,
+    ):
+        if location.startswith(("http://", "https://")):
+            self.backend = _HttpBackend(location)
+        else:
+            self.backend = _DirectoryBackend(location)
+        self.ttl = ttl
+        self.jitter = jitter
+        self.lease_ttl = lease_ttl
+        self.leader_wait = leader_wait
+
+    def _age(self, entry: Optional[Dict[str, Any]]) -> float:
+        if not entry or "results" not in entry:
+            return float("inf")
+        return time.time() - entry.get("created", 0)
+
+    def get_or_probe(
+        self, key: str, urls: List[str], probe: Callable[[List[str]], ProbeResults]
+    ) -> ProbeResults:
+        """
+        Returns shared probe results for `key`, probing only when needed.
+
+        Args:
+            key (str): Cache key, see cache_key().
+            urls (List[str]): Candidate mirror URLs.
+            probe (Callable): Function probing the URLs, e.g. probe_mirrors.
+
+        Returns:
+            Dict[str, Optional[float]]: Latency in seconds per URL.
+        """
+        entry = self.backend.read(key)
+        age = self._age(entry)
+        if age < self.ttl * (1 - random.uniform(0, self.jitter)):
+            logger.debug("Using shared probe results for %s (age %.0fs)", key, age)
+            return entry["results"]
+
+        try:
+            leader = self.backend.acquire(key, self.lease_ttl)
+        except (urllib.error.URLError, OSError) as e:
+            logger.warning("Probe cache unavailable (%s), probing locally", e)
+            return probe(urls)
+        except (ValueError, KeyError, TypeError) as e:
+            # Not JSON, or not a lease document
+            logger.warning("Probe cache lease unreadable (%r), probing locally", e)
+            return probe(urls)
+
+        if leader:
+            try:
+                # Another instance may have published while we were acquiring
+                latest = self.backend.read(key)
+                if latest != entry and self._age(latest) < self.ttl:
+                    return latest["results"]
+                results = probe(urls)
+                try:
+                    self.backend.write(
+                        key, {"created": time.time(), "results": results}
+                    )
+                    logger.debug("Published probe results for %s", key)
+                except (urllib.error.URLError, OSError) as e:
+                    logger.warning("Cannot publish probe results (%s)", e)
+                return results
+            finally:
+                self.backend.release(key)
+
+        if age < self.ttl * MAX_STALE_FACTOR:
+            # Someone else is refreshing; the previous answer is good enough
+            logger.debug("Using stale probe results for %s while it refreshes", key)
+            return entry["results"]
+
+        deadline = time.monotonic() + self.leader_wait
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = self.backend.read(key)
+            if self._age(entry) < self.ttl:
+                logger.debug("Using probe results published for %s", key)
+                return entry["results"]
+
+        logger.debug("No probe results published for %s in time, probing locally", key)
+        return probe(urls)
@@ -0,0 +1,156 @@
+"""
+RLC Cloud Repos - Readiness Handoff
+
+When configuration runs in the background, dnf may start before the DNF
+vars are written. The background run publishes its state under /run:
+
+- `pending` holds the PID of the run that is still working.
+- `ready` is written when it finishes and holds its outcome.
+
+wait_until_ready() blocks only while a live run is still pending, so a dnf
+that starts after configuration has finished (the common case) never waits.
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+READINESS_DIR = "/run/rlc-cloud-repos"
+PENDING_FILE = "pending"
+READY_FILE = "ready"
+DEFAULT_WAIT_TIMEOUT = 120.0
+POLL_INTERVAL = 0.05
+
+
+def _path(name: str) -> Path:
+    return Path(READINESS_DIR) / name
+
+
+def _write_atomic(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    tmp_path.write_text(content)
+    os.replace(str(tmp_path), str(path))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def mark_pending(pid: int) -> None:
+    """
+    Records that a background run with the given PID is in progress.
+
+    Args:
+        pid (int): PID of the background process.
+    """
+    _write_atomic(_path(PENDING_FILE), f"{pid}\n")
+
+
+def clear_ready() -> None:
+    """Removes the outcome of a previous run before starting a new one."""
+    try:
+        _path(READY_FILE).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def mark_ready(ok: bool) -> None:
+    """
+    Publishes the outcome of the background run and drops the pending state.
+
+    Args:
+        ok (bool): Whether configuration succeeded.
+    """
+    _write_atomic(_path(READY_FILE), "ok\n" if ok else "failed\n")
+    try:
+        _path(PENDING_FILE).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def read_ready() -> Optional[str]:
+    """
+    Returns the published outcome ('ok' or 'failed'), or None if not ready.
+    """
+    try:
+        return _path(READY_FILE).read_text().strip()
+    except FileNotFoundError:
+        return None
+
+
+def pending_pid() -> Optional[int]:
+    """
+    Returns the PID of a background run that is still alive, if any.
+    """
+    try:
+        pid = int(_path(PENDING_FILE).read_text().strip())
+    except (OSError, ValueError):
+        return None
+    return pid if _pid_alive(pid) else None
+
+
+def wait_until_ready(timeout: float = DEFAULT_WAIT_TIMEOUT) -> Optional[str]:
+    """
+    Blocks while a background configuration run is still in progress.
+
+    Args:
+        timeout (float): Maximum seconds to wait.
+
+    Returns:
+        Optional[str]: The outcome ('ok' or 'failed') once published, or
+        None if no run is pending or the timeout expired.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        outcome = read_ready()
+        if outcome is not None:
+            return outcome
+        if pending_pid() is None:
+            # The run may have finished between the two checks
+            return read_ready()
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(POLL_INTERVAL)
+
+
+def main(args=None) -> int:
+    """
+    Entry point for rlc-cloud-repos-wait.
+
+    Args:
+        args: Command line arguments (defaults to None, which uses sys.argv[1:])
+
+    Returns:
+        int: 0 if configuration is done (or not running), 1 otherwise
+    """
+    parser = argparse.ArgumentParser(
+        description="Wait for background RLC cloud repo configuration to finish",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_WAIT_TIMEOUT,
+        help="Maximum seconds to wait",
+    )
+    parsed_args = parser.parse_args(args)
+
+    pending = pending_pid() is not None
+    outcome = wait_until_ready(parsed_args.timeout)
+    if outcome == "failed" or (pending and outcome is None):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))  # pragma: no cover
@@ -0,0 +1,207 @@
+"""
+RLC Cloud Repos - Periodic Re-evaluation
+
+Instances live longer than the network they booted into: mirrors go down,
+the instance is snapshotted and restored elsewhere, or it moves between
+networks. `rlc-cloud-repos-reevaluate` is a cheap check meant to be run
+from the shipped systemd timer and NetworkManager dispatcher hook:
+
+- Network events are debounced on the trailing edge: the hook stamps
+  TRIGGER_PATH on every event, and the check waits until `--debounce`
+  seconds passed without a new one. A burst of events costs one
+  evaluation, made on the network state the burst settled into.
+- If the instance id, the DMI provider or the mirror map changed since the
+  last-known-good record, mirrors are resolved from scratch.
+- Otherwise the recorded primary mirror is probed. While it answers, and
+  no signal that can move the decision on its own (`--mirror-status`,
+  `--freshness`) is enabled, nothing else is done. With `--probe`, every
+  candidate is probed instead, and a primary that still answers is kept
+  unless another candidate answers at least `--rerank-margin` faster.
+- Else mirrors are resolved again for the recorded metadata, without
+  querying cloud-init.
+
+DNF vars are only rewritten when the decision changes.
+"""
+
+import argparse
+import logging
+import os
+import time
+from typing import Optional
+
+from rlc.cloud_repos import last_good
+from rlc.cloud_repos import main as cli
+from rlc.cloud_repos.log_utils import log_and_print, setup_logging
+from rlc.cloud_repos.main import add_resolution_args
+from rlc.cloud_repos.probe import probe_mirror, probe_mirrors
+from rlc.cloud_repos.repo_config import candidate_urls, load_mirror_map
+
+# Touched by the NetworkManager hook on every network event
+TRIGGER_PATH = "/run/rlc-cloud-repos/reevaluate-trigger"
+DEFAULT_DEBOUNCE = 60.0
+# A network that never settles is checked after this long anyway
+MAX_SETTLE_WAIT = 600.0
+# Share of the primary's latency a candidate must save to replace it
+DEFAULT_RERANK_MARGIN = 0.3
+
+logger = logging.getLogger(__name__)
+
+
+def wait_for_quiet(window: float, max_wait: float = MAX_SETTLE_WAIT) -> float:
+    """
+    Waits until no trigger was recorded for `window` seconds.
+
+    Triggers arriving while this waits push the evaluation back, so it runs
+    once, after the last of them. Without a recorded trigger, as when the
+    timer fires, it returns at once.
+
+    Args:
+        window (float): Quiet period in seconds.
+        max_wait (float): Seconds to wait at most.
+
+    Returns:
+        float: Seconds waited.
+    """
+    waited = 0.0
+    while True:
+        try:
+            quiet = time.time() - os.stat(TRIGGER_PATH).st_mtime
+        except OSError:
+            return waited
+        remaining = min(window - quiet, max_wait - waited)
+        if remaining <= 0:
+            return waited
+        time.sleep(remaining)
+        waited += remaining
+
+
+def _primary_holds(mirror_file_path: str, record: dict, options) -> bool:
+    """
+    Checks whether the recorded primary mirror should be kept.
+
+    Without `--probe` it is kept while it answers. With `--probe`, the
+    recorded mirrors and every other candidate are probed, and the primary
+    must also not be beaten by more than the re-rank margin: a primary that
+    answers but has become much slower than an alternative is re-ranked.
+
+    Returns:
+        bool: True if the primary is kept as is.
+    """
+    primary = record["baseurl1"]
+    if not options.probe:
+        if probe_mirror(primary, options.probe_timeout) is None:
+            return False
+        logger.debug("Mirror %s still answers", primary)
+        return True
+
+    metadata = record["metadata"]
+    mirror_map = load_mirror_map(mirror_file_path, metadata.get("provider"))
+    urls = [primary, record["baseurl2"]] + candidate_urls(metadata, mirror_map)
+    results = probe_mirrors(list(dict.fromkeys(urls)), options.probe_timeout)
+    latency = results.get(primary)
+    if latency is None:
+        return False
+    answering = [(r, url) for url, r in results.items() if r is not None]
+    best_latency, best = min(answering)
+    if best != primary and best_latency < latency * (1 - options.rerank_margin):
+        log_and_print(
+            f"Mirror {best} answers in {best_latency:.3f}s, primary {primary} "
+            f"in {latency:.3f}s; ranking again"
+        )
+        return False
+    logger.debug("Mirror %s still answers in %.3fs", primary, latency)
+    return True
+
+
+def reevaluate(mirror_file_path: str, options) -> str:
+    """
+    Re-checks the mirror decision and rewrites the DNF vars if it changed.
+
+    Args:
+        mirror_file_path (str): Mirror map in use.
+        options: Namespace from the reevaluate command line.
+
+    Returns:
+        str: "unchanged", "changed", "resolved" (no usable record to compare
+        with) or "shared" (a concurrent run did the work).
+    """
+    waited = wait_for_quiet(options.debounce)
+    if waited:
+        logger.debug("Network settled after %.1f seconds", waited)
+
+    record = last_good.load_record(last_good.fingerprint(mirror_file_path))
+    known: Optional[dict] = None
+    if record is None:
+        log_and_print("Resolution inputs changed, resolving mirrors again")
+    else:
+        known = record["metadata"]
+        steered = options.mirror_status or options.freshness
+        if not steered and _primary_holds(mirror_file_path, record, options):
+            return "unchanged"
+
+    mirrors = cli.configure_repos(mirror_file_path, options, known)
+    if mirrors is None:
+        return "shared"
+    if record is None:
+        return "resolved"
+    if mirrors == (record["baseurl1"], record["baseurl2"]):
+        return "unchanged"
+    return "changed"
+
+
+def parse_args(args=None):
+    """
+    Parse command line arguments
+
+    Args:
+        args: Command line arguments (defaults to None, which uses sys.argv[1:])
+
+    Returns:
+        Parsed arguments namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Re-check the RLC cloud repo mirrors",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    add_resolution_args(parser)
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help="Seconds without network events to wait for before checking",
+    )
+    parser.add_argument(
+        "--rerank-margin",
+        type=float,
+        default=DEFAULT_RERANK_MARGIN,
+        help="With --probe, share of the primary's latency another mirror "
+        "must save to replace a primary that still answers",
+    )
+    parser.add_argument(
+        "--report",
+        help="Append a JSON line describing each resolution to this file",
+    )
+    return parser.parse_args(args)
+
+
+def main(args=None) -> int:
+    """
+    Entry point for rlc-cloud-repos-reevaluate.
+
+    Args:
+        args: Command line arguments (defaults to None, which uses sys.argv[1:])
+
+    Returns:
+        int: 0 for success, 1 for failure
+    """
+    parsed_args = parse_args(args)
+    setup_logging()
+    try:
+        outcome = reevaluate(
+            parsed_args.mirror_file or cli.DEFAULT_MIRROR_PATH, parsed_args
+        )
+    except Exception as e:
+        logger.error("Re-evaluation failed: %s", e, exc_info=True)
+        return 1
+    log_and_print(f"Re-evaluation: {outcome}")
+    return 0
@@ -1,18 +1,87 @@
 # src/rlc_cloud_repos/repo_config.py
+import hashlib
+import math
+import re
 from pathlib import Path
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import yaml
 
 from rlc.cloud_repos.log_utils import log_and_print
 
+# Advertised load (0-1) at which a mirror stops taking new instances
+OVERLOADED = 0.9
 
-def load_mirror_map(yaml_path: str) -> Dict[str, Any]:
+Loads = Optional[Dict[str, Optional[float]]]
+
+# Selection policies for repo classes: rank by latency (time to first byte)
+# or by sustained throughput for bulk downloads
+POLICIES = ("latency", "throughput")
+# Class names become DNF var prefixes, which only allow these characters
+CLASS_NAME = re.compile(r"^[A-Za-z0-9_]+$")
+
+# Sharded maps: a directory of <section>.yaml files
+SHARD_SUFFIX = ".yaml"
+DEFAULT_SHARD = "default"
+SHARD_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def _parse_yaml(path: Path) -> Any:
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return yaml.safe_load(f)
+    except yaml.YAMLError as e:
+        log_and_print("YAML parsing error", level="error")
+        raise ValueError(f"Invalid YAML in mirror map: {e}")
+
+
+def _shard_paths(directory: Path) -> Dict[str, Path]:
+    return {
+        shard.name[: -len(SHARD_SUFFIX)]: shard
+        for shard in sorted(directory.glob(f"*{SHARD_SUFFIX}"))
+        if not shard.name.startswith(".")
+    }
+
+
+def _load_shards(directory: Path, provider: Optional[str]) -> Dict[str, Any]:
+    """
+    Assembles a mirror map from a sharded layout: one `<section>.yaml` file
+    per top-level key, holding that key's value.
+    """
+    if provider is None:
+        names = list(_shard_paths(directory))
+    else:
+        names = [DEFAULT_SHARD]
+        if SHARD_NAME.match(provider) and provider.lower() != DEFAULT_SHARD:
+            names.append(provider.lower())
+
+    mirror_map: Dict[str, Any] = {}
+    for name in names:
+        shard = directory / f"{name}{SHARD_SUFFIX}"
+        if not shard.exists():
+            if name == DEFAULT_SHARD:
+                log_and_print(f"Mirror map shard {shard} not found", level="error")
+                raise FileNotFoundError(f"Mirror config shard not found at {shard}")
+            # Unmapped provider, served by the default entry
+            continue
+        mirror_map[name] = _parse_yaml(shard)
+    return mirror_map
+
+
+def load_mirror_map(yaml_path: str, provider: Optional[str] = None) -> Dict[str, Any]:
     """
     Loads the YAML mirror map config.
 
+    The map is either a single YAML file or a directory of shards, one
+    `<provider>.yaml` per provider plus `default.yaml`, each holding the
+    value of that top-level key. Shards are self-contained: YAML anchors
+    don't reach across files.
+
     Args:
-        yaml_path (str): Path to YAML config.
+        yaml_path (str): Path to YAML config file or shard directory.
+        provider (str): With a sharded map, only this provider's shard and
+            the default are read. All shards are read when not given; a
+            single file is always read whole.
 
     Returns:
         Dict[str, Any]: Mirror map dictionary.
@@ -27,20 +96,169 @@ def load_mirror_map(yaml_path: str) -> Dict[str, Any]:
         log_and_print(f"Mirror YAML not found at {yaml_path}", level="error")
         raise FileNotFoundError(f"Mirror config YAML not found at {yaml_path}")
 
+    if path.is_dir():
+        return _load_shards(path, provider)
+    return _parse_yaml(path)
+
+
+def map_signature(yaml_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Cheap change detection for a mirror map file or shard directory.
+
+    Returns:
+        Optional[Tuple[int, int]]: Latest modification time in ns and total
+        size, or None if the map doesn't exist.
+    """
+    path = Path(yaml_path)
     try:
-        with path.open("r", encoding="utf-8") as f:
-            return yaml.safe_load(f)
-    except yaml.YAMLError as e:
-        log_and_print("YAML parsing error", level="error")
-        raise ValueError(f"Invalid YAML in mirror map: {e}")
+        stat = path.stat()
+        if not path.is_dir():
+            return stat.st_mtime_ns, stat.st_size
+        stats = [shard.stat() for shard in _shard_paths(path).values()]
+    except OSError:
+        return None
+    # Adding or removing a shard changes the directory's own mtime
+    return (
+        max([stat.st_mtime_ns] + [shard.st_mtime_ns for shard in stats]),
+        sum(shard.st_size for shard in stats),
+    )
 
 
-def select_mirror(
+def _pool_members(pool: List[Any]) -> List[Tuple[str, float]]:
+    """
+    Normalizes pool entries to (url, weight) pairs.
+
+    Entries are either plain URLs (weight 1) or mappings with `url` and an
+    optional `weight`. Other entries are skipped with a warning.
+    """
+    members = []
+    for member in pool:
+        if isinstance(member, str):
+            members.append((member, 1.0))
+            continue
+        try:
+            members.append((member["url"], float(member.get("weight", 1))))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            log_and_print(f"Ignoring invalid pool entry {member!r}", level="warning")
+    return members
+
+
+def _is_overloaded(url: str, loads: Loads) -> bool:
+    load = (loads or {}).get(url)
+    return load is not None and load >= OVERLOADED
+
+
+def rank_pool(pool: List[Any], key: str, loads: Loads = None) -> List[str]:
+    """
+    Orders the members of a weighted mirror pool for a given instance.
+
+    Uses weighted rendezvous (highest random weight) hashing: every member
+    gets a pseudo-random score derived from the instance key and its URL,
+    scaled by its weight. The ranking is stable for a key, spreads keys over
+    members in proportion to their weights, and adding or removing a member
+    only moves the instances that would rank it first (about 1/N of them).
+
+    Advertised loads scale each weight by the member's spare capacity, so a
+    busy mirror only sheds the share of instances its load calls for.
+    Overloaded members are ranked last.
+
+    Args:
+        pool (List[Any]): Pool entries from the mirror map.
+        key (str): Stable instance key, normally the instance id.
+        loads (Loads): Advertised load (0-1) per URL, if known.
+
+    Returns:
+        List[str]: Member URLs, most preferred first.
+    """
+
+    def score(member: Tuple[str, float]) -> float:
+        url, weight = member
+        digest = hashlib.sha256(f"{key}|{url}".encode("utf-8")).digest()
+        # Uniform in (0, 1), never exactly 0 or 1
+        unit = (int.from_bytes(digest[:8], "big") + 0.5) / 2.0**64
+        return weight / -math.log(unit)
+
+    members = [m for m in _pool_members(pool) if m[1] > 0]
+    available = []
+    for url, weight in members:
+        load = (loads or {}).get(url)
+        if load is not None and not _is_overloaded(url, loads):
+            weight *= 1.0 - load
+        available.append((url, weight))
+    ranked = [url for url, _ in sorted(available, key=score, reverse=True)]
+    return shed_overloaded(ranked, loads)
+
+
+def shed_overloaded(urls: List[str], loads: Loads) -> List[str]:
+    """
+    Moves mirrors advertising a load of OVERLOADED or more to the end,
+    keeping the order otherwise.
+
+    Args:
+        urls (List[str]): Candidate URLs, most preferred first.
+        loads (Loads): Advertised load (0-1) per URL, if known.
+
+    Returns:
+        List[str]: Reordered candidate URLs.
+    """
+    return [url for url in urls if not _is_overloaded(url, loads)] + [
+        url for url in urls if _is_overloaded(url, loads)
+    ]
+
+
+def _shed_pair(primary: str, backup: str, loads: Loads) -> Tuple[str, str]:
+    """Swaps an overloaded primary with a backup that is not."""
+    if backup and _is_overloaded(primary, loads) and not _is_overloaded(backup, loads):
+        return backup, primary
+    return primary, backup
+
+
+def candidate_urls(metadata: Dict[str, str], mirror_map: Dict[str, Any]) -> List[str]:
+    """
+    Lists every mirror select_mirror() could pick for the given metadata.
+
+    Returns:
+        List[str]: Unique URLs in map order.
+    """
+    entry = region_entry(metadata, mirror_map)
+    default = mirror_map.get("default") or {}
+    urls = [url for url, weight in _pool_members(entry.get("pool") or []) if weight > 0]
+    if not urls:
+        urls.append(entry.get("primary", default.get("primary")))
+    urls.append(entry.get("backup", default.get("backup")))
+    return [url for url in dict.fromkeys(urls) if url]
+
+
+def region_entry(
     metadata: Dict[str, str], mirror_map: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Finds the mirror map entry for the metadata's provider and region,
+    falling back to the provider's default entry.
+
+    Returns:
+        Dict[str, Any]: The entry, empty if the provider isn't mapped.
+    """
+    provider_map = mirror_map.get(metadata["provider"].lower()) or {}
+    if metadata["region"] in provider_map:
+        return provider_map[metadata["region"]] or {}
+    return provider_map.get("default") or {}
+
+
+def select_mirror(
+    metadata: Dict[str, str], mirror_map: Dict[str, Any], loads: Loads = None
 ) -> Tuple[str, str]:
     """
     Chooses the best primary and backup mirror URLs for the given cloud metadata.
 
+    A region entry may list a weighted `pool` of equivalent mirrors instead
+    of a single `primary`. The primary is then picked from the pool by
+    consistent hashing on `metadata["instance_id"]`; the backup is the
+    entry's `backup`, or the next pool member when none is given.
+
+    With `loads`, pool weights account for the advertised load and an
+    overloaded primary swaps places with its backup.
+
     Returns:
         tuple[str, str]: (primary_url, backup_url)
     """
@@ -63,20 +281,106 @@ def select_mirror(
     )
 
     if provider in mirror_map:
-        # The provider was located in the mirror map
-        provider_map = mirror_map[provider]
-        if region in provider_map:
-            # the region was located in the provider map
-            region_map = provider_map.get(region, {})
-        else:
-            # the region was not located in the provider map, use the default for the provider
-            region_map = provider_map.get("default", {})
-        return region_map.get("primary", default_primary), region_map.get(
-            "backup", default_backup
+        # The provider was located in the mirror map; use the region's entry
+        # or, if the region isn't listed, the provider's default
+        region_map = region_entry(metadata, mirror_map)
+        if region_map.get("pool"):
+            ranked = rank_pool(
+                region_map["pool"], metadata.get("instance_id", ""), loads
+            )
+            if ranked:
+                fallback_backup = ranked[1] if len(ranked) > 1 else default_backup
+                return _shed_pair(
+                    ranked[0], region_map.get("backup", fallback_backup), loads
+                )
+        return _shed_pair(
+            region_map.get("primary", default_primary),
+            region_map.get("backup", default_backup),
+            loads,
         )
 
     else:
         log_and_print(
             f"Provider {provider} not found, using default values", level="info"
         )
-        return default_primary, default_backup
+        return _shed_pair(default_primary, default_backup, loads)
+
+
+def repo_classes(mirror_map: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Lists the repo classes defined under the map's `default.classes`.
+
+    Returns:
+        Dict[str, str]: Selection policy per class name, in map order.
+
+    Raises:
+        ValueError: If a class name or policy is invalid.
+    """
+    classes = (mirror_map.get("default") or {}).get("classes") or {}
+    policies = {}
+    for name, entry in classes.items():
+        policy = (entry or {}).get("policy", "latency")
+        if not CLASS_NAME.match(str(name)) or policy not in POLICIES:
+            log_and_print(f"Invalid repo class {name!r}", level="error")
+            raise ValueError(
+                f"Repo class {name!r} needs a name of letters, digits and "
+                f"underscores and a policy out of {', '.join(POLICIES)}"
+            )
+        policies[str(name)] = policy
+    return policies
+
+
+def main_policy(mirror_map: Dict[str, Any]) -> str:
+    """
+    Reads the selection policy of the main mirror set (baseurl1/2) from the
+    map's `default.policy`.
+
+    Returns:
+        str: One of POLICIES, `latency` if not set.
+
+    Raises:
+        ValueError: If the policy is invalid.
+    """
+    policy = (mirror_map.get("default") or {}).get("policy", "latency")
+    if policy not in POLICIES:
+        log_and_print(f"Invalid main policy {policy!r}", level="error")
+        raise ValueError(f"The main policy must be one of {', '.join(POLICIES)}")
+    return policy
+
+
+def _class_entry(entry: Any, name: str) -> Any:
+    """Overlays an entry's `classes.<name>` section on the entry itself."""
+    if not isinstance(entry, dict):
+        return entry
+    section = (entry.get("classes") or {}).get(name)
+    merged = {key: value for key, value in entry.items() if key != "classes"}
+    if not section:
+        return merged
+    if "pool" in section or "primary" in section:
+        # The class picks its own mirrors rather than mixing with the entry's
+        merged.pop("pool", None)
+        merged.pop("primary", None)
+    merged.update((key, value) for key, value in section.items() if key != "policy")
+    return merged
+
+
+def class_map(mirror_map: Dict[str, Any], name: str) -> Dict[str, Any]:
+    """
+    Builds the mirror map a repo class is resolved from.
+
+    Every entry (regions, provider defaults and the global default) is
+    replaced by its `classes.<name>` overlay, so entries without one serve
+    the class from their regular mirrors.
+
+    Returns:
+        Dict[str, Any]: Mirror map in the regular layout.
+    """
+    view: Dict[str, Any] = {}
+    for key, value in mirror_map.items():
+        if key == "default":
+            view[key] = _class_entry(value, name)
+        elif isinstance(value, dict):
+            view[key] = {region: _class_entry(e, name) for region, e in value.items()}
+        else:
+            view[key] = value
+    return view
@@ -0,0 +1,416 @@
+"""
+RLC Cloud Repos - Local Resolver Daemon
+
+An optional long-running resolver for container builds and configuration
+management agents on the host. It keeps the mirror map, the instance
+metadata and any probe results in memory and answers mirror queries over a
+unix socket, reloading the map whenever the file changes.
+
+Protocol: the client sends one JSON object terminated by a newline and
+receives one JSON object terminated by a newline.
+
+- {"op": "resolve"} resolves for this host; "provider", "region" and
+  "instance_id" may be given to resolve for something else. Repo classes
+  in the map are answered under "classes" as
+  {"<class>": {"baseurl1": ..., "baseurl2": ...}}.
+- {"op": "status"} describes what the daemon has loaded.
+- {"op": "reload"} forces the map and metadata to be reloaded. Only root
+  may ask for it, since it queries cloud-init again.
+
+Successful answers carry "ok": true; failures carry "ok": false and an
+"error" message.
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from rlc.cloud_repos import main as cli
+from rlc.cloud_repos.dnf_vars import ensure_all_dnf_vars
+from rlc.cloud_repos.log_utils import log_and_print, logger, setup_logging
+from rlc.cloud_repos.main import add_resolution_args, detect_metadata, resolve_mirrors
+from rlc.cloud_repos.repo_config import load_mirror_map, main_policy, map_signature
+
+DEFAULT_SOCKET_PATH = "/run/rlc-cloud-repos/resolver.sock"
+CLIENT_TIMEOUT = 2.0
+MAX_REQUEST_SIZE = 64 * 1024
+# Answers that depend on probing the network are redone after this long
+DEFAULT_RESOLUTION_TTL = 300.0
+
+Key = Tuple[str, str, str]
+Answer = Tuple[Tuple[str, str], Dict[str, Tuple[str, str]]]
+
+
+def _probed(options) -> bool:
+    """Tells whether resolutions depend on probing the network."""
+    return bool(
+        options.probe
+        or options.throughput
+        or options.local_cache
+        or options.private_timeout > 0
+    )
+
+
+class ResolverState:
+    """
+    In-memory mirror map, metadata and resolutions.
+
+    Answers are cached per (provider, region, instance_id) and dropped
+    whenever the map file changes, which is checked with a stat() on every
+    query. Answers that depend on probing the network also expire after
+    `ttl` seconds, so a mirror that dies is noticed. Resolving a missing
+    answer only holds a lock for its key, so other clients keep being
+    answered while it probes.
+    """
+
+    def __init__(self, mirror_path: str, options, ttl: float = DEFAULT_RESOLUTION_TTL):
+        self.mirror_path = mirror_path
+        self.options = options
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.metadata_lock = threading.Lock()
+        self.map_signature: Optional[Tuple[int, int]] = None
+        self.mirror_map: Dict[str, Any] = {}
+        self.metadata: Optional[Dict[str, str]] = None
+        # Answer and expiry (time.monotonic(), None for never) per key
+        self.resolutions: Dict[Key, Tuple[Answer, Optional[float]]] = {}
+        self.key_locks: Dict[Key, threading.Lock] = {}
+
+    def _signature(self) -> Tuple[int, int]:
+        signature = map_signature(self.mirror_path)
+        if signature is None:
+            raise FileNotFoundError(f"Mirror map not found at {self.mirror_path}")
+        return signature
+
+    def reload(self) -> None:
+        """
+        Reloads the mirror map, detects the metadata again and drops cached
+        answers. Queries keep being answered with the previous metadata
+        until detection, which may wait on cloud-init, has finished.
+        """
+        with self.metadata_lock:
+            metadata = detect_metadata()
+            self.metadata = metadata
+        with self.lock:
+            self.map_signature = None
+        self._refresh()
+
+    def _refresh(self) -> None:
+        signature = self._signature()
+        if signature == self.map_signature:
+            return
+        with self.lock:
+            if signature == self.map_signature:
+                return
+            self.mirror_map = load_mirror_map(self.mirror_path)
+            self.map_signature = signature
+            self.resolutions = {}
+            self.key_locks = {}
+            log_and_print(f"Loaded mirror map from {self.mirror_path}")
+
+    def host_metadata(self) -> Dict[str, str]:
+        """Returns this host's metadata, detecting it if reload() didn't."""
+        if self.metadata is None:
+            with self.metadata_lock:
+                if self.metadata is None:
+                    self.metadata = detect_metadata()
+        return self.metadata
+
+    def _cached(self, key: Key) -> Optional[Answer]:
+        with self.lock:
+            entry = self.resolutions.get(key)
+            if entry is None or (entry[1] is not None and entry[1] <= time.monotonic()):
+                return None
+            return entry[0]
+
+    def _key_lock(self, key: Key) -> threading.Lock:
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def _resolve_uncached(
+        self, key: Key, metadata: Dict[str, str], overridden: bool
+    ) -> Answer:
+        with self.lock:
+            mirror_map, signature = self.mirror_map, self.map_signature
+        # Probes, private endpoint and cache checks only tell us about this
+        # host, not about the metadata asked for
+        options = self.options
+        if overridden:
+            options = argparse.Namespace(**vars(options))
+            options.probe = False
+            options.throughput = False
+            options.private_timeout = 0
+            options.local_cache = False
+        site = cli.discover_site_mirrors(metadata, mirror_map, options)
+        answer = (
+            resolve_mirrors(
+                metadata, mirror_map, options, main_policy(mirror_map), site
+            ),
+            cli.resolve_class_mirrors(metadata, mirror_map, options, site),
+        )
+        # Advertised loads and mirror freshness change, so those answers are
+        # not kept; status fetches have a short cache and repomd.xml fetches
+        # are conditional
+        if not (options.mirror_status or options.freshness):
+            expiry = time.monotonic() + self.ttl if _probed(options) else None
+            with self.lock:
+                # Unless the map was reloaded meanwhile
+                if self.map_signature == signature:
+                    self.resolutions[key] = (answer, expiry)
+        return answer
+
+    def resolve(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Resolves mirrors for this host or the metadata given in `request`.
+
+        Returns:
+            Dict[str, Any]: Response with baseurl1, baseurl2 and the
+            metadata that was used.
+        """
+        self._refresh()
+        metadata = self.host_metadata()
+        overridden = any(request.get(k) for k in ("provider", "region", "instance_id"))
+        if overridden:
+            metadata = {
+                key: request.get(key) or metadata.get(key, "")
+                for key in ("provider", "region", "instance_id")
+            }
+        key = (
+            metadata["provider"],
+            metadata["region"],
+            metadata.get("instance_id", ""),
+        )
+
+        answer = self._cached(key)
+        if answer is None:
+            # Concurrent clients asking for the same key wait for one probe
+            with self._key_lock(key):
+                answer = self._cached(key)
+                if answer is None:
+                    answer = self._resolve_uncached(key, metadata, overridden)
+        return {
+            "ok": True,
+            "baseurl1": answer[0][0],
+            "baseurl2": answer[0][1],
+            "classes": {
+                name: {"baseurl1": urls[0], "baseurl2": urls[1]}
+                for name, urls in answer[1].items()
+            },
+            "provider": metadata["provider"],
+            "region": metadata["region"],
+        }
+
+    def status(self) -> Dict[str, Any]:
+        """Describes the loaded state."""
+        self._refresh()
+        return {
+            "ok": True,
+            "mirror_file": self.mirror_path,
+            "metadata": self.metadata,
+            "cached_resolutions": len(self.resolutions),
+        }
+
+
+def peer_uid(sock: socket.socket) -> Optional[int]:
+    """
+    Finds the user id of the process on the other end of a unix socket.
+
+    Returns:
+        Optional[int]: The peer's uid, or None where SO_PEERCRED is missing.
+    """
+    if not hasattr(socket, "SO_PEERCRED"):  # pragma: no cover
+        return None
+    credentials = sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    return struct.unpack("3i", credentials)[1]
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        state = self.server.state
+        try:
+            request = json.loads(self.rfile.readline(MAX_REQUEST_SIZE).decode("utf-8"))
+            op = request.get("op", "resolve")
+            if op == "resolve":
+                response = state.resolve(request)
+            elif op == "status":
+                response = state.status()
+            elif op == "reload":
+                # The socket is open to everyone; re-running detection isn't
+                if peer_uid(self.connection) not in (0, os.geteuid()):
+                    response = {"ok": False, "error": "reload requires root"}
+                else:
+                    state.reload()
+                    response = {"ok": True}
+            else:
+                response = {"ok": False, "error": f"unknown op {op!r}"}
+        except Exception as e:
+            logger.error("Resolver request failed: %s", e)
+            response = {"ok": False, "error": str(e)}
+        try:
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Clients stop waiting after CLIENT_TIMEOUT and fall back
+            logger.debug("Resolver client went away before the answer")
+
+
+class ResolverServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server answering mirror queries from a ResolverState."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, state: ResolverState):
+        path = Path(socket_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.is_socket():
+            # Left behind by a previous daemon
+            path.unlink()
+        super().__init__(socket_path, _RequestHandler)
+        # Containers bind-mount the socket and may run as any user; the
+        # only op changing state, reload, checks the caller's uid
+        os.chmod(socket_path, 0o666)
+        self.state = state
+
+
+def query(request: Dict[str, Any], socket_path: str = DEFAULT_SOCKET_PATH) -> Dict:
+    """
+    Sends one request to the resolver daemon.
+
+    Args:
+        request (Dict[str, Any]): Request object, see the module docstring.
+        socket_path (str): Path of the daemon's socket.
+
+    Returns:
+        Dict: The daemon's response.
+
+    Raises:
+        OSError: If the daemon cannot be reached.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(CLIENT_TIMEOUT)
+        s.connect(socket_path)
+        s.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with s.makefile("rb") as f:
+            return json.loads(f.readline().decode("utf-8"))
+
+
+def daemon_main(args=None) -> int:
+    """
+    Entry point for rlc-cloud-repos-resolver.
+
+    Args:
+        args: Command line arguments (defaults to None, which uses sys.argv[1:])
+
+    Returns:
+        int: Exit code
+    """
+    parser = argparse.ArgumentParser(
+        description="RLC cloud repo resolver daemon",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    add_resolution_args(parser)
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Socket path")
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_RESOLUTION_TTL,
+        help="Seconds to keep answers that depend on probing the network",
+    )
+    parsed_args = parser.parse_args(args)
+    setup_logging()
+
+    state = ResolverState(
+        parsed_args.mirror_file or cli.DEFAULT_MIRROR_PATH,
+        parsed_args,
+        parsed_args.cache_ttl,
+    )
+    # Metadata is detected before accepting connections: cloud-init can take
+    # far longer than a client waits
+    try:
+        state.reload()
+    except Exception as e:
+        logger.error("Cannot load mirror map or detect metadata: %s", e)
+        return 1
+
+    server = ResolverServer(parsed_args.socket, state)
+    log_and_print(f"Resolver listening on {parsed_args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(parsed_args.socket)
+    return 0
+
+
+def client_main(args=None) -> int:
+    """
+    Entry point for rlc-cloud-repos-query, the one-shot client.
+
+    Prints `name=value` lines, or writes the DNF vars into `--write-vars`
+    (e.g. a container's /etc/dnf/vars).
+
+    Args:
+        args: Command line arguments (defaults to None, which uses sys.argv[1:])
+
+    Returns:
+        int: 0 on success, 1 if the daemon is unavailable or failed
+    """
+    parser = argparse.ArgumentParser(
+        description="Query the RLC cloud repo resolver daemon",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Socket path")
+    parser.add_argument("--provider", help="Resolve for this provider instead")
+    parser.add_argument("--region", help="Resolve for this region instead")
+    parser.add_argument("--instance-id", help="Resolve for this instance id instead")
+    parser.add_argument("--write-vars", help="Write DNF vars into this directory")
+    parsed_args = parser.parse_args(args)
+
+    request = {
+        "op": "resolve",
+        "provider": parsed_args.provider,
+        "region": parsed_args.region,
+        "instance_id": parsed_args.instance_id,
+    }
+    try:
+        response = query(request, parsed_args.socket)
+    except (OSError, ValueError) as e:
+        print(f"Resolver unavailable at {parsed_args.socket}: {e}", file=sys.stderr)
+        return 1
+    if not response.get("ok"):
+        print(f"Resolver error: {response.get('error')}", file=sys.stderr)
+        return 1
+
+    if parsed_args.write_vars:
+        setup_logging()
+        ensure_all_dnf_vars(
+            Path(parsed_args.write_vars),
+            response["baseurl1"],
+            response["baseurl2"],
+            {
+                name: (urls["baseurl1"], urls["baseurl2"])
+                for name, urls in response.get("classes", {}).items()
+            },
+        )
+    else:
+        for name in ("baseurl1", "baseurl2", "provider", "region"):
+            print(f"{name}={response[name]}")
+        for name, urls in response.get("classes", {}).items():
+            print(f"{name}_baseurl1={urls['baseurl1']}")
+            print(f"{name}_baseurl2={urls['baseurl2']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(daemon_main(sys.argv[1:]))  # pragma: no cover
@@ -0,0 +1,88 @@
+"""
+RLC Cloud Repos - Run Reports
+
+With `--report FILE` every configuration run appends one JSON line
+describing itself, for collection by the fleet's log shipping:
+
+    {"time": "...", "version": "...", "ok": true, "provider": "aws",
+     "region": "us-east-1", "mirror": "https://...", "backup": "https://...",
+     "phases": {"detect": 0.41, "load_map": 0.01, "resolve": 0.2,
+                "write": 0.002},
+     "total": 0.62, "fallbacks": ["backup_promoted"]}
+
+Phase timings are in seconds. With `--warm-dns`, a `warm_dns` phase is
+added and `dns` holds the A and AAAA lookup times per mirror hostname
+(null if the lookup failed or ran past its budget).
+
+`fallbacks` lists the ways the run departed from the straightforward path:
+
+- region_unknown: no region was detected or inferred
+- provider_default: the provider is not in the map, global defaults used
+- region_default: the region is not in the map, provider defaults used
+- backup_promoted: the map's backup mirror ended up as the primary
+
+The framework's boot_reports tool aggregates these files.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List
+
+from rlc.cloud_repos import __version__ as rlc_version
+
+logger = logging.getLogger(__name__)
+
+
+class RunReport:
+    """Collects the outcome and phase timings of one configuration run."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.fields: Dict[str, Any] = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "version": rlc_version,
+            "ok": False,
+        }
+        self.phases: Dict[str, float] = {}
+        self.fallbacks: List[str] = []
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Times the enclosed block as the named phase."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.monotonic() - start, 6)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Returns the report as a JSON-serialisable dict."""
+        return dict(
+            self.fields,
+            phases=self.phases,
+            total=round(time.monotonic() - self.started, 6),
+            fallbacks=self.fallbacks,
+        )
+
+    def append_to(self, path: str) -> None:
+        """
+        Appends the report as one JSON line. Failures are logged, not
+        raised, so reporting can never fail a run.
+
+        Args:
+            path (str): Report file, created if missing.
+        """
+        line = json.dumps(self.as_dict(), sort_keys=True) + "\n"
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                # One write per line keeps concurrent appends whole
+                os.write(fd, line.encode("utf-8"))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.warning("Cannot write run report to %s: %s", path, e)
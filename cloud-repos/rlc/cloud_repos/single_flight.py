@@ -0,0 +1,117 @@
+"""
+RLC Cloud Repos - Single-Flight Coordination
+
+The tool can be started from cloud-init, from an RPM scriptlet and by hand,
+possibly at the same time. Runs coordinate through an flock()ed lock file
+so that only one of them resolves and writes the DNF vars. Runs that
+arrive while it is working wait for it and reuse its result.
+
+The lock file also holds a generation counter that each successful run
+increments, followed by the key of that run: a hash of its effective
+arguments. A waiter reads the counter before queueing for the lock. If the
+counter has moved by the time it gets the lock and the run that completed
+had the same key, there is nothing left to do; a run with other arguments,
+such as another mirror map, resolves on its own.
+
+A waiter that doesn't get the lock in time gives up with TimeoutError
+rather than configuring concurrently with the run holding it.
+"""
+
+import fcntl
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+LOCK_PATH = "/run/rlc-cloud-repos/configure.lock"
+DEFAULT_LOCK_TIMEOUT = 120.0
+POLL_INTERVAL = 0.05
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Context manager serialising configuration runs.
+
+    On entry the lock is held and `shared` tells whether a concurrent run
+    with the same key completed while this one waited, in which case its
+    result should be reused. The run doing the work calls complete() once
+    it succeeded.
+
+    Args:
+        path (str): Lock file, defaults to LOCK_PATH.
+        timeout (float): Seconds to wait for the lock before giving up,
+            defaults to DEFAULT_LOCK_TIMEOUT.
+        key (str): Hash of the run's effective arguments; only results of
+            runs with the same key are reused.
+
+    Raises:
+        TimeoutError: On entry, if the lock wasn't acquired in time.
+    """
+
+    def __init__(
+        self, path: str = None, timeout: Optional[float] = None, key: str = ""
+    ):
+        self.path = Path(path or LOCK_PATH)
+        self.timeout = DEFAULT_LOCK_TIMEOUT if timeout is None else timeout
+        self.key = key
+        self.fd = None
+        self.locked = False
+        self.shared = False
+
+    def _state(self) -> Tuple[int, str]:
+        """Reads the generation counter and the key of the run that set it."""
+        try:
+            fields = os.pread(self.fd, 128, 0).decode("ascii").split()
+            return int(fields[0]) if fields else 0, " ".join(fields[1:2])
+        except (OSError, ValueError):
+            return 0, ""
+
+    def _generation(self) -> int:
+        return self._state()[0]
+
+    def _try_lock(self) -> bool:
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def __enter__(self) -> "SingleFlight":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        # Read before queueing so a run finishing meanwhile is noticed
+        start_generation = self._generation()
+        if self._try_lock():
+            self.locked = True
+            return self
+
+        logger.info("Another run is configuring repos, waiting for it")
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            if self._try_lock():
+                self.locked = True
+                generation, key = self._state()
+                self.shared = generation != start_generation and key == self.key
+                return self
+        os.close(self.fd)
+        self.fd = None
+        raise TimeoutError(
+            f"Another run held {self.path} for over {self.timeout:.0f} seconds"
+        )
+
+    def complete(self) -> None:
+        """Publishes that this run's result can be reused by waiting runs."""
+        state = f"{self._generation() + 1} {self.key}".strip()
+        os.ftruncate(self.fd, 0)
+        os.pwrite(self.fd, state.encode("ascii") + b"\n", 0)
+
+    def __exit__(self, *exc_info) -> None:
+        if self.locked:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            self.locked = False
+        os.close(self.fd)
+        self.fd = None
@@ -0,0 +1,189 @@
+"""
+RLC Cloud Repos - Throughput Probing
+
+Time to the first byte of a tiny file says little about how fast a mirror
+sustains large RPM downloads. With `--throughput`, mirrors under the
+`throughput` policy are ranked by downloading a byte range of a large
+object from each candidate concurrently instead. Unless a path is given,
+the object is the largest metadata file the mirror's own repomd.xml lists,
+so it exists on any mirror serving the repository.
+
+The probe is bounded twice: all downloads stop when the time budget runs
+out, and the byte budget is split between the candidates, each asking for
+its share with a Range request. Throughput is counted from the first byte,
+so a slow connect or a slow first answer doesn't skew it.
+"""
+
+import functools
+import http.client
+import logging
+import posixpath
+import socket
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+from rlc.cloud_repos import freshness
+from rlc.cloud_repos.probe import run_bounded
+from rlc.cloud_repos.url_utils import mirror_object_url
+
+# Relative to the mirror URL; $releasever and $basearch are expanded. Empty
+# picks the largest file listed in the mirror's repomd.xml
+DEFAULT_THROUGHPUT_PATH = ""
+DEFAULT_THROUGHPUT_TIMEOUT = 3.0
+DEFAULT_THROUGHPUT_BYTES = 16 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Less than this says more about latency than about bandwidth
+MIN_MEASURED_BYTES = 2 * CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def measure_throughput(url: str, max_bytes: int, deadline: float) -> Optional[float]:
+    """
+    Downloads up to `max_bytes` of an object and measures the rate.
+
+    Args:
+        url (str): Object URL.
+        max_bytes (int): Bytes to request and read at most.
+        deadline (float): time.monotonic() at which to stop reading.
+
+    Returns:
+        Optional[float]: Bytes per second from the first byte on, or None if
+        the object can't be fetched or too little arrived to tell.
+    """
+    timeout = deadline - time.monotonic()
+    if timeout <= 0 or max_bytes <= 0:
+        return None
+    request = urllib.request.Request(url, headers={"Range": f"bytes=0-{max_bytes - 1}"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            # Servers ignoring Range answer 200 with the whole object; the
+            # reads stop at max_bytes either way
+            first = response.read1(min(CHUNK_SIZE, max_bytes))
+            start = time.monotonic()
+            total = len(first)
+            while first and total < max_bytes and time.monotonic() < deadline:
+                chunk = response.read1(min(CHUNK_SIZE, max_bytes - total))
+                if not chunk:
+                    break
+                total += len(chunk)
+            elapsed = time.monotonic() - start
+    except urllib.error.HTTPError as e:
+        logger.debug("Throughput probe of %s failed with HTTP %s", url, e.code)
+        return None
+    except (
+        urllib.error.URLError,
+        http.client.HTTPException,
+        socket.timeout,
+        OSError,
+    ) as e:
+        logger.debug("Throughput probe of %s failed: %s", url, e)
+        return None
+    if total < MIN_MEASURED_BYTES or elapsed <= 0:
+        logger.debug("Throughput probe of %s read too little to tell", url)
+        return None
+    return (total - len(first)) / elapsed
+
+
+def object_url(
+    mirror_url: str, path: str, repomd_path: str, deadline: float
+) -> Optional[str]:
+    """
+    Finds the URL of the object to measure a mirror with.
+
+    Args:
+        mirror_url (str): Mirror base URL.
+        path (str): Object path relative to the mirror; if empty, the
+            largest file listed in the mirror's repomd.xml is used.
+        repomd_path (str): repomd.xml path relative to the mirror.
+        deadline (float): time.monotonic() by which to give up.
+
+    Returns:
+        Optional[str]: Object URL, or None if the repomd.xml can't tell.
+    """
+    if path:
+        return mirror_object_url(mirror_url, path)
+    repomd = mirror_object_url(mirror_url, repomd_path)
+    timeout = deadline - time.monotonic()
+    if timeout <= 0:
+        return None
+    try:
+        with urllib.request.urlopen(repomd, timeout=timeout) as response:
+            document = response.read(freshness.MAX_REPOMD_SIZE)
+    except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError) as e:
+        logger.debug("No repomd.xml from %s to pick an object: %s", repomd, e)
+        return None
+    location = freshness.largest_data_file(document)
+    if not location:
+        return None
+    # Locations are relative to the repository, which holds repodata/
+    return f"{posixpath.dirname(posixpath.dirname(repomd))}/{location}"
+
+
+def _measure_mirror(
+    mirror_url: str, path: str, repomd_path: str, max_bytes: int, deadline: float
+) -> Optional[float]:
+    url = object_url(mirror_url, path, repomd_path, deadline)
+    return measure_throughput(url, max_bytes, deadline) if url else None
+
+
+def probe_throughput(
+    mirror_urls: List[str],
+    path: str = DEFAULT_THROUGHPUT_PATH,
+    timeout: float = DEFAULT_THROUGHPUT_TIMEOUT,
+    byte_budget: int = DEFAULT_THROUGHPUT_BYTES,
+    repomd_path: str = freshness.DEFAULT_REPOMD_PATH,
+) -> Dict[str, Optional[float]]:
+    """
+    Measures the throughput of several mirrors concurrently.
+
+    Args:
+        mirror_urls (List[str]): Mirror base URLs.
+        path (str): Large object's path relative to the mirrors, or empty
+            to pick one from each mirror's repomd.xml.
+        timeout (float): Overall time budget in seconds.
+        byte_budget (int): Bytes downloaded at most, over all mirrors.
+        repomd_path (str): repomd.xml path relative to the mirrors.
+
+    Returns:
+        Dict[str, Optional[float]]: Bytes per second per mirror URL (None if
+        unknown).
+    """
+    unique = list(dict.fromkeys(url for url in mirror_urls if url))
+    if not unique or timeout <= 0:
+        return {}
+
+    deadline = time.monotonic() + timeout
+    share = byte_budget // len(unique)
+    # Downloads stop reading at the deadline; give them a moment to report
+    return run_bounded(
+        {
+            url: functools.partial(
+                _measure_mirror, url, path, repomd_path, share, deadline
+            )
+            for url in unique
+        },
+        timeout + 0.1,
+    )
+
+
+def rank_by_throughput(
+    urls: List[str], results: Dict[str, Optional[float]]
+) -> List[str]:
+    """
+    Orders mirrors by measured throughput, fastest first.
+
+    Mirrors without a measurement keep their relative order at the end.
+
+    Args:
+        urls (List[str]): Candidate URLs in selection order.
+        results (Dict[str, Optional[float]]): Output of probe_throughput().
+
+    Returns:
+        List[str]: Reordered candidate URLs.
+    """
+    measured = [url for url in urls if results.get(url) is not None]
+    unmeasured = [url for url in urls if results.get(url) is None]
+    return sorted(measured, key=lambda url: -results[url]) + unmeasured
@@ -0,0 +1,65 @@
+"""
+RLC Cloud Repos - Mirror URL Helpers
+
+Builds URLs of objects on a mirror from paths given relative to it, the way
+dnf would: `$releasever` and `$basearch` are expanded for this host.
+
+The mirrors in the map are depot roots serving many repositories, so
+paths that need a repository default to BaseOS of this host's release.
+
+Provides: expand_release_vars(), mirror_object_url()
+"""
+
+import platform
+from pathlib import Path
+from typing import Dict
+
+OS_RELEASE_PATH = "/etc/os-release"
+# Repository checked on depot-root mirrors, relative to them
+DEFAULT_REPO_PATH = "$releasever/BaseOS/$basearch/os"
+
+
+def release_vars() -> Dict[str, str]:
+    """
+    Reads the dnf variables relevant to mirror paths.
+
+    Returns:
+        Dict[str, str]: Value per variable, e.g. {"$releasever": "9"}.
+    """
+    releasever = ""
+    try:
+        for line in Path(OS_RELEASE_PATH).read_text().splitlines():
+            if line.startswith("VERSION_ID="):
+                releasever = line.split("=", 1)[1].strip().strip("\"'").split(".")[0]
+    except OSError:
+        pass
+    return {"$releasever": releasever, "$basearch": platform.machine()}
+
+
+def expand_release_vars(path: str) -> str:
+    """
+    Expands dnf-style variables in a path.
+
+    Args:
+        path (str): Path with `$releasever` and `$basearch`.
+
+    Returns:
+        str: The path for this host.
+    """
+    for name, value in release_vars().items():
+        path = path.replace(name, value)
+    return path
+
+
+def mirror_object_url(mirror_url: str, path: str) -> str:
+    """
+    Builds the URL of an object on a mirror, expanding dnf-style variables.
+
+    Args:
+        mirror_url (str): Mirror base URL.
+        path (str): Object path relative to the mirror.
+
+    Returns:
+        str: Absolute object URL.
+    """
+    return f"{mirror_url.rstrip('/')}/{expand_release_vars(path).lstrip('/')}"
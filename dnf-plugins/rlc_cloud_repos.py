@@ -0,0 +1,30 @@
+# dnf-plugins/rlc_cloud_repos.py
+"""
+DNF plugin: wait for background RLC cloud repo configuration.
+
+When rlc-cloud-repos runs with --background, dnf may start before the
+mirror vars are written. This plugin waits for the background run to
+finish (only if one is still in progress) and reloads /etc/dnf/vars so the
+freshly written mirrors are used.
+"""
+
+import dnf
+
+from rlc.cloud_repos.readiness import DEFAULT_WAIT_TIMEOUT, wait_until_ready
+
+
+class RlcCloudRepos(dnf.Plugin):
+    name = "rlc_cloud_repos"
+
+    def pre_config(self):
+        timeout = DEFAULT_WAIT_TIMEOUT
+        conf = self.read_config(self.base.conf)
+        if conf.has_section("main") and conf.has_option("main", "timeout"):
+            timeout = float(conf.get("main", "timeout"))
+
+        if wait_until_ready(timeout) is None:
+            return
+        # Vars were read before plugins ran; pick up what was just written
+        self.base.conf.substitutions.update_from_etc(
+            self.base.conf.installroot, varsdir=self.base.conf.varsdir
+        )
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""Summarize fleet run reports with streaming percentiles.
+
+Reads the JSONL run reports written by `rlc-cloud-repos --report` (plain or
+gzip-compressed, any number of files) one line at a time and computes
+per-region and per-mirror p50/p95/p99 latencies and fallback rates.
+
+Latencies go into fixed-accuracy quantile sketches (logarithmic buckets, as
+in DDSketch), so memory depends on the number of regions and mirrors and on
+the spread of the latencies, never on the number of records. Sketches merge
+exactly, so `--jobs N` aggregates files in parallel and combines the results.
+"""
+
+import functools
+import gzip
+import json
+import math
+import multiprocessing
+import sys
+from collections import Counter
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import yaml
+
+try:
+    import configargparse
+except ImportError:  # pragma: no cover
+    print("Error: configargparse is required. Install with: pip -e install framework")
+    sys.exit(1)
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BUCKETS = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+# Latencies at or below this (seconds) are counted as zero
+MIN_LATENCY = 1e-6
+
+Samples = List[Tuple[str, Optional[int]]]
+
+
+class QuantileSketch:
+    """Mergeable streaming quantile sketch with relative-error guarantees.
+
+    Values are counted in logarithmically sized buckets, so every quantile
+    estimate is within `relative_accuracy` of a value of the right rank. If
+    the data spans more than `max_buckets` buckets, the lowest buckets are
+    collapsed, which only costs accuracy on the smallest values.
+
+    Args:
+        relative_accuracy: Maximum relative error of quantile estimates
+        max_buckets: Upper bound on the number of buckets kept
+    """
+
+    def __init__(
+        self,
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+        max_buckets: int = DEFAULT_MAX_BUCKETS,
+    ):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def index(self, value: float) -> Optional[int]:
+        """Bucket index of a value, None for values counted as zero."""
+        if value <= MIN_LATENCY:
+            return None
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def add(self, value: float, count: int = 1) -> None:
+        """Add a non-negative value."""
+        self.add_index(self.index(value), count)
+
+    def add_index(self, index: Optional[int], count: int = 1) -> None:
+        """Add a value by its precomputed index(); saves the logarithm when
+        the same value goes into several sketches."""
+        self.count += count
+        if index is None:
+            self.zero_count += count
+            return
+        buckets = self.buckets
+        buckets[index] = buckets.get(index, 0) + count
+        if len(buckets) > self.max_buckets:
+            self._collapse()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Fold another sketch with the same accuracy into this one."""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        """Fold the lowest buckets together until the bound holds again."""
+        indexes = sorted(self.buckets)
+        excess = len(indexes) - self.max_buckets + 1
+        folded = sum(self.buckets.pop(index) for index in indexes[:excess])
+        target = indexes[excess]
+        self.buckets[target] += folded
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the q-quantile (0 <= q <= 1); None if the sketch is empty."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Midpoint of the bucket in relative terms
+                return 2 * self.gamma**index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class GroupStats:
+    """Counts and latency sketches for one region or mirror.
+
+    Args:
+        relative_accuracy: Accuracy of the latency sketches
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.runs = 0
+        self.failures = 0
+        self.with_fallback = 0
+        self.fallbacks = Counter()
+        self.latency: Dict[str, QuantileSketch] = {}
+
+    def add(self, ok: bool, fallbacks: List[str], samples: Samples) -> None:
+        """Account for one run report.
+
+        Args:
+            ok: Whether the run succeeded
+            fallbacks: Fallback flags of the run
+            samples: (latency name, sketch index) pairs
+        """
+        self.runs += 1
+        if not ok:
+            self.failures += 1
+        if fallbacks:
+            self.with_fallback += 1
+            self.fallbacks.update(fallbacks)
+        latency = self.latency
+        for name, index in samples:
+            sketch = latency.get(name)
+            if sketch is None:
+                sketch = latency[name] = QuantileSketch(self.relative_accuracy)
+            sketch.add_index(index)
+
+    def merge(self, other: "GroupStats") -> None:
+        """Fold the statistics of another GroupStats into this one."""
+        self.runs += other.runs
+        self.failures += other.failures
+        self.with_fallback += other.with_fallback
+        self.fallbacks.update(other.fallbacks)
+        for name, sketch in other.latency.items():
+            if name in self.latency:
+                self.latency[name].merge(sketch)
+            else:
+                self.latency[name] = sketch
+
+    def summary(self) -> Dict[str, Any]:
+        """Rates and latency percentiles (milliseconds) of the group."""
+        latency = {}
+        for name in sorted(self.latency, key=lambda n: (n != "total", n)):
+            sketch = self.latency[name]
+            latency[name] = {
+                f"p{int(q * 100)}": round(sketch.quantile(q) * 1000.0, 1)
+                for q in QUANTILES
+            }
+        return {
+            "runs": self.runs,
+            "failure_rate": round(self.failures / self.runs, 4),
+            "fallback_rate": round(self.with_fallback / self.runs, 4),
+            "fallbacks": {
+                flag: round(count / self.runs, 4)
+                for flag, count in sorted(self.fallbacks.items())
+            },
+            "latency_ms": latency,
+        }
+
+
+class ReportAggregator:
+    """Streams run reports into per-region and per-mirror statistics.
+
+    Args:
+        relative_accuracy: Accuracy of the latency sketches
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.indexer = QuantileSketch(relative_accuracy)
+        self.records = 0
+        self.skipped = 0
+        self.fleet = GroupStats(relative_accuracy)
+        self.regions: Dict[str, GroupStats] = {}
+        self.mirrors: Dict[str, GroupStats] = {}
+
+    def _group(self, groups: Dict[str, GroupStats], key: str) -> GroupStats:
+        stats = groups.get(key)
+        if stats is None:
+            stats = groups[key] = GroupStats(self.relative_accuracy)
+        return stats
+
+    def add(self, report: Dict[str, Any]) -> None:
+        """Account for one decoded run report; a report whose phases or
+        fallbacks have the wrong shape is counted as skipped."""
+        phases = report.get("phases") or {}
+        fallbacks = report.get("fallbacks") or []
+        if not isinstance(phases, dict) or not (
+            isinstance(fallbacks, list)
+            and all(isinstance(flag, str) for flag in fallbacks)
+        ):
+            self.skipped += 1
+            return
+        self.records += 1
+        # Bucket each latency once, it goes into three groups
+        index = self.indexer.index
+        samples = []
+        total = report.get("total")
+        if isinstance(total, (int, float)):
+            samples.append(("total", index(total)))
+        for phase, seconds in phases.items():
+            if isinstance(seconds, (int, float)):
+                samples.append((phase, index(seconds)))
+        ok = report.get("ok", True)
+
+        self.fleet.add(ok, fallbacks, samples)
+        region = f"{report.get('provider') or 'unknown'}/{report.get('region') or ''}"
+        self._group(self.regions, region).add(ok, fallbacks, samples)
+        if report.get("mirror"):
+            self._group(self.mirrors, report["mirror"]).add(ok, fallbacks, samples)
+
+    def add_lines(self, lines: Iterable[str]) -> None:
+        """Decode and add JSONL lines, skipping blank and malformed ones."""
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                report = json.loads(line)
+            except ValueError:
+                self.skipped += 1
+                continue
+            if not isinstance(report, dict):
+                self.skipped += 1
+                continue
+            self.add(report)
+
+    def merge(self, other: "ReportAggregator") -> None:
+        """Fold another aggregator, e.g. of a different file, into this one."""
+        self.records += other.records
+        self.skipped += other.skipped
+        self.fleet.merge(other.fleet)
+        for mine, theirs in (
+            (self.regions, other.regions),
+            (self.mirrors, other.mirrors),
+        ):
+            for key, stats in theirs.items():
+                if key in mine:
+                    mine[key].merge(stats)
+                else:
+                    mine[key] = stats
+
+    def summary(self) -> Dict[str, Any]:
+        """Fleet, per-region and per-mirror summaries."""
+        return {
+            "records": self.records,
+            "skipped": self.skipped,
+            "fleet": self.fleet.summary() if self.records else {},
+            "regions": {k: v.summary() for k, v in sorted(self.regions.items())},
+            "mirrors": {k: v.summary() for k, v in sorted(self.mirrors.items())},
+        }
+
+
+def open_report(file_path: str) -> IO[str]:
+    """Open a report file, transparently decompressing `.gz` files."""
+    if file_path == "-":
+        return sys.stdin
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, "rt", encoding="utf-8", errors="replace")
+    return open(file_path, "r", encoding="utf-8", errors="replace")
+
+
+def iter_lines(file_paths: List[str]) -> Iterator[str]:
+    """Yield the lines of several report files in turn.
+
+    Args:
+        file_paths: Report files, `-` for stdin
+
+    Yields:
+        Lines, one at a time
+    """
+    for file_path in file_paths:
+        f = open_report(file_path)
+        try:
+            for line in f:
+                yield line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def aggregate_file(file_path: str, relative_accuracy: float) -> ReportAggregator:
+    """Aggregate a single report file.
+
+    Args:
+        file_path: Report file
+        relative_accuracy: Accuracy of the latency sketches
+
+    Returns:
+        The file's aggregator
+    """
+    aggregator = ReportAggregator(relative_accuracy)
+    aggregator.add_lines(iter_lines([file_path]))
+    return aggregator
+
+
+def aggregate(
+    file_paths: List[str],
+    relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+    jobs: int = 1,
+) -> ReportAggregator:
+    """Aggregate report files, several at a time with `jobs` > 1.
+
+    Files are aggregated independently and the results merged, which the
+    sketches allow without losing accuracy.
+
+    Args:
+        file_paths: Report files, `-` for stdin
+        relative_accuracy: Accuracy of the latency sketches
+        jobs: Number of worker processes
+
+    Returns:
+        Aggregator over all files
+    """
+    total = ReportAggregator(relative_accuracy)
+    if jobs <= 1 or len(file_paths) <= 1 or "-" in file_paths:
+        total.add_lines(iter_lines(file_paths))
+        return total
+    with multiprocessing.Pool(min(jobs, len(file_paths))) as pool:
+        for aggregator in pool.imap_unordered(
+            functools.partial(aggregate_file, relative_accuracy=relative_accuracy),
+            file_paths,
+        ):
+            total.merge(aggregator)
+    return total
+
+
+def parse_args(args=None):
+    """Parse command line arguments with configargparse.
+
+    Args:
+        args: Command line arguments (uses sys.argv if None)
+
+    Returns:
+        Parsed arguments
+    """
+    parser = configargparse.ArgumentParser(
+        description="Summarize rlc-cloud-repos run reports.",
+        default_config_files=[
+            "~/.config/rlc-boot-reports.conf",
+            "/etc/rlc-boot-reports.conf",
+        ],
+        config_file_parser_class=configargparse.YAMLConfigFileParser,
+    )
+
+    parser.add_argument(
+        "-c",
+        "--config",
+        is_config_file=True,
+        help="Config file path",
+    )
+
+    parser.add_argument(
+        "reports",
+        nargs="+",
+        help="JSONL run report files (.gz allowed, - for stdin)",
+    )
+
+    parser.add_argument(
+        "--relative-accuracy",
+        type=float,
+        env_var="REPORT_RELATIVE_ACCURACY",
+        default=DEFAULT_RELATIVE_ACCURACY,
+        help=f"Relative accuracy of percentiles (default: {DEFAULT_RELATIVE_ACCURACY})",
+    )
+
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        env_var="REPORT_JOBS",
+        default=1,
+        help="Worker processes, each aggregating whole files (default: 1)",
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Main entry point for the script.
+
+    Args:
+        args: Command line arguments (uses sys.argv if None)
+
+    Returns:
+        Exit code (0 for success, non-zero for error)
+    """
+    try:
+        parsed_args = parse_args(args)
+
+        aggregator = aggregate(
+            parsed_args.reports, parsed_args.relative_accuracy, parsed_args.jobs
+        )
+        print(yaml.dump(aggregator.summary(), default_flow_style=False))
+        return 0
+
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""Stream-parse provider IP-range feeds to derive region lists.
+
+Feeds such as AWS ip-ranges.json are several megabytes. They are read in
+fixed size chunks and decoded one array element at a time, so memory use
+is bounded by the chunk size plus the largest single element rather than by
+the size of the document.
+"""
+
+import json
+import re
+import sys
+from typing import IO, Any, Dict, Iterator, Set, Tuple
+
+import yaml
+
+from rlc.cloud_repos.ip_region import PrefixIndex
+
+try:
+    import configargparse
+except ImportError:  # pragma: no cover
+    print("Error: configargparse is required. Install with: pip -e install framework")
+    sys.exit(1)
+
+CHUNK_SIZE = 64 * 1024
+PROVIDERS = ("aws", "azure", "gcp", "oracle")
+
+Record = Tuple[str, str]
+
+
+class JsonArrayStream:
+    """Incrementally decode the elements of named arrays in a JSON document.
+
+    Arrays are located by their key, in document order, so several arrays
+    of the same document can be read one after the other.
+
+    Args:
+        fp: Text file object positioned at the start of the document
+        chunk_size: Number of characters read at a time
+    """
+
+    def __init__(self, fp: IO[str], chunk_size: int = CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """Drop consumed input and read the next chunk."""
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        consumed = self.pos
+        self.buffer = self.buffer[consumed:] + chunk
+        self.pos = 0
+        return True
+
+    def _seek_array(self, key: str) -> bool:
+        """Advance past `"key": [`, returns False if the key never shows up."""
+        pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        while True:
+            match = pattern.search(self.buffer, self.pos)
+            if match:
+                self.pos = match.end()
+                return True
+            # Keep enough of the tail to match a key split across chunks
+            self.pos = max(self.pos, len(self.buffer) - len(key) - 64)
+            if not self._fill():
+                return False
+
+    def _skip(self, characters: str) -> str:
+        """Skip the given characters, returns the next one (or '' at EOF)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in characters:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def iter_array(self, key: str) -> Iterator[Any]:
+        """Yield the elements of the next array stored under `key`.
+
+        Args:
+            key: Object key holding the array
+
+        Yields:
+            Decoded array elements
+        """
+        if not self._seek_array(key):
+            return
+        while True:
+            if self._skip(" \t\r\n,") in ("]", ""):
+                self.pos += 1
+                return
+            while True:
+                try:
+                    element, self.pos = self.decoder.raw_decode(self.buffer, self.pos)
+                    break
+                except ValueError:
+                    # Element continues in the next chunk
+                    if not self._fill():
+                        raise
+            yield element
+
+
+def iter_aws(fp: IO[str]) -> Iterator[Record]:
+    """Yield (prefix, region) pairs from AWS ip-ranges.json."""
+    stream = JsonArrayStream(fp)
+    for array, field in (("prefixes", "ip_prefix"), ("ipv6_prefixes", "ipv6_prefix")):
+        for entry in stream.iter_array(array):
+            if entry.get("region") and entry["region"] != "GLOBAL":
+                yield entry[field], entry["region"]
+
+
+def iter_gcp(fp: IO[str]) -> Iterator[Record]:
+    """Yield (prefix, region) pairs from GCP cloud.json."""
+    for entry in JsonArrayStream(fp).iter_array("prefixes"):
+        prefix = entry.get("ipv4Prefix") or entry.get("ipv6Prefix")
+        if prefix and entry.get("scope") and entry["scope"] != "global":
+            yield prefix, entry["scope"]
+
+
+def iter_azure(fp: IO[str]) -> Iterator[Record]:
+    """Yield (prefix, region) pairs from Azure ServiceTags_Public.json.
+
+    Only the regional `AzureCloud.<region>` tags are used; the per-service
+    tags are subsets of them.
+    """
+    for tag in JsonArrayStream(fp).iter_array("values"):
+        properties = tag.get("properties", {})
+        region = properties.get("region")
+        if region and tag.get("name", "").startswith("AzureCloud."):
+            for prefix in properties.get("addressPrefixes", []):
+                yield prefix, region
+
+
+def iter_oracle(fp: IO[str]) -> Iterator[Record]:
+    """Yield (prefix, region) pairs from OCI public_ip_ranges.json."""
+    for entry in JsonArrayStream(fp).iter_array("regions"):
+        for cidr in entry.get("cidrs", []):
+            yield cidr["cidr"], entry["region"]
+
+
+FEED_PARSERS = {
+    "aws": iter_aws,
+    "azure": iter_azure,
+    "gcp": iter_gcp,
+    "oracle": iter_oracle,
+}
+
+
+def iter_feed(provider: str, file_path: str) -> Iterator[Record]:
+    """Stream (prefix, region) pairs from a provider feed on disk.
+
+    Args:
+        provider: One of PROVIDERS
+        file_path: Path to the provider's feed
+
+    Yields:
+        (prefix, region) pairs
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        for record in FEED_PARSERS[provider](f):
+            yield record
+
+
+def extract_regions(records: Iterator[Record]) -> Set[str]:
+    """Collect the distinct regions of a feed.
+
+    Args:
+        records: (prefix, region) pairs
+
+    Returns:
+        Set of region names
+    """
+    return {region for _, region in records}
+
+
+def missing_regions(
+    provider: str, regions: Set[str], mirror_map: Dict[str, Any]
+) -> Set[str]:
+    """Find regions that have no entry in the mirror map.
+
+    Args:
+        provider: Provider section of the mirror map
+        regions: Regions found in the provider feed
+        mirror_map: Parsed mirror map
+
+    Returns:
+        Regions falling back to the provider default
+    """
+    return regions - set(mirror_map.get(provider) or {})
+
+
+def parse_args(args=None):
+    """Parse command line arguments with configargparse.
+
+    Args:
+        args: Command line arguments (uses sys.argv if None)
+
+    Returns:
+        Parsed arguments
+    """
+    parser = configargparse.ArgumentParser(
+        description="Derive region lists from provider IP-range feeds.",
+        default_config_files=[
+            "~/.config/rlc-ip-ranges.conf",
+            "/etc/rlc-ip-ranges.conf",
+        ],
+        config_file_parser_class=configargparse.YAMLConfigFileParser,
+    )
+
+    parser.add_argument(
+        "-c",
+        "--config",
+        is_config_file=True,
+        help="Config file path",
+    )
+
+    for provider in PROVIDERS:
+        parser.add_argument(
+            f"--{provider}",
+            env_var=f"{provider.upper()}_IP_RANGES_PATH",
+            help=f"Path to the {provider} IP-range feed",
+        )
+
+    parser.add_argument(
+        "--mirrors",
+        env_var="CIQ_MIRRORS_PATH",
+        default="data/ciq-mirrors.yaml",
+        help="Path to the mirrors YAML file (default: data/ciq-mirrors.yaml)",
+    )
+
+    parser.add_argument(
+        "--index-out",
+        env_var="IP_INDEX_PATH",
+        help="Write a region prefix index for instances without a region",
+    )
+
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        env_var="VERIFY_ONLY",
+        help="Exit non-zero if any feed region is missing from the mirrors file",
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Main entry point for the script.
+
+    Args:
+        args: Command line arguments (uses sys.argv if None)
+
+    Returns:
+        Exit code (0 for success, non-zero for error)
+    """
+    try:
+        parsed_args = parse_args(args)
+
+        with open(parsed_args.mirrors, "r") as f:
+            mirror_map = yaml.safe_load(f)
+
+        report = {}
+        for provider in PROVIDERS:
+            feed = getattr(parsed_args, provider)
+            if not feed:
+                continue
+            regions = extract_regions(iter_feed(provider, feed))
+            report[provider] = {
+                "regions": sorted(regions),
+                "missing": sorted(missing_regions(provider, regions, mirror_map)),
+            }
+
+        print(yaml.dump(report, default_flow_style=False))
+
+        if parsed_args.index_out:
+            feeds = [(p, getattr(parsed_args, p)) for p in PROVIDERS]
+            index = PrefixIndex.build(
+                (prefix, provider, region)
+                for provider, feed in feeds
+                if feed
+                for prefix, region in iter_feed(provider, feed)
+            )
+            index.save(parsed_args.index_out)
+
+        if parsed_args.verify and any(r["missing"] for r in report.values()):
+            return 1
+        return 0
+
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""Benchmark how mirror map loading and selection scale with the map size.
+
+Synthetic maps with hundreds to millions of region entries, spread over the
+providers, are written both as a single file and as shards. For each size
+the benchmark measures:
+
+- parse: load_mirror_map() of the single file, seconds
+- parse_shard: load_mirror_map() of one provider's shard, seconds
+- memory: peak bytes allocated while loading the single file
+- hit: select_mirror() for a mapped region, seconds per lookup
+- miss: select_mirror() falling back to a provider or the global default,
+  seconds per lookup
+
+Without `--sizes`, the benchmark runs at the sizes the baseline was
+recorded at, so slopes are compared over the same range of entries. Only
+a baseline that doesn't record them falls back to DEFAULT_SIZES, which
+reach a million entries, as fleets' maps can, and take tens of minutes and
+several GB of memory.
+
+Absolute numbers depend on the machine, so regressions are judged on how
+each metric grows: the slope of log(metric) over log(entries), where 1 is
+linear and 0 is constant. A run fails if a slope exceeds the stored
+baseline's by more than the tolerance.
+"""
+
+import contextlib
+import io
+import json
+import math
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import yaml
+
+from rlc.cloud_repos.repo_config import load_mirror_map, select_mirror
+
+try:
+    import configargparse
+except ImportError:  # pragma: no cover
+    print("Error: configargparse is required. Install with: pip -e install framework")
+    sys.exit(1)
+
+PROVIDERS = ("aws", "azure", "gcp", "oracle")
+METRICS = ("parse", "parse_shard", "memory", "hit", "miss")
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+DEFAULT_LOOKUPS = 2000
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.3
+BASELINE_PATH = Path(__file__).with_name("map_bench_baseline.json")
+DEFAULT_ENTRY = (
+    "primary: https://default.example.com\nbackup: https://backup.example.com\n"
+)
+
+
+def _region_lines(provider: str, count: int, indent: int):
+    pad = " " * indent
+    for name in [f"{provider}-region-{n}" for n in range(count)] + ["default"]:
+        yield (
+            f"{pad}{name}:\n"
+            f"{pad}  primary: https://{provider}.{name}.example.com\n"
+            f"{pad}  backup: https://{provider}.{name}.backup.example.com\n"
+        )
+
+
+def write_synthetic_map(entries: int, directory: str) -> Tuple[Path, Path]:
+    """Write a synthetic mirror map in both layouts.
+
+    Args:
+        entries: Region entries, spread evenly over PROVIDERS
+        directory: Directory to write into
+
+    Returns:
+        Paths of the single file and of the shard directory
+    """
+    per_provider = max(1, entries // len(PROVIDERS))
+    single = Path(directory) / "mirrors.yaml"
+    shards = Path(directory) / "mirrors.d"
+    shards.mkdir()
+    with single.open("w") as f:
+        for provider in PROVIDERS:
+            f.write(f"{provider}:\n")
+            f.writelines(_region_lines(provider, per_provider, 2))
+            with (shards / f"{provider}.yaml").open("w") as shard:
+                shard.writelines(_region_lines(provider, per_provider, 0))
+        f.write("default:\n")
+        f.writelines(f"  {line}\n" for line in DEFAULT_ENTRY.splitlines())
+    (shards / "default.yaml").write_text(DEFAULT_ENTRY)
+    return single, shards
+
+
+def _best_time(func: Callable[[], Any], repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _lookup_time(
+    mirror_map: Dict[str, Any], lookups: List[Dict[str, str]], repeat: int
+) -> float:
+    def run():
+        for metadata in lookups:
+            select_mirror(metadata, mirror_map)
+
+    # select_mirror() reports every decision on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        return _best_time(run, repeat) / len(lookups)
+
+
+def measure(
+    entries: int, lookups: int = DEFAULT_LOOKUPS, repeat: int = DEFAULT_REPEAT
+) -> Dict[str, float]:
+    """Measure every metric for a synthetic map of the given size.
+
+    Args:
+        entries: Region entries in the map
+        lookups: select_mirror() calls per timing of hits and misses
+        repeat: Timings per metric, the fastest is kept
+
+    Returns:
+        Value per metric, see the module docstring
+    """
+    per_provider = max(1, entries // len(PROVIDERS))
+    rng = random.Random(entries)
+    hits = []
+    misses = []
+    for n in range(lookups):
+        provider = rng.choice(PROVIDERS)
+        hits.append(
+            {
+                "provider": provider,
+                "region": f"{provider}-region-{rng.randrange(per_provider)}",
+                "instance_id": f"i-{n}",
+            }
+        )
+        # Half fall back to the provider's default, half to the global one
+        misses.append(
+            {
+                "provider": provider if n % 2 else f"unknown-{n}",
+                "region": f"unmapped-{n}",
+                "instance_id": f"i-{n}",
+            }
+        )
+
+    with tempfile.TemporaryDirectory() as directory:
+        single, shards = write_synthetic_map(entries, directory)
+        results = {
+            "parse": _best_time(lambda: load_mirror_map(str(single)), repeat),
+            "parse_shard": _best_time(
+                lambda: load_mirror_map(str(shards), PROVIDERS[0]), repeat
+            ),
+        }
+        tracemalloc.start()
+        try:
+            mirror_map = load_mirror_map(str(single))
+            results["memory"] = float(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    results["hit"] = _lookup_time(mirror_map, hits, repeat)
+    results["miss"] = _lookup_time(mirror_map, misses, repeat)
+    return results
+
+
+def scaling_exponents(results: Dict[int, Dict[str, float]]) -> Dict[str, float]:
+    """Fit how each metric grows with the number of entries.
+
+    Args:
+        results: measure() output keyed by entries, at least two sizes
+
+    Returns:
+        Least-squares slope of log(metric) over log(entries) per metric
+    """
+    sizes = sorted(results)
+    if len(sizes) < 2:
+        raise ValueError("Scaling needs at least two map sizes")
+    xs = [math.log(size) for size in sizes]
+    mean_x = sum(xs) / len(xs)
+    exponents = {}
+    for metric in METRICS:
+        ys = [math.log(max(results[size][metric], 1e-12)) for size in sizes]
+        mean_y = sum(ys) / len(ys)
+        exponents[metric] = round(
+            sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+            / sum((x - mean_x) ** 2 for x in xs),
+            3,
+        )
+    return exponents
+
+
+def regressions(
+    exponents: Dict[str, float],
+    baseline: Dict[str, float],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> List[str]:
+    """Compare scaling exponents with a baseline.
+
+    Args:
+        exponents: scaling_exponents() of this run
+        baseline: Exponents of the baseline run
+        tolerance: Growth allowed above the baseline's exponent
+
+    Returns:
+        Descriptions of the metrics that scale worse than the baseline
+    """
+    return [
+        f"{metric} grows as entries^{exponents[metric]}, baseline "
+        f"entries^{baseline[metric]}"
+        for metric in METRICS
+        if metric in baseline and exponents[metric] > baseline[metric] + tolerance
+    ]
+
+
+def parse_args(args=None):
+    """Parse command line arguments with configargparse.
+
+    Args:
+        args: Command line arguments (uses sys.argv if None)
+
+    Returns:
+        Parsed arguments
+    """
+    parser = configargparse.ArgumentParser(
+        description="Benchmark mirror map loading and selection at scale.",
+    )
+    parser.add_argument(
+        "--sizes",
+        help="Comma-separated map sizes in region entries (default: the "
+        "baseline's, else {})".format(",".join(str(size) for size in DEFAULT_SIZES)),
+    )
+    parser.add_argument(
+        "--lookups",
+        type=int,
+        default=DEFAULT_LOOKUPS,
+        help=f"Lookups per timing (default: {DEFAULT_LOOKUPS})",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help=f"Timings per metric, the fastest is kept (default: {DEFAULT_REPEAT})",
+    )
+    parser.add_argument(
+        "--baseline",
+        default=str(BASELINE_PATH),
+        help="Baseline JSON file (default: the one shipped with the framework)",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"Exponent growth allowed over the baseline (default: {DEFAULT_TOLERANCE})",
+    )
+    parser.add_argument(
+        "--write-baseline",
+        action="store_true",
+        help="Store this run as the baseline instead of checking against it",
+    )
+    return parser.parse_args(args)
+
+
+def baseline_sizes(path: str) -> List[int]:
+    """Sizes a baseline was recorded at, or DEFAULT_SIZES if it has none.
+
+    Args:
+        path: Baseline JSON file
+
+    Returns:
+        Map sizes in region entries, ascending
+    """
+    try:
+        with open(path, "r") as f:
+            sizes = json.load(f).get("sizes")
+    except (OSError, ValueError, AttributeError):
+        sizes = None
+    return sorted(int(size) for size in sizes or DEFAULT_SIZES)
+
+
+def main(args=None):
+    """Main entry point for the script.
+
+    Args:
+        args: Command line arguments (uses sys.argv if None)
+
+    Returns:
+        Exit code (0 if nothing regressed, non-zero otherwise)
+    """
+    try:
+        parsed_args = parse_args(args)
+        if parsed_args.sizes:
+            sizes = sorted({int(size) for size in parsed_args.sizes.split(",")})
+        else:
+            sizes = baseline_sizes(parsed_args.baseline)
+        results = {
+            size: measure(size, parsed_args.lookups, parsed_args.repeat)
+            for size in sizes
+        }
+        exponents = scaling_exponents(results)
+        print(
+            yaml.dump(
+                {"results": results, "exponents": exponents}, default_flow_style=False
+            )
+        )
+
+        if parsed_args.write_baseline:
+            with open(parsed_args.baseline, "w") as f:
+                json.dump({"sizes": sizes, "exponents": exponents}, f, indent=2)
+                f.write("\n")
+            return 0
+
+        with open(parsed_args.baseline, "r") as f:
+            baseline = json.load(f)
+        failures = regressions(exponents, baseline["exponents"], parsed_args.tolerance)
+        for failure in failures:
+            print(f"Regression: {failure}", file=sys.stderr)
+        return 1 if failures else 0
+
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
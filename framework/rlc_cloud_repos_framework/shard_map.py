@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Split a single-file mirror map into per-provider shards.
+
+The resulting directory holds one `<provider>.yaml` per provider plus
+`default.yaml`, each with the value of that top-level key, and can be
+passed to rlc-cloud-repos as `--mirror-file`. Instances then only parse
+the shard of the provider they run on. YAML anchors are resolved while
+splitting, since they can't reach across files.
+"""
+
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+import yaml
+
+try:
+    import configargparse
+except ImportError:  # pragma: no cover
+    print("Error: configargparse is required. Install with: pip -e install framework")
+    sys.exit(1)
+
+from rlc.cloud_repos import repo_config
+
+
+class _NoAliasDumper(yaml.SafeDumper):
+    """Dumper writing shared entries out in full instead of as aliases."""
+
+    def ignore_aliases(self, data):
+        return True
+
+
+def write_shards(mirror_map: Dict[str, Any], output_dir: str) -> List[Path]:
+    """Write each top-level section of a mirror map to its own shard.
+
+    Shards of sections no longer in the map are removed.
+
+    Args:
+        mirror_map: Mirror map in the single-file layout
+        output_dir: Shard directory, created if missing
+
+    Returns:
+        Paths of the shards written
+
+    Raises:
+        ValueError: If the map has no default entry or a section name
+            can't be used as a file name
+    """
+    if repo_config.DEFAULT_SHARD not in mirror_map:
+        raise ValueError("Mirror map must have a default entry")
+    for name in mirror_map:
+        if not repo_config.SHARD_NAME.match(str(name)):
+            raise ValueError(f"Section {name!r} can't be used as a shard name")
+
+    directory = Path(output_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    written = []
+    for name, section in mirror_map.items():
+        shard = directory / f"{str(name).lower()}{repo_config.SHARD_SUFFIX}"
+        tmp = shard.with_name(f".{shard.name}.tmp")
+        tmp.write_text(
+            yaml.dump(section, Dumper=_NoAliasDumper, default_flow_style=False)
+        )
+        tmp.rename(shard)
+        written.append(shard)
+    for stale in directory.glob(f"*{repo_config.SHARD_SUFFIX}"):
+        if stale not in written and not stale.name.startswith("."):
+            stale.unlink()
+    return written
+
+
+def parse_args(args=None):
+    """Parse command line arguments with configargparse.
+
+    Args:
+        args: Command line arguments (uses sys.argv if None)
+
+    Returns:
+        Parsed arguments
+    """
+    parser = configargparse.ArgumentParser(
+        description="Split a mirror map into per-provider shards.",
+    )
+    parser.add_argument(
+        "--mirrors",
+        env_var="CIQ_MIRRORS_PATH",
+        default="data/ciq-mirrors.yaml",
+        help="Path to the single-file mirror map (default: data/ciq-mirrors.yaml)",
+    )
+    parser.add_argument(
+        "--output",
+        env_var="OUTPUT_PATH",
+        required=True,
+        help="Directory to write the shards to",
+    )
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Main entry point for the script.
+
+    Args:
+        args: Command line arguments (uses sys.argv if None)
+
+    Returns:
+        Exit code (0 for success, non-zero for error)
+    """
+    parsed_args = parse_args(args)
+    try:
+        shards = write_shards(
+            repo_config.load_mirror_map(parsed_args.mirrors), parsed_args.output
+        )
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    for shard in shards:
+        print(shard)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
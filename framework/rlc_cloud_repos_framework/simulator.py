@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""Replay a boot population through the mirror selection policy.
+
+Estimates what a change to ciq-mirrors.yaml does to fleet latency and
+per-mirror load before it ships. Boots are aggregated per
+provider/region/zone, so replaying millions of them only costs one policy
+evaluation per sampled instance of each group.
+"""
+
+import contextlib
+import importlib
+import io
+import json
+import sys
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+import yaml
+
+from rlc.cloud_repos.repo_config import select_mirror
+
+try:
+    import configargparse
+except ImportError:  # pragma: no cover
+    print("Error: configargparse is required. Install with: pip -e install framework")
+    sys.exit(1)
+
+DEFAULT_LATENCY_MS = 100.0
+DEFAULT_SAMPLE = 64
+SYNTHETIC_ZONES = ("a", "b", "c")
+# Utilization at which the queueing model stops growing, keeps numbers finite
+MAX_UTILIZATION = 0.95
+
+Group = Tuple[str, str, str]
+Policy = Callable[[Dict[str, str], Dict[str, Any]], Tuple[str, str]]
+
+
+def load_population(file_path: str) -> Counter:
+    """Load an aggregated boot population.
+
+    Args:
+        file_path: YAML or JSON list of entries with provider, region,
+            optional zone and count
+
+    Returns:
+        Boot counts keyed by (provider, region, zone)
+    """
+    with open(file_path, "r") as f:
+        entries = yaml.safe_load(f) or []
+    population = Counter()
+    for entry in entries:
+        group = (entry["provider"], entry["region"], entry.get("zone", ""))
+        population[group] += int(entry.get("count", 1))
+    return population
+
+
+def read_boot_log(lines: Iterable[str]) -> Counter:
+    """Aggregate recorded boots, one JSON object per line.
+
+    Args:
+        lines: JSONL lines with provider, region and optional zone
+
+    Returns:
+        Boot counts keyed by (provider, region, zone)
+    """
+    population = Counter()
+    for line in lines:
+        if not line.strip():
+            continue
+        boot = json.loads(line)
+        population[(boot["provider"], boot["region"], boot.get("zone", ""))] += 1
+    return population
+
+
+def synthetic_population(mirror_map: Dict[str, Any], boots: int) -> Counter:
+    """Spread boots evenly over every provider/region/zone in the map.
+
+    Args:
+        mirror_map: Parsed mirror map
+        boots: Total number of boots to generate
+
+    Returns:
+        Boot counts keyed by (provider, region, zone)
+    """
+    groups = [
+        (provider, region, zone)
+        for provider, regions in mirror_map.items()
+        if provider != "default"
+        for region in regions
+        if region != "default"
+        for zone in SYNTHETIC_ZONES
+    ]
+    population = Counter()
+    if not groups:
+        return population
+    share, remainder = divmod(boots, len(groups))
+    for index, group in enumerate(groups):
+        population[group] = share + (1 if index < remainder else 0)
+    return population
+
+
+def load_policy(spec: str) -> Policy:
+    """Import a selection policy given as 'module:function'.
+
+    Args:
+        spec: Import path of a callable taking (metadata, mirror_map)
+
+    Returns:
+        The policy callable
+    """
+    module_name, _, function_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def assign_mirrors(
+    population: Counter,
+    mirror_map: Dict[str, Any],
+    policy: Policy = select_mirror,
+    sample: int = DEFAULT_SAMPLE,
+) -> Counter:
+    """Run the policy for every group of the population.
+
+    Each group is evaluated for `sample` synthetic instance ids and its boots
+    are split over the chosen mirrors in the same proportions, which keeps
+    instance-id hashed pools realistic without one call per boot.
+
+    Args:
+        population: Boot counts keyed by (provider, region, zone)
+        mirror_map: Parsed mirror map
+        policy: Callable taking (metadata, mirror_map) returning
+            (primary, backup)
+        sample: Synthetic instances evaluated per group
+
+    Returns:
+        Boot counts keyed by (group, primary mirror)
+    """
+    assignments = Counter()
+    # select_mirror() reports every decision on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        for group, count in population.items():
+            provider, region, zone = group
+            picks = Counter(
+                policy(
+                    {
+                        "provider": provider,
+                        "region": region,
+                        "zone": zone,
+                        "instance_id": f"sim-{provider}-{region}-{zone}-{n}",
+                    },
+                    mirror_map,
+                )[0]
+                for n in range(min(sample, count))
+            )
+            evaluated = sum(picks.values())
+            assigned = 0
+            for index, (mirror, hits) in enumerate(picks.most_common()):
+                if index == len(picks) - 1:
+                    boots = count - assigned
+                else:
+                    boots = count * hits // evaluated
+                assignments[(group, mirror)] += boots
+                assigned += boots
+    return assignments
+
+
+def base_latency(model: Dict[str, Any], group: Group, mirror: str) -> float:
+    """Look up the unloaded latency from a group to a mirror.
+
+    Args:
+        model: Latency/capacity model
+        group: (provider, region, zone) of the booting instances
+        mirror: Mirror URL
+
+    Returns:
+        Latency in milliseconds
+    """
+    provider, region, _ = group
+    latencies = model.get("latency_ms", {}).get(provider, {})
+    for scope in (region, "default"):
+        if mirror in latencies.get(scope, {}):
+            return float(latencies[scope][mirror])
+    return float(model.get("default_latency_ms", DEFAULT_LATENCY_MS))
+
+
+def weighted_percentile(samples: List[Tuple[float, int]], quantile: float) -> float:
+    """Percentile of weighted samples.
+
+    Args:
+        samples: (value, weight) pairs
+        quantile: Quantile between 0 and 1
+
+    Returns:
+        Smallest value covering `quantile` of the total weight
+    """
+    ordered = sorted(samples)
+    total = sum(weight for _, weight in ordered)
+    threshold = quantile * total
+    running = 0
+    for value, weight in ordered:
+        running += weight
+        if running >= threshold:
+            return value
+    return ordered[-1][0] if ordered else 0.0
+
+
+def simulate(assignments: Counter, model: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply the latency/capacity model to the mirror assignments.
+
+    Mirrors with a `capacity` (boots per replay window) slow down like a
+    simple M/M/1 queue: latency is scaled by 1 / (1 - utilization).
+
+    Args:
+        assignments: Output of assign_mirrors()
+        model: Latency/capacity model
+
+    Returns:
+        Report with boot count, latency percentiles and per-mirror load
+    """
+    loads = Counter()
+    for (_, mirror), boots in assignments.items():
+        loads[mirror] += boots
+    total = sum(loads.values())
+
+    capacities = model.get("capacity", {})
+    utilization = {
+        mirror: loads[mirror] / float(capacities[mirror])
+        for mirror in loads
+        if capacities.get(mirror)
+    }
+
+    samples = []
+    for (group, mirror), boots in assignments.items():
+        if not boots:
+            continue
+        congestion = 1 / (1 - min(utilization.get(mirror, 0.0), MAX_UTILIZATION))
+        samples.append((base_latency(model, group, mirror) * congestion, boots))
+
+    return {
+        "boots": total,
+        "latency_ms": {
+            "p50": round(weighted_percentile(samples, 0.50), 3),
+            "p99": round(weighted_percentile(samples, 0.99), 3),
+        },
+        "mirrors": {
+            mirror: {
+                "boots": boots,
+                "share": round(boots / float(total), 4),
+                "utilization": (
+                    round(utilization[mirror], 4) if mirror in utilization else None
+                ),
+            }
+            for mirror, boots in loads.most_common()
+        },
+    }
+
+
+def parse_args(args=None):
+    """Parse command line arguments with configargparse.
+
+    Args:
+        args: Command line arguments (uses sys.argv if None)
+
+    Returns:
+        Parsed arguments
+    """
+    parser = configargparse.ArgumentParser(
+        description="Simulate mirror selection over a boot population.",
+        default_config_files=[
+            "~/.config/rlc-mirror-simulator.conf",
+            "/etc/rlc-mirror-simulator.conf",
+        ],
+        config_file_parser_class=configargparse.YAMLConfigFileParser,
+    )
+
+    parser.add_argument(
+        "-c",
+        "--config",
+        is_config_file=True,
+        help="Config file path",
+    )
+
+    parser.add_argument(
+        "--mirrors",
+        env_var="CIQ_MIRRORS_PATH",
+        default="data/ciq-mirrors.yaml",
+        help="Path to the mirrors YAML file to evaluate (default: data/ciq-mirrors.yaml)",
+    )
+
+    population = parser.add_mutually_exclusive_group()
+    population.add_argument(
+        "--population",
+        help="YAML/JSON list of provider/region/zone boot counts",
+    )
+    population.add_argument(
+        "--boot-log",
+        help="JSONL file of recorded boots, one object per line",
+    )
+    population.add_argument(
+        "--synthetic",
+        type=int,
+        default=1000000,
+        help="Boots spread evenly over the map's regions (default: 1000000)",
+    )
+
+    parser.add_argument(
+        "--model",
+        help="YAML latency/capacity model (default: uniform latency, no capacity)",
+    )
+
+    parser.add_argument(
+        "--policy",
+        default="rlc.cloud_repos.repo_config:select_mirror",
+        help="Selection policy as module:function",
+    )
+
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=DEFAULT_SAMPLE,
+        help=f"Synthetic instances evaluated per group (default: {DEFAULT_SAMPLE})",
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Main entry point for the script.
+
+    Args:
+        args: Command line arguments (uses sys.argv if None)
+
+    Returns:
+        Exit code (0 for success, non-zero for error)
+    """
+    try:
+        parsed_args = parse_args(args)
+
+        with open(parsed_args.mirrors, "r") as f:
+            mirror_map = yaml.safe_load(f)
+
+        model = {}
+        if parsed_args.model:
+            with open(parsed_args.model, "r") as f:
+                model = yaml.safe_load(f) or {}
+
+        if parsed_args.population:
+            population = load_population(parsed_args.population)
+        elif parsed_args.boot_log:
+            with open(parsed_args.boot_log, "r") as f:
+                population = read_boot_log(f)
+        else:
+            population = synthetic_population(mirror_map, parsed_args.synthetic)
+
+        assignments = assign_mirrors(
+            population,
+            mirror_map,
+            load_policy(parsed_args.policy),
+            parsed_args.sample,
+        )
+        print(yaml.dump(simulate(assignments, model), default_flow_style=False))
+        return 0
+
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
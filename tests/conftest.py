@@ -1,10 +1,107 @@
 # tests/conftest.py
 import shutil
+import socket
+import socketserver
 import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from pathlib import Path
 
 import pytest
 
+pytest_plugins = ["fault_lab"]
+
+PUBLIC_ADDRESS = "93.184.216.34"
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Clients giving up on stalled or slow answers is what tests inject
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class StandInServer:
+    """
+    Local HTTP stand-in for mirrors and other endpoints.
+
+    Answers from `responses`, a dict of path -> (status, body, delay). Paths
+    that are not listed answer 200 with an empty body. Every request path is
+    recorded in `requests`.
+    """
+
+    def __init__(self, handler_class=None):
+        self.responses = {}
+        self.requests = []
+        self.httpd = _ThreadingHTTPServer(
+            ("127.0.0.1", 0), handler_class or self._handler_class()
+        )
+        self.httpd.stand_in = self
+        self.url = "http://127.0.0.1:%d" % self.httpd.server_address[1]
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        )
+
+    def _handler_class(self):
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, send_body):
+                stand_in = self.server.stand_in
+                stand_in.requests.append(self.path)
+                status, body, delay = stand_in.responses.get(self.path, (200, b"", 0))
+                time.sleep(delay)
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def do_HEAD(self):
+                self._respond(False)
+
+            def do_GET(self):
+                self._respond(True)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def make_http_server():
+    """Fixture factory for local HTTP stand-in servers with custom handlers."""
+    servers = []
+
+    def _make(handler_class=None):
+        server = StandInServer(handler_class).start()
+        servers.append(server)
+        return server
+
+    yield _make
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def http_server(make_http_server):
+    """Fixture providing a running local HTTP stand-in server."""
+    return make_http_server()
+
 
 @pytest.fixture
 def dnf_vars_dir(tmp_path, monkeypatch):
@@ -23,6 +120,65 @@ def marker(tmp_path, monkeypatch):
     yield marker_path
 
 
+@pytest.fixture
+def readiness_dir(tmp_path, monkeypatch):
+    """Fixture to point the readiness handoff files at a temp directory."""
+    ready_path = tmp_path / "run"
+    monkeypatch.setattr("rlc.cloud_repos.readiness.READINESS_DIR", str(ready_path))
+    return ready_path
+
+
+@pytest.fixture(autouse=True)
+def dmi_id_dir(tmp_path, monkeypatch):
+    """Fixture pointing DMI detection at an empty sysfs stand-in.
+
+    Autouse so tests never pick up the DMI data of the machine running them.
+    """
+    dmi_path = tmp_path / "dmi" / "id"
+    dmi_path.mkdir(parents=True)
+    monkeypatch.setattr("rlc.cloud_repos.cloud_metadata.DMI_ID_PATH", str(dmi_path))
+    return dmi_path
+
+
+@pytest.fixture(autouse=True)
+def last_good_file(tmp_path, monkeypatch):
+    """Fixture keeping the last-known-good record inside the test's temp dir."""
+    path = tmp_path / "state" / "last-good.json"
+    monkeypatch.setattr("rlc.cloud_repos.last_good.LAST_GOOD_PATH", str(path))
+    return path
+
+
+@pytest.fixture(autouse=True)
+def flight_lock(tmp_path, monkeypatch):
+    """Fixture keeping the single-flight lock file inside the test's temp dir."""
+    path = tmp_path / "lock" / "configure.lock"
+    monkeypatch.setattr("rlc.cloud_repos.single_flight.LOCK_PATH", str(path))
+    return path
+
+
+@pytest.fixture
+def fake_dns(monkeypatch):
+    """
+    Resolves `*.internal` to loopback (private), `*.public` to a public
+    address and `*.slow` to loopback after a delay; everything else fails.
+    """
+    real_getaddrinfo = socket.getaddrinfo
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        if host.endswith(".internal"):
+            host = "127.0.0.1"
+        elif host.endswith(".slow"):
+            time.sleep(2)
+            host = "127.0.0.1"
+        elif host.endswith(".public"):
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (PUBLIC_ADDRESS, port))]
+        elif host != "127.0.0.1":
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return real_getaddrinfo(host, port, *args, **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+
+
 @pytest.fixture
 def mirrors_file(tmp_path, monkeypatch):
     """Fixture to create a temporary mirrors file."""
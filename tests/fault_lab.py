@@ -0,0 +1,273 @@
+# tests/fault_lab.py
+"""
+Fault-injection lab for the whole resolution path.
+
+Provides the `fault_lab` fixture: a fake `cloud-init` binary on PATH,
+local mirror and metadata service stand-ins, each with injectable latency,
+errors, stalls and hangs, plus runners that call rlc.cloud_repos.main.main() against them, in
+this process or a separate one, and report the outcome and how long it took.
+"""
+
+import importlib
+import json
+import os
+import stat
+import subprocess
+import sys
+import time
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+
+import pytest
+import yaml
+
+# Long enough to outlive any budget under test, short enough to not matter
+HANG_SECONDS = 30
+
+FAKE_CLOUD_INIT = """#!{python}
+import json
+import sys
+import time
+
+with open({config!r}) as f:
+    config = json.load(f)
+with open({calls!r}, "a") as f:
+    f.write(" ".join(sys.argv[1:]) + "\\n")
+
+fault = config.get(sys.argv[-1], {{}})
+time.sleep(fault.get("delay", 0))
+if fault.get("hang"):
+    time.sleep({hang})
+if fault.get("exit"):
+    sys.stderr.write("cloud-init: injected failure\\n")
+    sys.exit(fault["exit"])
+print(fault.get("value", ""))
+"""
+
+
+# Runs main() in a fresh interpreter with the lab's paths; argv[1] holds the
+# path settings as {"module:ATTRIBUTE": [value, is_path_object]}
+MAIN_PROCESS = """
+import json
+import sys
+from pathlib import Path
+
+from rlc.cloud_repos import main
+
+for name, (value, is_path) in json.loads(sys.argv[1]).items():
+    module, attribute = name.split(":")
+    setattr(sys.modules[module], attribute, Path(value) if is_path else value)
+sys.exit(main.main(sys.argv[2:]))
+"""
+# Module paths the fixtures redirect into the test's temp directory
+LAB_PATHS = (
+    "rlc.cloud_repos.main:DNF_VARS_DIR",
+    "rlc.cloud_repos.main:MARKERFILE",
+    "rlc.cloud_repos.last_good:LAST_GOOD_PATH",
+    "rlc.cloud_repos.single_flight:LOCK_PATH",
+    "rlc.cloud_repos.cloud_metadata:DMI_ID_PATH",
+    "rlc.cloud_repos.ip_region:IP_INDEX_PATH",
+)
+
+
+class FakeCloudInit:
+    """
+    `cloud-init` stand-in answering `cloud-init query <key>`.
+
+    Each key can be given a value and faults: `delay` (seconds before
+    answering), `hang` (never answer) and `exit` (non-zero exit code).
+    Every invocation is appended to `calls_path`.
+    """
+
+    def __init__(self, bin_dir: Path):
+        self.config_path = bin_dir / "cloud-init.json"
+        self.calls_path = bin_dir / "cloud-init.calls"
+        self.faults = {}
+        self.calls_path.write_text("")
+        script = bin_dir / "cloud-init"
+        script.write_text(
+            FAKE_CLOUD_INIT.format(
+                python=sys.executable,
+                config=str(self.config_path),
+                calls=str(self.calls_path),
+                hang=HANG_SECONDS,
+            )
+        )
+        script.chmod(script.stat().st_mode | stat.S_IEXEC)
+        self.set("cloud_name", "aws")
+        self.set("region", "us-east-1")
+
+    def set(self, key: str, value: str = "", **faults) -> None:
+        """Configure the answer and faults for `cloud-init query <key>`."""
+        self.faults[key] = dict(faults, value=value)
+        self.config_path.write_text(json.dumps(self.faults))
+
+    @property
+    def calls(self):
+        return self.calls_path.read_text().splitlines()
+
+
+class FaultyMirrorHandler(BaseHTTPRequestHandler):
+    """
+    Serves a mirror stand-in according to its fault settings.
+
+    Faults (per path, falling back to the mirror's defaults):
+    `status`, `delay` (before headers), `body`, `headers`, `hang` (never
+    answer), `drop` (close without answering), `stall_after` (bytes of body
+    sent before stalling) and `rate` (body bytes per second).
+    """
+
+    def _serve(self, send_body):
+        mirror = self.server.stand_in
+        mirror.requests.append((self.command, self.path, dict(self.headers)))
+        fault = dict(mirror.defaults, **mirror.responses.get(self.path, {}))
+
+        time.sleep(fault.get("delay", 0))
+        if fault.get("hang"):
+            time.sleep(HANG_SECONDS)
+            return
+        if fault.get("drop"):
+            self.close_connection = True
+            return
+
+        body = fault.get("body", b"")
+        self.send_response(fault.get("status", 200))
+        for name, value in fault.get("headers", {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not send_body:
+            return
+
+        stall_after = fault.get("stall_after")
+        if stall_after is not None:
+            self.wfile.write(body[:stall_after])
+            self.wfile.flush()
+            time.sleep(HANG_SECONDS)
+            return
+        rate = fault.get("rate")
+        chunk = max(1, int(rate / 20)) if rate else len(body) or 1
+        for offset in range(0, len(body), chunk):
+            self.wfile.write(body[offset : offset + chunk])  # noqa: E203
+            if rate:
+                self.wfile.flush()
+                time.sleep(chunk / float(rate))
+
+    def do_HEAD(self):
+        self._serve(False)
+
+    def do_PUT(self):
+        self._serve(True)
+
+    def do_GET(self):
+        self._serve(True)
+
+    def log_message(self, *args):
+        pass
+
+
+class LabRun:
+    """Outcome of one main() run inside the lab."""
+
+    def __init__(self, exit_code, elapsed, dnf_vars):
+        self.exit_code = exit_code
+        self.elapsed = elapsed
+        self.dnf_vars = dnf_vars
+
+
+class FaultLab:
+    """Wires the fake cloud-init and mirror stand-ins into main()."""
+
+    def __init__(self, tmp_path, monkeypatch, make_http_server, dnf_vars_dir):
+        bin_dir = tmp_path / "bin"
+        bin_dir.mkdir()
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+        self.cloud_init = FakeCloudInit(bin_dir)
+        self.monkeypatch = monkeypatch
+        self.tmp_path = tmp_path
+        self.make_http_server = make_http_server
+        self.dnf_vars_dir = dnf_vars_dir
+        self.mirror_map = {}
+
+    def mirror(self, **faults):
+        """Starts a mirror stand-in with default faults; returns the server."""
+        server = self.make_http_server(FaultyMirrorHandler)
+        server.defaults = faults
+        return server
+
+    def imds(self, public_ip, records, **faults):
+        """
+        Starts an AWS metadata service stand-in reporting `public_ip`, with
+        the given faults on every request, and installs a prefix index of
+        (prefix, provider, region) `records` for region inference.
+        """
+        from rlc.cloud_repos import ip_region
+
+        server = self.mirror(**faults)
+        server.responses["/latest/api/token"] = {"body": b"token"}
+        server.responses["/latest/meta-data/public-ipv4"] = {"body": public_ip.encode()}
+        self.monkeypatch.setenv(ip_region.IMDS_URL_ENV, server.url)
+        index_path = self.tmp_path / "ip-prefixes.idx"
+        ip_region.PrefixIndex.build(records).save(str(index_path))
+        self.monkeypatch.setattr(ip_region, "IP_INDEX_PATH", str(index_path))
+        self.monkeypatch.setattr(ip_region, "_loaded_indexes", {})
+        return server
+
+    def map_region(self, provider, region, primary, backup):
+        """Adds a region entry to the lab's mirror map."""
+        self.mirror_map.setdefault(provider, {})[region] = {
+            "primary": primary,
+            "backup": backup,
+        }
+
+    def run(self, *args) -> LabRun:
+        """Runs main() against the lab and times it."""
+        from rlc.cloud_repos.main import main
+
+        map_path = self._write_map()
+        start = time.monotonic()
+        exit_code = main(["--force", "--mirror-file", str(map_path)] + list(args))
+        return LabRun(exit_code, time.monotonic() - start, self._dnf_vars())
+
+    def run_process(self, *args, timeout: float = HANG_SECONDS) -> LabRun:
+        """
+        Runs main() in a separate process and times it until the process
+        exits, so work left behind in threads counts as well.
+        """
+        from rlc.cloud_repos import main
+
+        source_root = os.path.dirname(os.path.dirname(os.path.dirname(main.__file__)))
+        settings = {}
+        for name in LAB_PATHS:
+            module, attribute = name.split(":")
+            value = getattr(importlib.import_module(module), attribute)
+            settings[name] = [str(value), isinstance(value, Path)]
+        env = dict(os.environ, PYTHONPATH=source_root)
+        command = [sys.executable, "-c", MAIN_PROCESS, json.dumps(settings)]
+        command += ["--force", "--mirror-file", str(self._write_map())] + list(args)
+
+        start = time.monotonic()
+        process = subprocess.run(command, env=env, timeout=timeout)
+        return LabRun(process.returncode, time.monotonic() - start, self._dnf_vars())
+
+    def _write_map(self) -> Path:
+        mirror_map = dict(self.mirror_map)
+        mirror_map.setdefault(
+            "default", {"primary": "http://127.0.0.1:9", "backup": "http://127.0.0.1:9"}
+        )
+        map_path = self.tmp_path / "lab-mirrors.yaml"
+        map_path.write_text(yaml.safe_dump(mirror_map))
+        return map_path
+
+    def _dnf_vars(self):
+        return {
+            path.name: path.read_text().strip()
+            for path in self.dnf_vars_dir.iterdir()
+            if path.is_file()
+        }
+
+
+@pytest.fixture
+def fault_lab(tmp_path, monkeypatch, make_http_server, dnf_vars_dir, marker):
+    """Fixture providing the fault-injection lab."""
+    return FaultLab(tmp_path, monkeypatch, make_http_server, dnf_vars_dir)
@@ -0,0 +1,174 @@
+import gzip
+import json
+import random
+
+import pytest
+import yaml
+
+from rlc_cloud_repos_framework import boot_reports as br
+
+
+def _exact(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_sketch_quantiles_are_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(-1.0, 1.2) for _ in range(50000)]
+    sketch = br.QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.5, 0.95, 0.99, 0.999):
+        exact = _exact(values, q)
+        assert abs(sketch.quantile(q) - exact) / exact <= 0.011
+
+
+def test_sketch_memory_is_bounded():
+    sketch = br.QuantileSketch(relative_accuracy=0.01, max_buckets=256)
+    for exponent in range(-50, 50):
+        for step in range(100):
+            sketch.add(10.0 ** (exponent + step / 100.0))
+    assert len(sketch.buckets) <= 256
+    assert sketch.count == 10000
+    # The top of the distribution keeps its accuracy
+    assert abs(sketch.quantile(1.0) / 10.0**49.99 - 1) <= 0.011
+
+
+def test_sketch_merge_matches_single_sketch():
+    rng = random.Random(3)
+    values = [rng.expovariate(5.0) for _ in range(20000)]
+    whole, left, right = (br.QuantileSketch() for _ in range(3))
+    for n, value in enumerate(values):
+        whole.add(value)
+        (left if n % 2 else right).add(value)
+    left.merge(right)
+    for q in br.QUANTILES:
+        assert left.quantile(q) == whole.quantile(q)
+
+    with pytest.raises(ValueError):
+        left.merge(br.QuantileSketch(relative_accuracy=0.05))
+
+
+def test_sketch_zero_and_empty():
+    sketch = br.QuantileSketch()
+    assert sketch.quantile(0.5) is None
+    sketch.add(0.0)
+    sketch.add(0.0)
+    sketch.add(1.0)
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1.0) == pytest.approx(1.0, rel=0.01)
+
+
+def _report(region, mirror, total, fallbacks=(), ok=True):
+    return {
+        "provider": "aws",
+        "region": region,
+        "mirror": mirror,
+        "ok": ok,
+        "total": total,
+        "phases": {"detect": total * 0.8, "resolve": total * 0.2},
+        "fallbacks": list(fallbacks),
+    }
+
+
+def test_aggregator_groups_and_rates():
+    aggregator = br.ReportAggregator()
+    lines = [
+        json.dumps(_report("us-east-1", "https://east", 0.1 * n)) for n in range(1, 11)
+    ]
+    lines += [
+        json.dumps(_report("us-west-2", "https://west", 1.0, ["backup_promoted"])),
+        json.dumps(_report("us-west-2", "https://east", 3.0, ok=False)),
+        "",
+        "{truncated",
+        "[1, 2]",
+        json.dumps({"phases": [0.1, 0.2]}),
+        json.dumps({"fallbacks": "backup_promoted"}),
+        json.dumps({"fallbacks": [{"flag": "backup_promoted"}]}),
+    ]
+    aggregator.add_lines(lines)
+    summary = aggregator.summary()
+
+    assert summary["records"] == 12
+    assert summary["skipped"] == 5
+    east = summary["regions"]["aws/us-east-1"]
+    assert east["runs"] == 10
+    assert east["fallback_rate"] == 0
+    assert east["latency_ms"]["total"]["p50"] == pytest.approx(500, rel=0.01)
+    assert list(east["latency_ms"]) == ["total", "detect", "resolve"]
+
+    west = summary["regions"]["aws/us-west-2"]
+    assert west["failure_rate"] == 0.5
+    assert west["fallback_rate"] == 0.5
+    assert west["fallbacks"] == {"backup_promoted": 0.5}
+    assert summary["mirrors"]["https://east"]["runs"] == 11
+    assert summary["fleet"]["runs"] == 12
+
+
+def test_main_streams_plain_and_gzip_files(tmp_path, capsys):
+    plain = tmp_path / "runs.jsonl"
+    plain.write_text(
+        "\n".join(
+            json.dumps(_report("us-east-1", "https://east", 0.2)) for _ in range(3)
+        )
+    )
+    compressed = tmp_path / "runs.jsonl.gz"
+    with gzip.open(str(compressed), "wt") as f:
+        for _ in range(2):
+            f.write(json.dumps(_report("eu-west-1", "https://eu", 0.4)) + "\n")
+
+    assert br.main([str(plain), str(compressed)]) == 0
+    summary = yaml.safe_load(capsys.readouterr().out)
+    assert summary["records"] == 5
+    assert set(summary["regions"]) == {"aws/us-east-1", "aws/eu-west-1"}
+    assert summary["mirrors"]["https://eu"]["latency_ms"]["total"]["p99"] == (
+        pytest.approx(400, rel=0.01)
+    )
+
+
+def test_main_reports_missing_file(tmp_path, capsys):
+    assert br.main([str(tmp_path / "missing.jsonl")]) == 1
+    assert "Error" in capsys.readouterr().err
+
+
+def test_memory_does_not_grow_with_records():
+    """Group state depends on regions and latency spread, not record count."""
+    rng = random.Random(11)
+    aggregator = br.ReportAggregator()
+
+    def buckets():
+        groups = [aggregator.fleet] + list(aggregator.regions.values())
+        return sum(len(s.buckets) for g in groups for s in g.latency.values())
+
+    def feed(n):
+        aggregator.add_lines(
+            json.dumps(
+                _report(rng.choice(["r1", "r2"]), "https://m", rng.uniform(0.05, 2.0))
+            )
+            for _ in range(n)
+        )
+
+    feed(20000)
+    after_first = buckets()
+    feed(40000)
+    assert buckets() <= after_first * 1.05
+
+
+def test_parallel_jobs_match_sequential(tmp_path):
+    rng = random.Random(5)
+    paths = []
+    for n in range(3):
+        path = tmp_path / "runs-{}.jsonl".format(n)
+        path.write_text(
+            "\n".join(
+                json.dumps(
+                    _report(rng.choice(["r1", "r2"]), "https://m", rng.uniform(0.1, 2))
+                )
+                for _ in range(500)
+            )
+        )
+        paths.append(str(path))
+
+    assert br.aggregate(paths, jobs=3).summary() == br.aggregate(paths).summary()
@@ -0,0 +1,174 @@
+import io
+import json
+import tracemalloc
+
+import yaml
+
+from rlc.cloud_repos.ip_region import PrefixIndex
+from rlc_cloud_repos_framework import ip_ranges as ipr
+
+AWS_FEED = {
+    "syncToken": "1700000000",
+    "prefixes": [
+        {"ip_prefix": "3.5.140.0/22", "region": "ap-northeast-2"},
+        {"ip_prefix": "13.34.37.64/27", "region": "ap-southeast-4"},
+        {"ip_prefix": "15.230.39.0/24", "region": "GLOBAL"},
+        {"ip_prefix": "52.95.245.0/24", "region": "us-east-1"},
+    ],
+    "ipv6_prefixes": [
+        {"ipv6_prefix": "2600:1f14::/35", "region": "us-west-2"},
+    ],
+}
+GCP_FEED = {
+    "prefixes": [
+        {"ipv4Prefix": "34.1.208.0/20", "scope": "africa-south1"},
+        {"ipv6Prefix": "2600:1900:8000::/44", "scope": "us-central1"},
+        {"ipv4Prefix": "34.2.0.0/16", "scope": "global"},
+    ]
+}
+AZURE_FEED = {
+    "changeNumber": 1,
+    "values": [
+        {
+            "name": "AzureCloud.eastus",
+            "properties": {"region": "eastus", "addressPrefixes": ["20.42.0.0/17"]},
+        },
+        {
+            "name": "Storage.eastus",
+            "properties": {"region": "eastus", "addressPrefixes": ["20.42.0.0/24"]},
+        },
+        {
+            "name": "AzureCloud",
+            "properties": {"region": "", "addressPrefixes": ["20.0.0.0/8"]},
+        },
+    ],
+}
+ORACLE_FEED = {
+    "regions": [
+        {"region": "us-ashburn-1", "cidrs": [{"cidr": "129.213.0.0/16"}]},
+        {"region": "us-phoenix-1", "cidrs": [{"cidr": "129.146.0.0/16"}]},
+    ]
+}
+
+
+def test_json_array_stream_small_chunks():
+    """Elements split over many tiny chunks are reassembled."""
+    document = json.dumps(AWS_FEED)
+    stream = ipr.JsonArrayStream(io.StringIO(document), chunk_size=7)
+    assert list(stream.iter_array("prefixes")) == AWS_FEED["prefixes"]
+    assert list(stream.iter_array("ipv6_prefixes")) == AWS_FEED["ipv6_prefixes"]
+
+
+def test_json_array_stream_missing_key():
+    stream = ipr.JsonArrayStream(io.StringIO(json.dumps({"other": [1]})))
+    assert list(stream.iter_array("prefixes")) == []
+
+
+def test_json_array_stream_empty_array():
+    stream = ipr.JsonArrayStream(io.StringIO('{"prefixes" : [ ]}'))
+    assert list(stream.iter_array("prefixes")) == []
+
+
+def test_provider_parsers():
+    assert list(ipr.iter_aws(io.StringIO(json.dumps(AWS_FEED)))) == [
+        ("3.5.140.0/22", "ap-northeast-2"),
+        ("13.34.37.64/27", "ap-southeast-4"),
+        ("52.95.245.0/24", "us-east-1"),
+        ("2600:1f14::/35", "us-west-2"),
+    ]
+    assert list(ipr.iter_gcp(io.StringIO(json.dumps(GCP_FEED)))) == [
+        ("34.1.208.0/20", "africa-south1"),
+        ("2600:1900:8000::/44", "us-central1"),
+    ]
+    assert list(ipr.iter_azure(io.StringIO(json.dumps(AZURE_FEED)))) == [
+        ("20.42.0.0/17", "eastus")
+    ]
+    assert list(ipr.iter_oracle(io.StringIO(json.dumps(ORACLE_FEED)))) == [
+        ("129.213.0.0/16", "us-ashburn-1"),
+        ("129.146.0.0/16", "us-phoenix-1"),
+    ]
+
+
+def test_missing_regions():
+    mirror_map = {"aws": {"us-east-1": {}, "default": {}}}
+    regions = {"us-east-1", "us-west-2"}
+    assert ipr.missing_regions("aws", regions, mirror_map) == {"us-west-2"}
+    assert ipr.missing_regions("gcp", regions, mirror_map) == regions
+
+
+def test_large_feed_bounded_memory(tmp_path):
+    """Parsing a multi-megabyte feed does not load it into memory."""
+    feed = tmp_path / "ip-ranges.json"
+    with open(feed, "w") as f:
+        f.write('{"syncToken": "1", "prefixes": [')
+        for n in range(60000):
+            if n:
+                f.write(",")
+            f.write(
+                json.dumps(
+                    {
+                        "ip_prefix": f"10.{n // 256 % 256}.{n % 256}.0/24",
+                        "region": f"region-{n % 40}",
+                        "service": "EC2",
+                        "network_border_group": f"region-{n % 40}",
+                    }
+                )
+            )
+        f.write('], "ipv6_prefixes": []}')
+    assert feed.stat().st_size > 5 * 1024 * 1024
+
+    tracemalloc.start()
+    try:
+        regions = ipr.extract_regions(ipr.iter_feed("aws", str(feed)))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(regions) == 40
+    assert peak < 1024 * 1024
+
+
+def test_main_reports_missing_regions(tmp_path, capsys):
+    aws_feed = tmp_path / "aws.json"
+    aws_feed.write_text(json.dumps(AWS_FEED))
+    mirrors = tmp_path / "mirrors.yaml"
+    mirrors.write_text(yaml.dump({"aws": {"us-east-1": {}, "us-west-2": {}}}))
+
+    result = ipr.main(["--aws", str(aws_feed), "--mirrors", str(mirrors)])
+    assert result == 0
+    report = yaml.safe_load(capsys.readouterr().out)
+    assert report["aws"]["missing"] == ["ap-northeast-2", "ap-southeast-4"]
+
+    result = ipr.main(["--aws", str(aws_feed), "--mirrors", str(mirrors), "--verify"])
+    assert result == 1
+
+
+def test_main_error_handling():
+    assert ipr.main(["--aws", "nonexistent.json"]) == 1
+
+
+def test_main_writes_prefix_index(tmp_path):
+    aws_feed = tmp_path / "aws.json"
+    aws_feed.write_text(json.dumps(AWS_FEED))
+    oracle_feed = tmp_path / "oracle.json"
+    oracle_feed.write_text(json.dumps(ORACLE_FEED))
+    mirrors = tmp_path / "mirrors.yaml"
+    mirrors.write_text(yaml.dump({"aws": {}}))
+    index_path = tmp_path / "ip-prefixes.idx"
+
+    result = ipr.main(
+        [
+            "--aws",
+            str(aws_feed),
+            "--oracle",
+            str(oracle_feed),
+            "--mirrors",
+            str(mirrors),
+            "--index-out",
+            str(index_path),
+        ]
+    )
+    assert result == 0
+    index = PrefixIndex.load(str(index_path))
+    assert index.lookup("52.95.245.7") == ("aws", "us-east-1")
+    assert index.lookup("129.146.1.1") == ("oracle", "us-phoenix-1")
@@ -0,0 +1,103 @@
+import json
+import os
+
+import pytest
+
+from rlc.cloud_repos.repo_config import load_mirror_map
+from rlc_cloud_repos_framework import map_bench
+
+
+def test_synthetic_map_layouts_agree(tmp_path):
+    single, shards = map_bench.write_synthetic_map(40, str(tmp_path))
+    mirror_map = load_mirror_map(str(single))
+    assert set(mirror_map) == set(map_bench.PROVIDERS) | {"default"}
+    assert len(mirror_map["aws"]) == 40 // len(map_bench.PROVIDERS) + 1
+    for provider in map_bench.PROVIDERS:
+        sharded = load_mirror_map(str(shards), provider)
+        assert sharded == {
+            provider: mirror_map[provider],
+            "default": mirror_map["default"],
+        }
+
+
+def test_measure_reports_every_metric():
+    results = map_bench.measure(40, lookups=20, repeat=1)
+    assert set(results) == set(map_bench.METRICS)
+    assert all(value > 0 for value in results.values())
+
+
+def test_scaling_exponents():
+    results = {
+        size: {
+            "parse": size * 1e-5,
+            "parse_shard": size * 2e-6,
+            "memory": size * 4000.0,
+            "hit": 2e-6,
+            "miss": size**2 * 1e-9,
+        }
+        for size in (100, 1000, 10000)
+    }
+    exponents = map_bench.scaling_exponents(results)
+    assert exponents["parse"] == pytest.approx(1.0)
+    assert exponents["hit"] == pytest.approx(0.0)
+    assert exponents["miss"] == pytest.approx(2.0)
+
+    baseline = {
+        "parse": 1.0,
+        "parse_shard": 1.0,
+        "memory": 1.0,
+        "hit": 0.0,
+        "miss": 0.0,
+    }
+    failures = map_bench.regressions(exponents, baseline)
+    assert len(failures) == 1 and failures[0].startswith("miss ")
+
+    with pytest.raises(ValueError):
+        map_bench.scaling_exponents({100: results[100]})
+
+
+def test_stored_baseline_covers_every_metric():
+    baseline = json.loads(map_bench.BASELINE_PATH.read_text())
+    assert set(baseline["exponents"]) == set(map_bench.METRICS)
+    assert baseline["exponents"]["parse"] < 1.0 + map_bench.DEFAULT_TOLERANCE
+
+
+def test_main_checks_against_baseline(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    args = ["--sizes", "40,160", "--lookups", "20", "--repeat", "1"]
+    assert map_bench.main(args + ["--baseline", str(baseline), "--write-baseline"]) == 0
+    assert json.loads(baseline.read_text())["sizes"] == [40, 160]
+
+    regressed = {metric: -5.0 for metric in map_bench.METRICS}
+    baseline.write_text(json.dumps({"exponents": regressed}))
+    assert map_bench.main(args + ["--baseline", str(baseline)]) == 1
+    assert map_bench.main(["--sizes", "40", "--baseline", str(baseline)]) == 1
+
+
+def test_main_defaults_to_baseline_sizes(tmp_path, monkeypatch):
+    baseline = tmp_path / "baseline.json"
+    flat = {metric: 5.0 for metric in map_bench.METRICS}
+    baseline.write_text(json.dumps({"sizes": [160, 40], "exponents": flat}))
+    measured = []
+
+    def measure(size, lookups, repeat):
+        measured.append(size)
+        return {metric: 1.0 for metric in map_bench.METRICS}
+
+    monkeypatch.setattr(map_bench, "measure", measure)
+    assert map_bench.main(["--baseline", str(baseline)]) == 0
+    assert measured == [40, 160]
+
+    assert map_bench.baseline_sizes(str(tmp_path / "missing.json")) == list(
+        map_bench.DEFAULT_SIZES
+    )
+
+
+@pytest.mark.skipif(
+    not os.environ.get("RLC_MAP_BENCH"),
+    reason="Takes minutes; set RLC_MAP_BENCH=1 (or run make bench)",
+)
+def test_realistic_sizes_scale_like_baseline():
+    sizes = os.environ.get("RLC_MAP_BENCH_SIZES")
+    # By default at the sizes the stored baseline was recorded at
+    assert map_bench.main(["--sizes", sizes] if sizes else []) == 0
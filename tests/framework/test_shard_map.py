@@ -0,0 +1,60 @@
+import pytest
+import yaml
+
+from rlc.cloud_repos.repo_config import candidate_urls, load_mirror_map, select_mirror
+from rlc_cloud_repos_framework import shard_map
+
+
+def test_shards_select_like_single_file(tmp_path, mirrors_file):
+    mirror_map = load_mirror_map(str(mirrors_file))
+    directory = tmp_path / "mirrors.d"
+    shards = shard_map.write_shards(mirror_map, str(directory))
+    assert {shard.name for shard in shards} == {f"{name}.yaml" for name in mirror_map}
+    # Anchors are written out in full
+    assert "*" not in (directory / "gcp.yaml").read_text()
+
+    providers = [provider for provider in mirror_map if provider != "default"]
+    for provider in providers + ["unknown"]:
+        for region in list(mirror_map.get(provider, {})) + ["nonexistent-region"]:
+            metadata = {"provider": provider, "region": region, "instance_id": "i-1"}
+            sharded = load_mirror_map(str(directory), provider)
+            assert select_mirror(metadata, sharded) == select_mirror(
+                metadata, mirror_map
+            )
+            assert candidate_urls(metadata, sharded) == candidate_urls(
+                metadata, mirror_map
+            )
+
+
+def test_stale_shards_are_removed(tmp_path):
+    directory = tmp_path / "mirrors.d"
+    directory.mkdir()
+    (directory / "retired.yaml").write_text("default: {}\n")
+    shard_map.write_shards({"default": {"primary": "https://p"}}, str(directory))
+    assert sorted(p.name for p in directory.iterdir()) == ["default.yaml"]
+    assert yaml.safe_load((directory / "default.yaml").read_text()) == {
+        "primary": "https://p"
+    }
+
+
+@pytest.mark.parametrize(
+    "mirror_map",
+    [{"aws": {}}, {"default": {}, "../etc": {}}],
+)
+def test_invalid_maps_are_rejected(tmp_path, mirror_map):
+    with pytest.raises(ValueError):
+        shard_map.write_shards(mirror_map, str(tmp_path / "mirrors.d"))
+
+
+def test_main(tmp_path, mirrors_file, capsys):
+    output = tmp_path / "mirrors.d"
+    assert (
+        shard_map.main(["--mirrors", str(mirrors_file), "--output", str(output)]) == 0
+    )
+    assert str(output / "default.yaml") in capsys.readouterr().out
+    assert (
+        shard_map.main(
+            ["--mirrors", str(tmp_path / "missing.yaml"), "--output", str(output)]
+        )
+        == 1
+    )
@@ -0,0 +1,134 @@
+import json
+import time
+from collections import Counter
+
+import yaml
+
+from rlc_cloud_repos_framework import simulator as sim
+
+MIRROR_MAP = {
+    "default": {"primary": "https://global", "backup": "https://global-backup"},
+    "aws": {
+        "us-east-1": {"primary": "https://east", "backup": "https://west"},
+        "us-west-2": {"pool": ["https://west", "https://west-2"]},
+        "default": {"primary": "https://east", "backup": "https://west"},
+    },
+}
+
+
+def test_load_population(tmp_path):
+    population_file = tmp_path / "population.yaml"
+    population_file.write_text(
+        yaml.dump(
+            [
+                {"provider": "aws", "region": "us-east-1", "zone": "a", "count": 10},
+                {"provider": "aws", "region": "us-east-1", "zone": "a", "count": 5},
+                {"provider": "azure", "region": "eastus"},
+            ]
+        )
+    )
+    population = sim.load_population(str(population_file))
+    assert population[("aws", "us-east-1", "a")] == 15
+    assert population[("azure", "eastus", "")] == 1
+
+
+def test_read_boot_log():
+    lines = [
+        json.dumps({"provider": "aws", "region": "us-east-1", "zone": "a"}),
+        "",
+        json.dumps({"provider": "aws", "region": "us-east-1", "zone": "a"}),
+        json.dumps({"provider": "aws", "region": "us-west-2"}),
+    ]
+    population = sim.read_boot_log(lines)
+    assert population == Counter(
+        {("aws", "us-east-1", "a"): 2, ("aws", "us-west-2", ""): 1}
+    )
+
+
+def test_synthetic_population_covers_map():
+    population = sim.synthetic_population(MIRROR_MAP, 1000)
+    assert sum(population.values()) == 1000
+    assert {group[1] for group in population} == {"us-east-1", "us-west-2"}
+
+
+def test_load_policy():
+    policy = sim.load_policy("rlc.cloud_repos.repo_config:select_mirror")
+    assert policy({"provider": "aws", "region": "us-east-1"}, MIRROR_MAP) == (
+        "https://east",
+        "https://west",
+    )
+
+
+def test_assign_mirrors_splits_pools():
+    population = Counter({("aws", "us-west-2", "a"): 10000})
+    assignments = sim.assign_mirrors(population, MIRROR_MAP, sample=200)
+
+    assert sum(assignments.values()) == 10000
+    west = assignments[(("aws", "us-west-2", "a"), "https://west")]
+    assert 3500 < west < 6500
+
+
+def test_assign_mirrors_custom_policy():
+    population = Counter({("aws", "us-east-1", "a"): 7})
+    assignments = sim.assign_mirrors(
+        population, MIRROR_MAP, lambda metadata, mirror_map: ("https://x", "")
+    )
+    assert assignments == Counter({(("aws", "us-east-1", "a"), "https://x"): 7})
+
+
+def test_weighted_percentile():
+    samples = [(10.0, 98), (100.0, 1), (1000.0, 1)]
+    assert sim.weighted_percentile(samples, 0.5) == 10.0
+    assert sim.weighted_percentile(samples, 0.99) == 100.0
+    assert sim.weighted_percentile(samples, 1.0) == 1000.0
+
+
+def test_simulate_applies_latency_and_capacity():
+    assignments = Counter(
+        {
+            (("aws", "us-east-1", "a"), "https://east"): 900,
+            (("aws", "us-west-2", "a"), "https://west"): 100,
+        }
+    )
+    model = {
+        "default_latency_ms": 50,
+        "latency_ms": {"aws": {"us-east-1": {"https://east": 10}}},
+        "capacity": {"https://east": 1000},
+    }
+    report = sim.simulate(assignments, model)
+
+    assert report["boots"] == 1000
+    # 90% utilization makes the east mirror 10x slower
+    assert report["latency_ms"]["p50"] == 100.0
+    assert report["latency_ms"]["p99"] == 100.0
+    assert report["mirrors"]["https://east"] == {
+        "boots": 900,
+        "share": 0.9,
+        "utilization": 0.9,
+    }
+    assert report["mirrors"]["https://west"]["utilization"] is None
+
+
+def test_replays_millions_of_boots_quickly(mirrors_file):
+    with open(mirrors_file) as f:
+        mirror_map = yaml.safe_load(f)
+
+    start = time.monotonic()
+    population = sim.synthetic_population(mirror_map, 5000000)
+    report = sim.simulate(sim.assign_mirrors(population, mirror_map), {})
+    assert time.monotonic() - start < 5
+    assert report["boots"] == 5000000
+
+
+def test_main(tmp_path, capsys):
+    mirrors_path = tmp_path / "mirrors.yaml"
+    mirrors_path.write_text(yaml.dump(MIRROR_MAP))
+
+    result = sim.main(["--mirrors", str(mirrors_path), "--synthetic", "600"])
+    assert result == 0
+    report = yaml.safe_load(capsys.readouterr().out)
+    assert report["boots"] == 600
+
+
+def test_main_error_handling():
+    assert sim.main(["--mirrors", "nonexistent.yaml"]) == 1
@@ -0,0 +1,87 @@
+import pytest
+
+import cc_rlc_cloud_repos
+
+
+class FakeDatasource:
+    def __init__(self, cloud_name, region):
+        self.cloud_name = cloud_name
+        self.region = region
+        self.availability_zone = f"{region}a" if region else None
+
+
+class FakeCloud:
+    def __init__(self, cloud_name="aws", region="us-east-2"):
+        self.datasource = FakeDatasource(cloud_name, region)
+
+    def get_instance_id(self):
+        return "i-0123"
+
+
+@pytest.fixture
+def ran_marker(tmp_path, monkeypatch):
+    path = tmp_path / "run" / "cloud-init-module"
+    monkeypatch.setattr(cc_rlc_cloud_repos, "RAN_MARKER", str(path))
+    return path
+
+
+@pytest.fixture
+def no_cloud_init_query(monkeypatch):
+    def fail():
+        raise AssertionError("cloud-init was queried")
+
+    monkeypatch.setattr("rlc.cloud_repos.main.get_cloud_metadata", fail)
+
+
+def test_meta_matches_module_name():
+    assert cc_rlc_cloud_repos.meta["id"] == cc_rlc_cloud_repos.__name__
+
+
+def test_datasource_metadata():
+    assert cc_rlc_cloud_repos.datasource_metadata(FakeCloud("azure", None)) == {
+        "provider": "azure",
+        "region": "",
+        "instance_id": "i-0123",
+        "zone": "",
+    }
+    assert cc_rlc_cloud_repos.datasource_metadata(FakeCloud())["zone"] == "us-east-2a"
+
+
+def test_handle_configures_from_datasource(
+    ran_marker, no_cloud_init_query, dnf_vars_dir, marker, mirrors_file
+):
+    cfg = {"rlc_cloud_repos": {"args": ["--force"]}}
+    cc_rlc_cloud_repos.handle("rlc_cloud_repos", cfg, FakeCloud(), [])
+
+    assert ran_marker.exists()
+    assert marker.exists()
+    assert (dnf_vars_dir / "baseurl1").read_text().strip() == (
+        "https://depot.prod.ciqws.com"
+    )
+    assert (dnf_vars_dir / "baseurl2").read_text().strip() == (
+        "https://depot.us-east-2.prod.ciqws.com"
+    )
+
+
+def test_handle_skips_configured_instance(
+    ran_marker, no_cloud_init_query, dnf_vars_dir, marker, mirrors_file
+):
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    marker.touch()
+    cc_rlc_cloud_repos.handle(
+        "rlc_cloud_repos", {"rlc_cloud_repos": {"args": []}}, FakeCloud(), []
+    )
+    assert not (dnf_vars_dir / "baseurl1").exists()
+    assert ran_marker.exists()
+
+
+def test_handle_reports_failure(
+    ran_marker, no_cloud_init_query, tmp_path, dnf_vars_dir, marker
+):
+    cfg = {
+        "rlc_cloud_repos": {
+            "args": ["--force", "--mirror-file", str(tmp_path / "missing.yaml")]
+        }
+    }
+    with pytest.raises(RuntimeError):
+        cc_rlc_cloud_repos.handle("rlc_cloud_repos", cfg, FakeCloud(), [])
@@ -14,7 +14,8 @@ from unittest.mock import MagicMock
 
 import pytest
 
-from rlc.cloud_repos.cloud_metadata import get_cloud_metadata
+from rlc.cloud_repos import cloud_metadata
+from rlc.cloud_repos.cloud_metadata import get_cloud_metadata, get_instance_id
 from rlc.cloud_repos.dnf_vars import ensure_all_dnf_vars
 from rlc.cloud_repos.log_utils import log_and_print
 from rlc.cloud_repos.repo_config import load_mirror_map, select_mirror
@@ -39,7 +40,7 @@ def test_cloud_metadata_and_mirror(
     Validates that cloud metadata and mirror resolution behave as expected.
     """
 
-    def fake_check_output(cmd, text=True):
+    def fake_check_output(cmd, text=True, timeout=None):
         if "cloud_name" in cmd:
             return expected_provider
         elif "region" in cmd:
@@ -71,7 +72,10 @@ def test_dnf_vars_creation_and_backup(monkeypatch, mirrors_file, tmp_path):
 
     monkeypatch.setattr(
         "rlc.cloud_repos.cloud_metadata.subprocess.check_output",
-        lambda cmd, text=True: {"cloud_name": "aws", "region": "us-west-2"}[cmd[-1]],
+        lambda cmd, text=True, timeout=None: {
+            "cloud_name": "aws",
+            "region": "us-west-2",
+        }[cmd[-1]],
     )
 
     metadata = get_cloud_metadata()
@@ -88,7 +92,9 @@ def test_dnf_vars_creation_and_backup(monkeypatch, mirrors_file, tmp_path):
 def test_cloud_metadata_returns_dict(monkeypatch):
     monkeypatch.setattr(
         "subprocess.check_output",
-        lambda cmd, text=True: "aws" if "cloud_name" in cmd else "us-west-2",
+        lambda cmd, text=True, timeout=None: (
+            "aws" if "cloud_name" in cmd else "us-west-2"
+        ),
     )
     result = get_cloud_metadata()
     assert isinstance(result, dict)
@@ -139,8 +145,91 @@ def test_metadata_file_for_missing_values(mirrors_file):
         value.pop("default")
         for region, r_map in value.items():
             assert (
-                "primary" in r_map
-            ), f"No primary URL found in region '{region}' of provider '{key}'"
+                "primary" in r_map or "pool" in r_map
+            ), f"No primary URL or pool found in region '{region}' of provider '{key}'"
             assert (
                 "backup" in r_map
             ), f"No backup URL found in region '{region}' of provider '{key}'"
+
+
+def test_get_instance_id_prefers_cloud_init(monkeypatch, tmp_path):
+    cloud_init_id = tmp_path / "instance-id"
+    machine_id = tmp_path / "machine-id"
+    cloud_init_id.write_text("i-0123456789abcdef0\n")
+    machine_id.write_text("0f1e2d3c4b5a\n")
+    monkeypatch.setattr(
+        "rlc.cloud_repos.cloud_metadata.INSTANCE_ID_PATHS",
+        (str(cloud_init_id), str(machine_id)),
+    )
+    assert get_instance_id() == "i-0123456789abcdef0"
+
+    cloud_init_id.unlink()
+    assert get_instance_id() == "0f1e2d3c4b5a"
+
+    machine_id.unlink()
+    assert get_instance_id() == ""
+
+
+def test_cloud_metadata_handles_subprocess_timeout(monkeypatch):
+    """A hanging cloud-init is reported like a failing one."""
+    side_effect = subprocess.TimeoutExpired("cloud-init", 30)
+    monkeypatch.setattr("subprocess.check_output", MagicMock(side_effect=side_effect))
+
+    with pytest.raises(RuntimeError, match="cloud-init must be available"):
+        get_cloud_metadata()
+
+
+DMI_TREES = {
+    "aws": {"sys_vendor": "Amazon EC2", "product_name": "m6i.large"},
+    "azure": {
+        "sys_vendor": "Microsoft Corporation",
+        "product_name": "Virtual Machine",
+        "chassis_asset_tag": "7783-7084-3265-9085-8269-3286-77",
+    },
+    "gcp": {"sys_vendor": "Google", "product_name": "Google Compute Engine"},
+    "oracle": {
+        "sys_vendor": "QEMU",
+        "product_name": "Standard PC (i440FX + PIIX, 1996)",
+        "chassis_asset_tag": "OracleCloud.com",
+    },
+    "": {"sys_vendor": "Dell Inc.", "product_name": "PowerEdge R650"},
+}
+
+
+@pytest.mark.parametrize("provider", sorted(DMI_TREES))
+def test_get_dmi_provider(dmi_id_dir, provider):
+    for name, value in DMI_TREES[provider].items():
+        (dmi_id_dir / name).write_text(value + "\n")
+    assert cloud_metadata.get_dmi_provider() == provider
+
+
+def test_get_dmi_provider_without_sysfs(dmi_id_dir):
+    dmi_id_dir.rmdir()
+    assert cloud_metadata.get_dmi_provider() == ""
+
+
+def test_cloud_metadata_prefers_dmi_provider(monkeypatch, dmi_id_dir):
+    (dmi_id_dir / "sys_vendor").write_text("Amazon EC2\n")
+    queries = []
+
+    def fake_check_output(cmd, text=True, timeout=None):
+        queries.append(cmd[-1])
+        return {"cloud_name": "azure", "region": "us-west-2"}[cmd[-1]]
+
+    monkeypatch.setattr("subprocess.check_output", fake_check_output)
+    metadata = get_cloud_metadata()
+    assert metadata["provider"] == "aws"
+    assert metadata["region"] == "us-west-2"
+    assert queries == ["region"]
+
+
+def test_cloud_metadata_normalizes_cloud_init_names(monkeypatch):
+    """cloud-init's 'gce' maps to the mirror map's 'gcp' section."""
+    monkeypatch.setattr(
+        "subprocess.check_output",
+        lambda cmd, text=True, timeout=None: {
+            "cloud_name": "GCE",
+            "region": "us-central1",
+        }[cmd[-1]],
+    )
+    assert get_cloud_metadata()["provider"] == "gcp"
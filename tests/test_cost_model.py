@@ -0,0 +1,143 @@
+import json
+
+import pytest
+
+from rlc.cloud_repos import cost_model
+from rlc.cloud_repos.main import main, parse_args, resolve_mirrors
+
+SAME_REGION = "https://use1.example"
+OTHER_REGION = "https://use2.example"
+PUBLIC = "https://public.example"
+
+COST_MAP = {
+    "aws": {
+        "us-east-1": {
+            "primary": PUBLIC,
+            "backup": OTHER_REGION,
+            "pool": [PUBLIC, SAME_REGION],
+        }
+    },
+    "default": {
+        "primary": PUBLIC,
+        "backup": OTHER_REGION,
+        "egress": {
+            "aws": {
+                "same_zone": 0.0,
+                "same_region": 0.01,
+                "cross_region": 0.02,
+                "internet": 0.09,
+            },
+            "default": {"internet": 0.12},
+        },
+        "locations": {
+            SAME_REGION: {"provider": "aws", "region": "us-east-1", "zone": "use1-az1"},
+            OTHER_REGION: {"provider": "aws", "region": "us-east-2"},
+        },
+    },
+}
+METADATA = {"provider": "aws", "region": "us-east-1", "instance_id": "i-1"}
+
+
+@pytest.mark.parametrize(
+    "metadata, url, expected",
+    [
+        (METADATA, SAME_REGION, "same_region"),
+        (dict(METADATA, zone="use1-az1"), SAME_REGION, "same_zone"),
+        (dict(METADATA, zone="use1-az2"), SAME_REGION, "same_region"),
+        (METADATA, OTHER_REGION, "cross_region"),
+        (METADATA, PUBLIC, "internet"),
+        (dict(METADATA, provider="azure"), SAME_REGION, "internet"),
+    ],
+)
+def test_tier(metadata, url, expected):
+    assert cost_model.tier(metadata, COST_MAP, url) == expected
+
+
+def test_cost_per_gb():
+    assert cost_model.cost_per_gb(METADATA, COST_MAP, OTHER_REGION) == 0.02
+    azure = dict(METADATA, provider="azure")
+    assert cost_model.cost_per_gb(azure, COST_MAP, SAME_REGION) == 0.12
+    assert cost_model.cost_per_gb(METADATA, {"default": {}}, SAME_REGION) is None
+
+
+def test_rank_by_cost_mixes_cost_and_latency():
+    urls = [PUBLIC, OTHER_REGION, SAME_REGION]
+    # Modeled latency and cost agree
+    assert cost_model.rank_by_cost(METADATA, COST_MAP, urls, 0.5) == [
+        SAME_REGION,
+        OTHER_REGION,
+        PUBLIC,
+    ]
+    measured = {PUBLIC: 0.01, OTHER_REGION: 0.2, SAME_REGION: None}
+    assert cost_model.rank_by_cost(METADATA, COST_MAP, urls, 0.0, measured) == [
+        PUBLIC,
+        OTHER_REGION,
+        SAME_REGION,
+    ]
+    assert cost_model.rank_by_cost(METADATA, COST_MAP, urls, 1.0, measured) == [
+        OTHER_REGION,
+        PUBLIC,
+        SAME_REGION,
+    ]
+
+
+def test_resolve_mirrors_with_cost_weight():
+    plain = resolve_mirrors(METADATA, COST_MAP, parse_args([]))
+    assert plain[0] in (PUBLIC, SAME_REGION)
+    assert resolve_mirrors(METADATA, COST_MAP, parse_args(["--cost-weight", "1"])) == (
+        SAME_REGION,
+        OTHER_REGION,
+    )
+
+
+def test_report_records_cost(monkeypatch, tmp_path, dnf_vars_dir, marker):
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.get_cloud_metadata", lambda: dict(METADATA)
+    )
+    mirror_file = tmp_path / "mirrors.json"
+    mirror_file.write_text(json.dumps(COST_MAP))
+    report = tmp_path / "runs.jsonl"
+    args = ["--force", "--mirror-file", str(mirror_file), "--report", str(report)]
+    assert main(args + ["--cost-weight", "0.5"]) == 0
+
+    record = json.loads(report.read_text())
+    assert record["mirror"] == SAME_REGION
+    assert record["cost_per_gb"] == 0.01
+
+
+def test_unpriced_mirrors_are_not_free():
+    priced = {
+        "default": {
+            "egress": {"aws": {"same_region": 0.01, "cross_region": 0.02}},
+            "locations": COST_MAP["default"]["locations"],
+        }
+    }
+    # PUBLIC is internet traffic, which this map has no price for; it ties
+    # with the most expensive priced mirror instead of ranking first
+    assert cost_model.rank_by_cost(
+        METADATA, priced, [PUBLIC, OTHER_REGION, SAME_REGION], 1.0
+    ) == [SAME_REGION, PUBLIC, OTHER_REGION]
+
+
+def test_cost_weight_combines_with_throughput(monkeypatch):
+    mirror_map = {
+        "aws": {"us-east-1": {"primary": PUBLIC, "backup": OTHER_REGION}},
+        "default": dict(
+            COST_MAP["default"], classes={"bulk": {"policy": "throughput"}}
+        ),
+    }
+    rates = {PUBLIC: 50e6, OTHER_REGION: 1e6}
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.throughput.probe_throughput",
+        lambda urls, *args: {url: rates.get(url) for url in urls},
+    )
+    args = ["--throughput", "--cost-weight"]
+    # Mostly cost: the cheaper cross-region mirror wins despite its speed
+    assert resolve_mirrors(
+        METADATA, mirror_map, parse_args(args + ["0.9"]), "throughput"
+    ) == (OTHER_REGION, PUBLIC)
+    # Mostly speed: the fast internet mirror wins, where cost alone used to
+    # override --throughput
+    assert resolve_mirrors(
+        METADATA, mirror_map, parse_args(args + ["0.1"]), "throughput"
+    ) == (PUBLIC, OTHER_REGION)
@@ -1,3 +1,4 @@
+import threading
 from unittest.mock import MagicMock
 
 import pytest
@@ -112,3 +113,48 @@ def test_write_dnf_var_non_writable_dir_pre_existing_file(monkeypatch, dnf_dir,
     # Verify error was logged
     assert "Cannot backup DNF var 'test'" in caplog.text
     assert "Permission denied" in caplog.text
+
+
+def test_write_dnf_var_leaves_no_temporary_files(dnf_dir):
+    """Values are renamed into place, so only the var and its backup remain"""
+    _write_dnf_var(dnf_dir, "test", "old_value")
+    _write_dnf_var(dnf_dir, "test", "new_value")
+    assert sorted(p.name for p in dnf_dir.iterdir()) == ["test", f"test{BACKUP_SUFFIX}"]
+
+
+def test_write_dnf_var_is_never_missing(dnf_dir):
+    """A reader polling the var while it changes always sees a full value"""
+    _write_dnf_var(dnf_dir, "test", "value-0")
+    seen = set()
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            try:
+                seen.add((dnf_dir / "test").read_text())
+            except FileNotFoundError:
+                seen.add(None)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for i in range(1, 200):
+        _write_dnf_var(dnf_dir, "test", f"value-{i}")
+    done.set()
+    thread.join()
+    assert None not in seen
+    assert all(value.endswith("\n") for value in seen)
+
+
+def test_ensure_all_dnf_vars_writes_class_sets(dnf_dir):
+    ensure_all_dnf_vars(
+        dnf_dir,
+        "https://primary.mirror",
+        "https://backup.mirror",
+        {"bulk": ("https://bulk.mirror", "https://bulk-backup.mirror")},
+    )
+
+    assert (dnf_dir / "baseurl1").read_text().strip() == "https://primary.mirror"
+    assert (dnf_dir / "bulk_baseurl1").read_text().strip() == "https://bulk.mirror"
+    assert (dnf_dir / "bulk_baseurl2").read_text().strip() == (
+        "https://bulk-backup.mirror"
+    )
@@ -0,0 +1,76 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+
+from rlc.cloud_repos import dns_warmup
+from rlc.cloud_repos.main import main
+
+
+def test_warm_up_resolves_both_families(fake_dns):
+    times = dns_warmup.warm_up(
+        ["https://depot.internal/path", "https://depot.internal", "", "https://x.nx"]
+    )
+    assert set(times) == {"depot.internal", "x.nx"}
+    assert times["depot.internal"]["A"] is not None
+    assert times["x.nx"] == {"A": None, "AAAA": None}
+
+
+def test_warm_up_respects_budget(fake_dns):
+    start = time.monotonic()
+    times = dns_warmup.warm_up(["https://depot.slow"], timeout=0.3)
+    assert time.monotonic() - start < 1.0
+    assert times == {"depot.slow": {"A": None, "AAAA": None}}
+
+
+def test_stalled_lookups_do_not_outlive_budget():
+    """The process exits at the budget, not when the stalled lookups end."""
+    script = textwrap.dedent("""
+        import socket, time
+        from rlc.cloud_repos import dns_warmup
+
+        def getaddrinfo(*args, **kwargs):
+            time.sleep(3)
+            raise socket.gaierror(socket.EAI_NONAME, "stalled")
+
+        socket.getaddrinfo = getaddrinfo
+        dns_warmup.warm_up(["https://depot.stalled"], timeout=0.3)
+        """)
+    source_root = os.path.dirname(os.path.dirname(os.path.dirname(dns_warmup.__file__)))
+    env = dict(os.environ, PYTHONPATH=source_root)
+    start = time.monotonic()
+    subprocess.run([sys.executable, "-c", script], check=True, env=env, timeout=10)
+    assert time.monotonic() - start < 2.0
+
+
+def test_zero_budget_disables_warm_up(fake_dns):
+    assert dns_warmup.warm_up(["https://depot.internal"], timeout=0) == {}
+
+
+def test_warm_up_is_recorded_in_report(
+    monkeypatch, tmp_path, dnf_vars_dir, marker, mirrors_file
+):
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.get_cloud_metadata",
+        lambda: {"provider": "aws", "region": "us-east-2", "instance_id": "i-1"},
+    )
+    looked_up = []
+
+    def getaddrinfo(host, port, family=0, *args, **kwargs):
+        looked_up.append((host, family))
+        return [(family, socket.SOCK_STREAM, 6, "", ("10.0.0.1", 0))]
+
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    report_path = tmp_path / "runs.jsonl"
+    assert main(["--force", "--warm-dns", "--report", str(report_path)]) == 0
+
+    record = json.loads(report_path.read_text())
+    assert "warm_dns" in record["phases"]
+    assert set(record["dns"]) == {
+        "depot.prod.ciqws.com",
+        "depot.us-east-2.prod.ciqws.com",
+    }
+    assert ("depot.prod.ciqws.com", socket.AF_INET6) in looked_up
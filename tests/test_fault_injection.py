@@ -0,0 +1,187 @@
+"""
+Fault-injection scenarios for the whole resolution path.
+
+Each scenario runs main() against the fault lab (fake cloud-init and mirror
+stand-ins) and checks both the outcome and how long it took.
+"""
+
+import socket
+import urllib.request
+
+import pytest
+
+from rlc.cloud_repos import ip_region
+
+
+@pytest.fixture
+def mirrors(fault_lab):
+    """A healthy primary and backup mirror mapped for aws/us-east-1."""
+    primary = fault_lab.mirror()
+    backup = fault_lab.mirror()
+    fault_lab.map_region("aws", "us-east-1", primary.url, backup.url)
+    return primary, backup
+
+
+def test_healthy_path_is_fast(fault_lab, mirrors):
+    primary, backup = mirrors
+    run = fault_lab.run()
+
+    assert run.exit_code == 0
+    assert run.elapsed < 2
+    assert run.dnf_vars == {"baseurl1": primary.url, "baseurl2": backup.url}
+    assert fault_lab.cloud_init.calls == ["query cloud_name", "query region"]
+
+
+def test_slow_cloud_init_is_waited_for(fault_lab, mirrors):
+    fault_lab.cloud_init.set("region", "us-east-1", delay=1.0)
+    run = fault_lab.run()
+
+    assert run.exit_code == 0
+    assert 1.0 <= run.elapsed < 3
+
+
+def test_hanging_cloud_init_is_bounded(fault_lab, mirrors, monkeypatch):
+    monkeypatch.setattr("rlc.cloud_repos.cloud_metadata.CLOUD_INIT_TIMEOUT", 1)
+    fault_lab.cloud_init.set("cloud_name", "aws", hang=True)
+    run = fault_lab.run()
+
+    assert run.exit_code == 1
+    assert run.elapsed < 3
+    assert run.dnf_vars == {}
+
+
+def test_failing_cloud_init_fails_fast(fault_lab, mirrors):
+    fault_lab.cloud_init.set("region", exit=2)
+    run = fault_lab.run()
+
+    assert run.exit_code == 1
+    assert run.elapsed < 2
+
+
+def test_unknown_region_falls_back_to_provider_default(fault_lab, mirrors):
+    primary, backup = mirrors
+    fault_lab.map_region("aws", "default", backup.url, primary.url)
+    fault_lab.cloud_init.set("region", "ap-nowhere-1")
+    run = fault_lab.run()
+
+    assert run.exit_code == 0
+    assert run.dnf_vars["baseurl1"] == backup.url
+
+
+@pytest.mark.parametrize(
+    "fault",
+    [
+        {"status": 500},
+        {"status": 503},
+        {"drop": True},
+        {"hang": True},
+        {"delay": 5},
+    ],
+    ids=["500", "503", "dropped", "hanging", "slow"],
+)
+def test_probe_routes_around_broken_primary(fault_lab, fault):
+    broken = fault_lab.mirror(**fault)
+    healthy = fault_lab.mirror()
+    fault_lab.map_region("aws", "us-east-1", broken.url, healthy.url)
+    run = fault_lab.run("--probe", "--probe-timeout", "0.5")
+
+    assert run.exit_code == 0
+    assert run.elapsed < 2
+    assert run.dnf_vars == {"baseurl1": healthy.url, "baseurl2": broken.url}
+
+
+def test_probe_keeps_map_order_when_everything_is_down(fault_lab):
+    primary = fault_lab.mirror(hang=True)
+    backup = fault_lab.mirror(status=502)
+    fault_lab.map_region("aws", "us-east-1", primary.url, backup.url)
+    run = fault_lab.run("--probe", "--probe-timeout", "0.5")
+
+    assert run.exit_code == 0
+    assert run.elapsed < 2
+    assert run.dnf_vars == {"baseurl1": primary.url, "baseurl2": backup.url}
+
+
+def test_lab_mirror_stalls_mid_body(fault_lab):
+    """The stand-ins can stall after sending part of a body."""
+    mirror = fault_lab.mirror(body=b"x" * 1000, stall_after=100)
+    url = mirror.url + "/repodata/repomd.xml"
+    with urllib.request.urlopen(url, timeout=0.3) as response:
+        assert response.read(100) == b"x" * 100
+        with pytest.raises(socket.timeout):
+            response.read()
+
+
+@pytest.mark.parametrize(
+    "args,stalled_path",
+    [
+        (
+            [
+                "--freshness",
+                "--freshness-timeout",
+                "0.5",
+                "--freshness-path",
+                "repodata/repomd.xml",
+            ],
+            "/repodata/repomd.xml",
+        ),
+        (
+            [
+                "--throughput",
+                "--throughput-timeout",
+                "0.5",
+                "--throughput-path",
+                "images/big.img",
+            ],
+            "/images/big.img",
+        ),
+    ],
+    ids=["freshness", "throughput"],
+)
+def test_mirror_stalling_mid_body_does_not_delay_exit(fault_lab, args, stalled_path):
+    """The process exits within its budgets, not when the stalled reads end."""
+    stalled = fault_lab.mirror()
+    stalled.responses[stalled_path] = {"body": b"x" * (1024 * 1024), "stall_after": 100}
+    healthy = fault_lab.mirror(body=b"x" * (1024 * 1024))
+    fault_lab.map_region("aws", "us-east-1", stalled.url, healthy.url)
+    fault_lab.mirror_map["default"] = {
+        "primary": stalled.url,
+        "backup": healthy.url,
+        "policy": "throughput",
+    }
+    run = fault_lab.run_process(*args)
+
+    assert run.exit_code == 0
+    assert run.elapsed < 3
+    assert set(run.dnf_vars) == {"baseurl1", "baseurl2"}
+    assert stalled_path in [path for _, path, _ in stalled.requests]
+
+
+@pytest.mark.parametrize(
+    "fault",
+    [{"hang": True}, {"stall_after": 2}],
+    ids=["hanging", "stalled"],
+)
+def test_broken_imds_does_not_hold_up_boot(fault_lab, mirrors, fault):
+    primary, backup = mirrors
+    fault_lab.map_region("aws", "default", backup.url, primary.url)
+    fault_lab.cloud_init.set("region", "")
+    imds = fault_lab.imds("52.4.8.9", [("52.4.0.0/14", "aws", "us-east-1")], **fault)
+    run = fault_lab.run()
+
+    assert run.exit_code == 0
+    assert run.elapsed < ip_region.IMDS_TIMEOUT + 1
+    # No region could be inferred, the provider default is used
+    assert run.dnf_vars["baseurl1"] == backup.url
+    assert imds.requests
+
+
+def test_slow_imds_still_infers_region(fault_lab, mirrors):
+    primary, backup = mirrors
+    fault_lab.map_region("aws", "default", backup.url, primary.url)
+    fault_lab.cloud_init.set("region", "")
+    fault_lab.imds("52.4.8.9", [("52.4.0.0/14", "aws", "us-east-1")], delay=0.2)
+    run = fault_lab.run()
+
+    assert run.exit_code == 0
+    assert run.elapsed < ip_region.IMDS_TIMEOUT + 1
+    assert run.dnf_vars["baseurl1"] == primary.url
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+from rlc.cloud_repos import freshness, url_utils
+
+REPOMD = """<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo"
+        xmlns:rpm="http://linux.duke.edu/metadata/rpm">
+  <revision>{revision}</revision>
+  <data type="primary">
+    <location href="repodata/primary.xml.gz"/>
+    <timestamp>{timestamp}</timestamp>
+  </data>
+</repomd>
+"""
+REPOMD_PATH = "/repodata/repomd.xml"
+# Where the default path points on a depot-root mirror
+DEPOT_REPOMD_PATH = "/" + url_utils.expand_release_vars(freshness.DEFAULT_REPOMD_PATH)
+NOW = 1700000000
+
+
+@pytest.fixture(autouse=True)
+def no_validators(monkeypatch):
+    monkeypatch.setattr(freshness, "_validators", {})
+
+
+def _repomd(stamp, **extra):
+    body = REPOMD.format(revision=stamp - 60, timestamp=stamp).encode()
+    return dict(body=body, **extra)
+
+
+def test_parse_repomd():
+    assert freshness.parse_repomd(_repomd(NOW)["body"]) == NOW
+    assert (
+        freshness.parse_repomd(b"<repomd><revision>not-a-stamp</revision></repomd>")
+        is None
+    )
+    assert freshness.parse_repomd(b"<repomd") is None
+
+
+def test_largest_data_file():
+    document = b"""<repomd xmlns="http://linux.duke.edu/metadata/repo">
+  <data type="primary">
+    <location href="repodata/primary.xml.gz"/><size>2048</size>
+  </data>
+  <data type="filelists">
+    <location href="repodata/filelists.xml.gz"/><size>8192</size>
+  </data>
+  <data type="group"><location href="repodata/comps.xml"/></data>
+</repomd>"""
+    assert freshness.largest_data_file(document) == "repodata/filelists.xml.gz"
+    assert freshness.largest_data_file(_repomd(NOW)["body"]) is None
+    assert freshness.largest_data_file(b"<repomd") is None
+
+
+def test_fetch_uses_conditional_requests(fault_lab):
+    mirror = fault_lab.mirror()
+    mirror.responses[REPOMD_PATH] = _repomd(NOW, headers={"ETag": '"v1"'})
+    url = mirror.url + REPOMD_PATH
+    assert freshness.fetch_freshness(url) == NOW
+
+    mirror.responses[REPOMD_PATH] = {"status": 304}
+    assert freshness.fetch_freshness(url) == NOW
+    method, path, headers = mirror.requests[-1]
+    assert headers["If-None-Match"] == '"v1"'
+
+    mirror.responses[REPOMD_PATH] = {"status": 404}
+    assert freshness.fetch_freshness(url) is None
+
+
+def test_fetch_all_is_concurrent_and_bounded(fault_lab):
+    fresh = fault_lab.mirror()
+    fresh.responses[DEPOT_REPOMD_PATH] = _repomd(NOW, delay=0.3)
+    hung = fault_lab.mirror()
+    hung.responses[DEPOT_REPOMD_PATH] = {"hang": True}
+    other = fault_lab.mirror()
+    other.responses[DEPOT_REPOMD_PATH] = _repomd(NOW - 10, delay=0.3)
+
+    start = time.monotonic()
+    result = freshness.fetch_all_freshness([fresh.url, hung.url, other.url], timeout=1)
+    assert time.monotonic() - start < 1.5
+    assert result == {fresh.url: NOW, hung.url: None, other.url: NOW - 10}
+
+
+def test_stale_mirrors():
+    stamps = {"a": NOW, "b": NOW - 600, "c": NOW - 7200, "d": None}
+    assert freshness.stale_mirrors(stamps, 3600) == {"c"}
+    assert freshness.stale_mirrors(stamps, 60) == {"b", "c"}
+    assert freshness.stale_mirrors({"d": None}) == set()
+
+
+def test_stale_primary_is_demoted(fault_lab):
+    primary = fault_lab.mirror()
+    primary.responses[DEPOT_REPOMD_PATH] = _repomd(NOW - 86400)
+    backup = fault_lab.mirror()
+    backup.responses[DEPOT_REPOMD_PATH] = _repomd(NOW)
+    fault_lab.map_region("aws", "us-east-1", primary.url, backup.url)
+
+    assert fault_lab.run().dnf_vars["baseurl1"] == primary.url
+    run = fault_lab.run("--freshness")
+    assert run.exit_code == 0
+    assert run.dnf_vars["baseurl1"] == backup.url
+    assert run.dnf_vars["baseurl2"] == primary.url
+
+    # Within the window the map order stands
+    run = fault_lab.run("--freshness", "--freshness-window", "172800")
+    assert run.dnf_vars["baseurl1"] == primary.url
+
+
+def test_warns_when_no_mirror_serves_repomd(fault_lab, capsys):
+    primary = fault_lab.mirror(status=404)
+    backup = fault_lab.mirror(status=404)
+    fault_lab.map_region("aws", "us-east-1", primary.url, backup.url)
+
+    run = fault_lab.run("--freshness")
+    assert run.exit_code == 0
+    assert run.dnf_vars["baseurl1"] == primary.url
+    assert "freshness is not checked" in capsys.readouterr().out
+    assert [path for _, path, _ in primary.requests] == [DEPOT_REPOMD_PATH]
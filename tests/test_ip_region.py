@@ -0,0 +1,247 @@
+import ipaddress
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from rlc.cloud_repos import ip_region
+from rlc.cloud_repos.ip_region import PrefixIndex, infer_region, load_index
+from rlc.cloud_repos.main import main
+
+AWS_TTL = ip_region.AWS_TOKEN_TTL_HEADER
+
+RECORDS = [
+    ("52.0.0.0/11", "aws", "us-east-1"),
+    ("52.4.0.0/14", "aws", "us-east-2"),
+    ("52.4.8.0/24", "aws", "us-west-2"),
+    ("20.42.0.0/17", "azure", "eastus"),
+    ("34.16.0.0/15", "gcp", "us-central1"),
+    ("2600:1f14::/35", "aws", "us-west-2"),
+    ("2600:1f14:1000::/40", "aws", "eu-west-1"),
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_loaded_indexes(monkeypatch):
+    monkeypatch.setattr(ip_region, "_loaded_indexes", {})
+
+
+class ImdsHandler(BaseHTTPRequestHandler):
+    """Answers like a metadata service: (method, path) -> (header, body)."""
+
+    answers = {
+        ("PUT", "/latest/api/token"): (AWS_TTL, "token"),
+        ("GET", "/latest/meta-data/public-ipv4"): (
+            "X-aws-ec2-metadata-token",
+            "52.4.8.9",
+        ),
+        ("GET", "/metadata/instance/network?api-version=2021-02-01"): (
+            "Metadata",
+            json.dumps(
+                {
+                    "interface": [
+                        {
+                            "ipv4": {
+                                "ipAddress": [
+                                    {
+                                        "privateIpAddress": "10.1.0.4",
+                                        "publicIpAddress": "20.42.0.9",
+                                    }
+                                ]
+                            }
+                        }
+                    ]
+                }
+            ),
+        ),
+        ("GET", "/computeMetadata/v1/instance/network-interfaces/?recursive=true"): (
+            "Metadata-Flavor",
+            json.dumps(
+                [{"ip": "10.128.0.2", "accessConfigs": [{"externalIp": "34.16.0.7"}]}]
+            ),
+        ),
+    }
+
+    def _answer(self, method):
+        header, body = self.answers.get((method, self.path), (None, None))
+        if body is None or not self.headers.get(header):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def do_GET(self):
+        self._answer("GET")
+
+    def do_PUT(self):
+        self._answer("PUT")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def imds(monkeypatch, make_http_server):
+    """Metadata service stand-in, with a private default route address."""
+    server = make_http_server(ImdsHandler)
+    monkeypatch.setattr(ip_region, "IMDS_URL", server.url)
+    monkeypatch.setattr(ip_region, "get_instance_ips", lambda: ["10.0.0.5"])
+    return server
+
+
+@pytest.fixture
+def index_file(tmp_path):
+    path = tmp_path / "ip-prefixes.idx"
+    PrefixIndex.build(RECORDS).save(str(path))
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "address,expected",
+    [
+        ("52.0.0.1", ("aws", "us-east-1")),
+        ("52.4.0.1", ("aws", "us-east-2")),
+        ("52.4.8.200", ("aws", "us-west-2")),
+        ("52.4.9.1", ("aws", "us-east-2")),
+        ("52.8.0.1", ("aws", "us-east-1")),
+        ("52.31.255.255", ("aws", "us-east-1")),
+        ("52.32.0.0", None),
+        ("20.42.127.1", ("azure", "eastus")),
+        ("10.0.0.1", None),
+        ("2600:1f14::1", ("aws", "us-west-2")),
+        ("2600:1f14:10ff::1", ("aws", "eu-west-1")),
+        ("2600:1f14:1100::1", ("aws", "us-west-2")),
+        ("2001:db8::1", None),
+    ],
+)
+def test_lookup_most_specific_prefix_wins(address, expected):
+    assert PrefixIndex.build(RECORDS).lookup(address) == expected
+
+
+def test_save_and_load_roundtrip(index_file):
+    index = PrefixIndex.load(index_file)
+    assert index.lookup("52.4.8.1") == ("aws", "us-west-2")
+    assert index.lookup("2600:1f14:1000::1") == ("aws", "eu-west-1")
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "bogus.idx"
+    path.write_bytes(b"not an index")
+    with pytest.raises(ValueError):
+        PrefixIndex.load(str(path))
+
+
+def test_load_index_is_lazy_and_cached(index_file):
+    assert ip_region._loaded_indexes == {}
+    first = load_index(index_file)
+    assert load_index(index_file) is first
+
+
+def test_load_index_missing_file(tmp_path):
+    assert load_index(str(tmp_path / "missing.idx")) is None
+
+
+def test_infer_region(index_file):
+    assert infer_region("aws", ["10.0.0.5", "52.4.8.9"], index_file) == "us-west-2"
+    assert infer_region("", ["20.42.0.9"], index_file) == "eastus"
+    # Matches for another provider are not trusted
+    assert infer_region("aws", ["20.42.0.9"], index_file) == ""
+    assert infer_region("aws", ["52.4.8.9"], "/nonexistent.idx") == ""
+
+
+@pytest.mark.parametrize(
+    "provider,expected",
+    [
+        ("aws", ["52.4.8.9"]),
+        ("azure", ["20.42.0.9"]),
+        ("gce", ["34.16.0.7"]),
+        ("oracle", []),
+    ],
+)
+def test_get_public_ips_asks_imds(imds, provider, expected):
+    assert ip_region.get_public_ips(provider) == expected
+
+
+def test_get_public_ips_keeps_public_route_address(monkeypatch):
+    monkeypatch.setattr(ip_region, "IMDS_URL", "http://127.0.0.1:9")
+    monkeypatch.setattr(ip_region, "get_instance_ips", lambda: ["10.0.0.5", "52.0.0.1"])
+    assert ip_region.get_public_ips("aws", timeout=0.2) == ["52.0.0.1"]
+
+
+def test_imds_requests_share_one_budget(monkeypatch, make_http_server):
+    class StalledImds(BaseHTTPRequestHandler):
+        def do_PUT(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "5")
+            self.end_headers()
+            self.wfile.write(b"token")
+
+        def do_GET(self):
+            time.sleep(2)
+
+        def log_message(self, *args):
+            pass
+
+    server = make_http_server(StalledImds)
+    monkeypatch.setattr(ip_region, "IMDS_URL", server.url)
+    monkeypatch.setattr(ip_region, "get_instance_ips", lambda: [])
+    start = time.monotonic()
+    # Token, IPv4 and IPv6 requests together stay within the budget
+    assert ip_region.get_public_ips("aws", timeout=0.5) == []
+    assert time.monotonic() - start < 0.9
+
+
+@pytest.mark.parametrize("provider", ["aws", "azure", "gce", "GCP"])
+def test_infer_region_from_public_address(imds, index_file, provider):
+    expected = {"aws": "us-west-2", "azure": "eastus"}.get(provider, "us-central1")
+    assert infer_region(provider, path=index_file) == expected
+
+
+def test_get_instance_ips_returns_addresses():
+    for address in ip_region.get_instance_ips():
+        ipaddress.ip_address(address)
+
+
+def test_lookup_speed_with_many_prefixes(tmp_path):
+    """Hundreds of thousands of prefixes still answer in microseconds."""
+    rng = random.Random(42)
+    labels = [f"aws/region-{n}" for n in range(30)]
+    blocks = sorted(rng.sample(range(1 << 22), 300000))
+    intervals = [(n << 10, (n << 10) + 1023, n % 30) for n in blocks]
+    path = tmp_path / "large.idx"
+    PrefixIndex(labels, intervals, []).save(str(path))
+
+    start = time.monotonic()
+    index = PrefixIndex.load(str(path))
+    assert time.monotonic() - start < 0.5
+
+    addresses = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(20000)]
+    start = time.monotonic()
+    for address in addresses:
+        index.lookup(address)
+    per_lookup = (time.monotonic() - start) / len(addresses)
+    assert per_lookup < 50e-6
+
+
+def test_main_infers_missing_region(
+    monkeypatch, index_file, dnf_vars_dir, marker, mirrors_file
+):
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.get_cloud_metadata",
+        lambda: {"provider": "aws", "region": ""},
+    )
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.infer_region",
+        lambda provider: infer_region(provider, ["52.4.0.10"], index_file),
+    )
+
+    assert main(["--mirror-file", str(mirrors_file)]) == 0
+    assert (dnf_vars_dir / "baseurl2").read_text().strip() == (
+        "https://depot.us-east-2.prod.ciqws.com"
+    )
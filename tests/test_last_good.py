@@ -0,0 +1,188 @@
+import json
+import time
+
+from rlc.cloud_repos import last_good, readiness
+from rlc.cloud_repos.main import _apply_last_good, main
+
+METADATA = {"provider": "aws", "region": "us-east-1", "instance_id": "i-1"}
+
+
+def test_round_trip(mirrors_file, last_good_file):
+    inputs = last_good.fingerprint(str(mirrors_file))
+    last_good.save(inputs, METADATA, "https://primary", "https://backup")
+
+    assert last_good_file.exists()
+    record = last_good.load_record(last_good.fingerprint(str(mirrors_file)))
+    assert (record["baseurl1"], record["baseurl2"]) == (
+        "https://primary",
+        "https://backup",
+    )
+    assert record["metadata"] == METADATA
+
+
+def test_changed_map_invalidates(mirrors_file):
+    last_good.save(
+        last_good.fingerprint(str(mirrors_file)), METADATA, "https://p", "https://b"
+    )
+    with open(mirrors_file, "a") as f:
+        f.write("# edited\n")
+    assert last_good.load_record(last_good.fingerprint(str(mirrors_file))) is None
+
+
+def test_changed_instance_invalidates(monkeypatch, mirrors_file):
+    monkeypatch.setattr(last_good, "get_instance_id", lambda: "i-1")
+    last_good.save(
+        last_good.fingerprint(str(mirrors_file)), METADATA, "https://p", "https://b"
+    )
+    monkeypatch.setattr(last_good, "get_instance_id", lambda: "i-2")
+    assert last_good.load_record(last_good.fingerprint(str(mirrors_file))) is None
+
+
+def test_unusable_record(mirrors_file, last_good_file):
+    inputs = last_good.fingerprint(str(mirrors_file))
+    assert last_good.load_record(inputs) is None
+    last_good_file.parent.mkdir(parents=True)
+    last_good_file.write_text("{not json")
+    assert last_good.load_record(inputs) is None
+    last_good_file.write_text(json.dumps({"inputs": inputs}))
+    assert last_good.load_record(inputs) is None
+
+
+def test_save_failure_is_not_fatal(monkeypatch, tmp_path, mirrors_file):
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    monkeypatch.setattr(last_good, "LAST_GOOD_PATH", str(blocker / "last-good.json"))
+    last_good.save(
+        last_good.fingerprint(str(mirrors_file)), METADATA, "https://p", "https://b"
+    )
+
+
+def test_successful_run_is_recorded(
+    monkeypatch, dnf_vars_dir, marker, mirrors_file, last_good_file
+):
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.get_cloud_metadata",
+        lambda: {"provider": "aws", "region": "us-east-2", "instance_id": ""},
+    )
+    assert main(["--force", "--mirror-file", str(mirrors_file)]) == 0
+    record = json.loads(last_good_file.read_text())
+    assert record["baseurl1"] == (dnf_vars_dir / "baseurl1").read_text().strip()
+    assert record["metadata"]["region"] == "us-east-2"
+
+
+def test_class_mirrors_are_recorded_and_applied(
+    readiness_dir, dnf_vars_dir, mirrors_file, last_good_file
+):
+    inputs = last_good.fingerprint(str(mirrors_file))
+    last_good.save(
+        inputs,
+        METADATA,
+        "https://p",
+        "https://b",
+        {"bulk": ("https://bulk-p", "https://bulk-b")},
+    )
+    assert last_good.load_record(inputs)["classes"] == {
+        "bulk": ("https://bulk-p", "https://bulk-b")
+    }
+
+    assert _apply_last_good(str(mirrors_file))
+    assert (dnf_vars_dir / "baseurl1").read_text().strip() == "https://p"
+    assert (dnf_vars_dir / "bulk_baseurl1").read_text().strip() == "https://bulk-p"
+    assert (dnf_vars_dir / "bulk_baseurl2").read_text().strip() == "https://bulk-b"
+
+
+def _wait_for(path, value, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if path.exists() and path.read_text().strip() == value:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_revalidate_applies_last_good_then_refines(
+    monkeypatch, tmp_path, readiness_dir, dnf_vars_dir, marker, mirrors_file
+):
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.BACKGROUND_LOG", str(tmp_path / "background.log")
+    )
+    last_good.save(
+        last_good.fingerprint(str(mirrors_file)),
+        METADATA,
+        "https://stale.example",
+        "https://stale-backup.example",
+    )
+
+    def slow_metadata():
+        time.sleep(0.5)
+        return {"provider": "aws", "region": "us-east-2", "instance_id": ""}
+
+    monkeypatch.setattr("rlc.cloud_repos.main.get_cloud_metadata", slow_metadata)
+
+    start = time.monotonic()
+    assert main(["--force", "--revalidate", "--mirror-file", str(mirrors_file)]) == 0
+    assert time.monotonic() - start < 0.3
+    assert (dnf_vars_dir / "baseurl1").read_text().strip() == "https://stale.example"
+    # dnf does not wait for the revalidation
+    assert readiness.pending_pid() is None
+    assert readiness.wait_until_ready(timeout=0) == "ok"
+
+    assert _wait_for(
+        dnf_vars_dir / "baseurl2", "https://depot.us-east-2.prod.ciqws.com"
+    )
+    assert marker.exists()
+
+
+def test_revalidate_without_record_runs_normally(
+    monkeypatch, dnf_vars_dir, marker, mirrors_file
+):
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.get_cloud_metadata",
+        lambda: {"provider": "aws", "region": "us-east-2", "instance_id": ""},
+    )
+    assert main(["--force", "--revalidate", "--mirror-file", str(mirrors_file)]) == 0
+    assert (dnf_vars_dir / "baseurl2").read_text().strip() == (
+        "https://depot.us-east-2.prod.ciqws.com"
+    )
+
+
+def test_revalidate_reapplies_last_good_on_configured_instance(
+    monkeypatch, readiness_dir, dnf_vars_dir, marker, mirrors_file
+):
+    def no_metadata():
+        raise AssertionError("a configured instance is not resolved again")
+
+    monkeypatch.setattr("rlc.cloud_repos.main.get_cloud_metadata", no_metadata)
+    last_good.save(
+        last_good.fingerprint(str(mirrors_file)), METADATA, "https://p", "https://b"
+    )
+    marker.write_text("configured\n")
+    (dnf_vars_dir / "baseurl1").write_text("https://edited\n")
+
+    assert main(["--revalidate", "--mirror-file", str(mirrors_file)]) == 0
+    assert (dnf_vars_dir / "baseurl1").read_text().strip() == "https://p"
+
+
+def test_revalidate_resolves_configured_instance_with_changed_inputs(
+    monkeypatch, dnf_vars_dir, marker, mirrors_file
+):
+    monkeypatch.setattr(last_good, "get_instance_id", lambda: "i-image")
+    last_good.save(
+        last_good.fingerprint(str(mirrors_file)), METADATA, "https://p", "https://b"
+    )
+    marker.write_text("configured\n")
+    monkeypatch.setattr(last_good, "get_instance_id", lambda: "i-clone")
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.get_cloud_metadata",
+        lambda: {"provider": "aws", "region": "us-east-2", "instance_id": "i-clone"},
+    )
+
+    assert main(["--revalidate", "--mirror-file", str(mirrors_file)]) == 0
+    assert (dnf_vars_dir / "baseurl2").read_text().strip() == (
+        "https://depot.us-east-2.prod.ciqws.com"
+    )
+    # Without --revalidate the marker still wins
+    (dnf_vars_dir / "baseurl2").write_text("https://kept\n")
+    monkeypatch.setattr(last_good, "get_instance_id", lambda: "i-other")
+    assert main(["--mirror-file", str(mirrors_file)]) == 0
+    assert (dnf_vars_dir / "baseurl2").read_text().strip() == "https://kept"
@@ -0,0 +1,135 @@
+import time
+
+import pytest
+
+from rlc.cloud_repos import local_cache
+from rlc.cloud_repos.main import parse_args, resolve_mirrors
+
+MIRROR_MAP = {
+    "aws": {
+        "us-east-1": {
+            "primary": "https://depot.public",
+            "backup": "https://backup.public",
+        }
+    },
+    "default": {"primary": "https://default.public", "backup": ""},
+}
+METADATA = {"provider": "aws", "region": "us-east-1", "instance_id": "i-1"}
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch, fake_dns):
+    """Points the hint file and site list into tmp_path, with no well-known cache."""
+    hint = tmp_path / "local-cache"
+    caches = tmp_path / "local-caches.yaml"
+    monkeypatch.setattr(local_cache, "CACHE_HINT_PATH", str(hint))
+    monkeypatch.setattr(local_cache, "LOCAL_CACHES_PATH", str(caches))
+    monkeypatch.setattr(local_cache, "WELL_KNOWN_URL", "http://rlc-depot-cache.missing")
+    monkeypatch.setattr(local_cache, "get_instance_ips", lambda: ["10.20.3.4"])
+    return hint, caches
+
+
+def _port(server):
+    return server.url.rsplit(":", 1)[1]
+
+
+def test_hint_file(site):
+    hint, _ = site
+    assert local_cache.hinted_caches() == []
+    hint.write_text("# from user data\nhttp://cache.a:3142\n\nhttp://cache.b\n")
+    assert local_cache.hinted_caches() == ["http://cache.a:3142", "http://cache.b"]
+
+
+def test_subnet_caches(site):
+    _, caches = site
+    assert local_cache.subnet_caches() == []
+    caches.write_text(
+        "- {subnet: 10.20.0.0/16, url: 'http://cache.site-a'}\n"
+        "- {subnet: 10.30.0.0/16, url: 'http://cache.site-b'}\n"
+        "- {subnet: 'fd00::/8', url: 'http://cache.v6'}\n"
+        "- {subnet: not-a-subnet, url: 'http://cache.bad'}\n"
+        "- {url: 'http://cache.no-subnet'}\n"
+    )
+    assert local_cache.subnet_caches() == ["http://cache.site-a"]
+    assert local_cache.subnet_caches(addresses=["fd00::5"]) == ["http://cache.v6"]
+
+    caches.write_text("- [unclosed")
+    assert local_cache.subnet_caches() == []
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "subnet: 10.20.0.0/16\nurl: http://cache.site-a\n",
+        "just a string\n",
+        "- http://cache.site-a\n- [10.20.0.0/16, http://cache.site-a]\n",
+    ],
+)
+def test_site_list_of_wrong_shape_is_ignored(site, text):
+    _, caches = site
+    caches.write_text(text)
+    assert local_cache.subnet_caches() == []
+
+
+def test_malformed_urls_are_skipped(site, http_server):
+    hint, caches = site
+    hint.write_text("depot-cache.site\nftp://cache.ftp\n" + http_server.url + "\n")
+    caches.write_text(
+        "- {subnet: 10.20.0.0/16, url: 'depot-cache.site:3142'}\n"
+        "- {subnet: 10.20.0.0/16, url: 42}\n"
+    )
+    assert local_cache.hinted_caches() == [http_server.url]
+    assert local_cache.subnet_caches() == []
+    assert local_cache.discover_local_cache(1.0) == http_server.url
+
+
+def test_malformed_candidate_does_not_fail_discovery(site, monkeypatch):
+    monkeypatch.setattr(local_cache, "hinted_caches", lambda: ["depot-cache.site"])
+    assert local_cache.discover_local_cache(0.5) is None
+
+
+def test_discovers_answering_cache(site, http_server, make_http_server):
+    hint, caches = site
+    dead = make_http_server()
+    dead.responses["/"] = (503, b"", 0)
+    hint.write_text(dead.url + "\n")
+    caches.write_text(f"- {{subnet: 10.20.0.0/16, url: '{http_server.url}'}}\n")
+    assert local_cache.discover_local_cache(1.0) == http_server.url
+
+
+def test_well_known_name_must_resolve_privately(site, monkeypatch, http_server):
+    port = _port(http_server)
+    monkeypatch.setattr(local_cache, "WELL_KNOWN_URL", f"http://cache.public:{port}")
+    assert local_cache.discover_local_cache(0.5) is None
+
+    monkeypatch.setattr(local_cache, "WELL_KNOWN_URL", f"http://cache.internal:{port}")
+    assert local_cache.discover_local_cache(1.0) == f"http://cache.internal:{port}"
+
+
+def test_discovery_respects_budget(site, http_server):
+    hint, _ = site
+    http_server.responses["/"] = (200, b"", 3)
+    hint.write_text(http_server.url + "\n")
+    start = time.monotonic()
+    assert local_cache.discover_local_cache(0.3) is None
+    assert time.monotonic() - start < 1.0
+
+
+def test_resolve_mirrors_puts_cache_first(site, http_server):
+    hint, _ = site
+    hint.write_text(http_server.url + "\n")
+    assert resolve_mirrors(METADATA, MIRROR_MAP, parse_args(["--local-cache"])) == (
+        http_server.url,
+        "https://depot.public",
+    )
+    # Discovery is opt-in
+    assert resolve_mirrors(METADATA, MIRROR_MAP, parse_args([])) == (
+        "https://depot.public",
+        "https://backup.public",
+    )
+
+    http_server.responses["/"] = (503, b"", 0)
+    assert resolve_mirrors(METADATA, MIRROR_MAP, parse_args(["--local-cache"])) == (
+        "https://depot.public",
+        "https://backup.public",
+    )
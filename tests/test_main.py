@@ -63,7 +63,7 @@ def test_main_handles_configuration_error(tmp_path, monkeypatch):
     """Test main handles configuration errors gracefully."""
     monkeypatch.setattr(
         "rlc.cloud_repos.main._configure_repos",
-        lambda x: (_ for _ in ()).throw(Exception("Test error")),
+        lambda *args: (_ for _ in ()).throw(Exception("Test error")),
     )
     result = main(["--force"])
     assert result == 1
@@ -80,3 +80,111 @@ def test_configure_repos_invalid_mirror_file():
     """Test _configure_repos with invalid mirror file."""
     with pytest.raises(Exception):
         _configure_repos("nonexistent.yaml")
+
+
+def test_repo_classes_get_their_own_vars(tmp_path, monkeypatch, dnf_vars_dir, marker):
+    """Each repo class is resolved by its policy and written as its own vars."""
+    mirror_file = tmp_path / "mirrors.yaml"
+    mirror_file.write_text("""
+mock:
+  mock-region:
+    primary: https://main
+    backup: https://main-backup
+    classes:
+      bulk:
+        primary: https://bulk
+        backup: https://bulk-backup
+      meta:
+        primary: https://meta
+        backup: https://main-backup
+default:
+  primary: https://global
+  backup: https://global-backup
+  classes:
+    bulk: {policy: throughput}
+    meta: {policy: latency}
+""")
+    probed = []
+
+    def fake_probe(urls, timeout):
+        probed.append(list(urls))
+        return {url: 0.1 for url in urls}
+
+    monkeypatch.setattr("rlc.cloud_repos.main.probe_mirrors", fake_probe)
+    assert main(["--force", "--probe", "--mirror-file", str(mirror_file)]) == 0
+
+    written = {path.name: path.read_text().strip() for path in dnf_vars_dir.iterdir()}
+    assert written == {
+        "baseurl1": "https://main",
+        "baseurl2": "https://main-backup",
+        "bulk_baseurl1": "https://bulk",
+        "bulk_baseurl2": "https://bulk-backup",
+        "meta_baseurl1": "https://meta",
+        "meta_baseurl2": "https://main-backup",
+    }
+    # Latency probes say nothing about bulk throughput
+    assert sorted(probed) == [
+        ["https://main", "https://main-backup"],
+        ["https://meta", "https://main-backup"],
+    ]
+
+
+def test_site_mirrors_are_looked_up_once(tmp_path, monkeypatch, dnf_vars_dir, marker):
+    """Classes share the private endpoint and local cache lookups."""
+    mirror_file = tmp_path / "mirrors.yaml"
+    mirror_file.write_text("""
+mock:
+  mock-region:
+    primary: https://main
+    backup: https://main-backup
+    private: [https://vpce]
+    classes:
+      bulk: {primary: https://bulk}
+      meta: {primary: https://meta}
+default:
+  primary: https://global
+  backup: https://global-backup
+  classes:
+    bulk: {policy: throughput}
+    meta: {policy: latency}
+""")
+    lookups = []
+
+    def select_private_endpoint(candidates, timeout):
+        lookups.append(candidates)
+        return "https://vpce"
+
+    def discover_local_cache(timeout):
+        lookups.append("local-cache")
+        return None
+
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.select_private_endpoint", select_private_endpoint
+    )
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.discover_local_cache", discover_local_cache
+    )
+    args = ["--force", "--local-cache", "--mirror-file", str(mirror_file)]
+    assert main(args) == 0
+
+    assert lookups == [["https://vpce"], "local-cache"]
+    written = {path.name: path.read_text().strip() for path in dnf_vars_dir.iterdir()}
+    assert written["baseurl1"] == "https://vpce"
+    assert written["bulk_baseurl1"] == "https://vpce"
+    assert written["meta_baseurl2"] == "https://meta"
+
+
+def test_sharded_mirror_map(monkeypatch, tmp_path, dnf_vars_dir, marker):
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.get_cloud_metadata",
+        lambda: {"provider": "aws", "region": "us-east-1", "instance_id": "i-1"},
+    )
+    shards = tmp_path / "mirrors.d"
+    shards.mkdir()
+    (shards / "default.yaml").write_text("primary: https://d\nbackup: https://b\n")
+    (shards / "aws.yaml").write_text("us-east-1:\n  primary: https://aws\n")
+    (shards / "azure.yaml").write_text("{ not: yaml: parsed")
+
+    assert main(["--force", "--mirror-file", str(shards)]) == 0
+    assert (dnf_vars_dir / "baseurl1").read_text().strip() == "https://aws"
+    assert (dnf_vars_dir / "baseurl2").read_text().strip() == "https://b"
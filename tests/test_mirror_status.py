@@ -0,0 +1,99 @@
+import json
+import time
+
+import pytest
+
+from rlc.cloud_repos import mirror_status
+from rlc.cloud_repos.main import parse_args, resolve_mirrors
+
+STATUS_PATH = "/" + mirror_status.STATUS_DOCUMENT
+
+
+@pytest.fixture(autouse=True)
+def empty_status_cache(monkeypatch):
+    monkeypatch.setattr(mirror_status, "_status_cache", {})
+
+
+def _status(server, document, delay=0):
+    server.responses[STATUS_PATH] = (200, json.dumps(document).encode(), delay)
+
+
+@pytest.mark.parametrize(
+    "document,load",
+    [
+        ({"load": 0.25, "status": "ok"}, 0.25),
+        ({"load": 3}, 1.0),
+        ({"load": -1}, 0.0),
+        ({"load": 0.1, "status": "draining"}, 1.0),
+        ({"status": "degraded"}, None),
+        ({"load": "high"}, None),
+        ({"load": True}, None),
+        ([0.5], None),
+    ],
+)
+def test_parse_status(document, load):
+    assert mirror_status.parse_status(document) == load
+
+
+def test_fetch_load(make_http_server):
+    server = make_http_server()
+    _status(server, {"load": 0.7})
+    assert mirror_status.fetch_load(server.url) == 0.7
+    assert mirror_status.fetch_load(server.url + "/") == 0.7
+    assert server.requests == [STATUS_PATH, STATUS_PATH]
+
+
+def test_fetch_load_without_document(http_server):
+    http_server.responses[STATUS_PATH] = (404, b"", 0)
+    assert mirror_status.fetch_load(http_server.url) is None
+    http_server.responses[STATUS_PATH] = (200, b"<html>", 0)
+    assert mirror_status.fetch_load(http_server.url) is None
+
+
+def test_fetch_loads_is_concurrent_and_bounded(make_http_server):
+    servers = [make_http_server() for _ in range(3)]
+    _status(servers[0], {"load": 0.2}, delay=0.3)
+    _status(servers[1], {"load": 0.4}, delay=0.3)
+    _status(servers[2], {"load": 0.6}, delay=5)
+
+    start = time.monotonic()
+    loads = mirror_status.fetch_loads([s.url for s in servers], timeout=0.8)
+    assert time.monotonic() - start < 1.5
+    assert loads == {servers[0].url: 0.2, servers[1].url: 0.4, servers[2].url: None}
+
+
+def test_fetch_loads_caches(monkeypatch, http_server):
+    _status(http_server, {"load": 0.3})
+    assert mirror_status.fetch_loads([http_server.url]) == {http_server.url: 0.3}
+    _status(http_server, {"load": 0.9})
+    assert mirror_status.fetch_loads([http_server.url]) == {http_server.url: 0.3}
+    assert len(http_server.requests) == 1
+
+    monkeypatch.setattr(mirror_status, "STATUS_CACHE_TTL", 0)
+    assert mirror_status.fetch_loads([http_server.url]) == {http_server.url: 0.9}
+
+
+def test_resolve_mirrors_sheds_overloaded_mirror(make_http_server):
+    busy, idle = make_http_server(), make_http_server()
+    _status(busy, {"load": 0.97})
+    _status(idle, {"load": 0.1})
+    mirror_map = {
+        "aws": {"us-east-1": {"primary": busy.url, "backup": idle.url}},
+        "default": {"primary": busy.url, "backup": idle.url},
+    }
+    metadata = {"provider": "aws", "region": "us-east-1", "instance_id": "i-1"}
+
+    assert resolve_mirrors(metadata, mirror_map, parse_args([])) == (
+        busy.url,
+        idle.url,
+    )
+    assert busy.requests == []
+    assert resolve_mirrors(metadata, mirror_map, parse_args(["--mirror-status"])) == (
+        idle.url,
+        busy.url,
+    )
+    # Latency probing must not hand the busy mirror its traffic back
+    idle.responses["/"] = (200, b"", 0.2)
+    assert resolve_mirrors(
+        metadata, mirror_map, parse_args(["--mirror-status", "--probe"])
+    ) == (idle.url, busy.url)
@@ -0,0 +1,73 @@
+import time
+
+from rlc.cloud_repos import private_endpoint
+from rlc.cloud_repos.main import parse_args, resolve_mirrors
+
+
+def _port(server):
+    return server.url.rsplit(":", 1)[1]
+
+
+def test_resolves_privately(fake_dns):
+    assert private_endpoint.resolves_privately("https://vpce.internal/")
+    assert not private_endpoint.resolves_privately("https://depot.public/")
+    assert not private_endpoint.resolves_privately("https://missing.example/")
+
+
+def test_selects_answering_private_endpoint(fake_dns, http_server):
+    endpoint = f"http://vpce.internal:{_port(http_server)}"
+    selected = private_endpoint.select_private_endpoint(
+        [
+            "https://missing.example",
+            f"http://depot.public:{_port(http_server)}",
+            endpoint,
+        ]
+    )
+    assert selected == endpoint
+
+
+def test_skips_private_endpoint_that_does_not_answer(fake_dns, http_server):
+    http_server.responses["/"] = (503, b"", 0)
+    endpoint = f"http://vpce.internal:{_port(http_server)}/"
+    assert private_endpoint.select_private_endpoint([endpoint]) is None
+
+
+def test_selection_respects_budget(fake_dns):
+    start = time.monotonic()
+    assert (
+        private_endpoint.select_private_endpoint(["http://vpce.slow"], timeout=0.3)
+        is None
+    )
+    assert time.monotonic() - start < 1
+
+
+def test_zero_budget_disables_selection(fake_dns, http_server):
+    endpoint = f"http://vpce.internal:{_port(http_server)}"
+    assert private_endpoint.select_private_endpoint([endpoint], timeout=0) is None
+    assert http_server.requests == []
+
+
+def test_resolve_mirrors_prefers_private_endpoint(fake_dns, http_server):
+    endpoint = f"http://vpce.internal:{_port(http_server)}"
+    mirror_map = {
+        "aws": {
+            "us-east-1": {
+                "primary": "https://depot.public",
+                "backup": "https://backup.public",
+                "private": [endpoint],
+            }
+        },
+        "default": {"primary": "https://default.public", "backup": ""},
+    }
+    metadata = {"provider": "aws", "region": "us-east-1", "instance_id": "i-1"}
+
+    assert resolve_mirrors(metadata, mirror_map, parse_args([])) == (
+        endpoint,
+        "https://depot.public",
+    )
+
+    http_server.responses["/"] = (503, b"", 0)
+    assert resolve_mirrors(metadata, mirror_map, parse_args([])) == (
+        "https://depot.public",
+        "https://backup.public",
+    )
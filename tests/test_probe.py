@@ -0,0 +1,115 @@
+import time
+
+import yaml
+
+from rlc.cloud_repos import probe
+from rlc.cloud_repos.main import main
+from rlc.cloud_repos.probe import probe_mirror, probe_mirrors, rank_by_latency
+
+
+def test_probe_mirror_success(http_server):
+    """A healthy mirror reports its latency."""
+    latency = probe_mirror(http_server.url)
+    assert latency is not None
+    assert latency >= 0
+
+
+def test_probe_mirror_client_error_is_reachable(http_server):
+    """A 4xx still proves the mirror is answering."""
+    http_server.responses["/"] = (404, b"", 0)
+    assert probe_mirror(http_server.url + "/") is not None
+
+
+def test_probe_mirror_server_error(http_server):
+    """A 5xx counts as a failed probe."""
+    http_server.responses["/"] = (503, b"", 0)
+    assert probe_mirror(http_server.url + "/") is None
+
+
+def test_probe_mirror_unreachable():
+    """Connection failures count as a failed probe."""
+    assert probe_mirror("http://127.0.0.1:9", timeout=0.5) is None
+
+
+def test_probe_mirror_malformed_url():
+    """A URL without a scheme counts as a failed probe instead of raising."""
+    assert probe_mirror("depot-cache.site") is None
+
+
+def test_probe_mirror_timeout(http_server):
+    """A mirror slower than the timeout counts as a failed probe."""
+    http_server.responses["/slow"] = (200, b"", 1.0)
+    assert probe_mirror(http_server.url + "/slow", timeout=0.2) is None
+
+
+def test_probe_mirrors_runs_concurrently(http_server):
+    """Probing several slow mirrors takes about as long as the slowest one."""
+    for i in range(4):
+        http_server.responses[f"/m{i}"] = (200, b"", 0.3)
+    urls = [f"{http_server.url}/m{i}" for i in range(4)]
+
+    start = time.monotonic()
+    results = probe_mirrors(urls, timeout=2.0)
+    assert time.monotonic() - start < 1.0
+    assert all(results[url] is not None for url in urls)
+
+
+def test_probe_mirrors_bounded_by_timeout(http_server):
+    """Stalled mirrors don't hold the caller past the time budget."""
+    http_server.responses["/stall"] = (200, b"", 2.0)
+    url = http_server.url + "/stall"
+
+    start = time.monotonic()
+    assert probe_mirrors([url], timeout=0.3) == {url: None}
+    assert time.monotonic() - start < 1.0
+
+
+def test_rank_by_latency():
+    """Reachable mirrors are ordered fastest first, unreachable ones last."""
+    urls = ["a", "b", "c", "d"]
+    results = {"a": None, "b": 0.3, "c": 0.1, "d": None}
+    assert rank_by_latency(urls, results) == ["c", "b", "a", "d"]
+
+
+def test_main_probe_prefers_healthy_mirror(
+    monkeypatch, tmp_path, dnf_vars_dir, marker, http_server
+):
+    """With --probe an unhealthy primary is swapped with the backup."""
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.get_cloud_metadata",
+        lambda: {"provider": "mock", "region": "mock-region"},
+    )
+    http_server.responses["/broken"] = (503, b"", 0)
+    mirrors = tmp_path / "mirrors.yaml"
+    mirrors.write_text(
+        yaml.safe_dump(
+            {
+                "default": {
+                    "primary": http_server.url + "/broken",
+                    "backup": http_server.url + "/healthy",
+                }
+            }
+        )
+    )
+
+    assert main(["--mirror-file", str(mirrors), "--probe"]) == 0
+    assert (dnf_vars_dir / "baseurl1").read_text().strip() == (
+        http_server.url + "/healthy"
+    )
+    assert (dnf_vars_dir / "baseurl2").read_text().strip() == (
+        http_server.url + "/broken"
+    )
+
+
+def test_run_bounded_abandons_slow_calls():
+    """Slow calls count as unfinished and failing ones as None."""
+
+    def fail():
+        raise ValueError("boom")
+
+    start = time.monotonic()
+    results = probe.run_bounded(
+        {"fast": lambda: 1, "slow": lambda: time.sleep(2) or 2, "fail": fail}, 0.3
+    )
+    assert time.monotonic() - start < 1.0
+    assert results == {"fast": 1, "slow": None, "fail": None}
@@ -0,0 +1,218 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from rlc.cloud_repos.probe_cache import ProbeCache, cache_key
+
+URLS = ["https://a.example.com", "https://b.example.com"]
+RESULTS = {"https://a.example.com": 0.2, "https://b.example.com": 0.1}
+
+
+class CountingProbe:
+    """Probe stand-in that counts how often it is called."""
+
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self, urls):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return dict(RESULTS)
+
+
+class KeyValueHandler(BaseHTTPRequestHandler):
+    """Minimal shared cache endpoint: GET/PUT/DELETE with If-None-Match."""
+
+    def do_GET(self):
+        store = self.server.stand_in.store
+        if self.path not in store:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(store[self.path])))
+        self.end_headers()
+        self.wfile.write(store[self.path])
+
+    def do_PUT(self):
+        store = self.server.stand_in.store
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.stand_in.lock:
+            if self.headers.get("If-None-Match") == "*" and self.path in store:
+                self.send_response(412)
+            else:
+                store[self.path] = body
+                self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_DELETE(self):
+        self.server.stand_in.store.pop(self.path, None)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(params=["directory", "http"])
+def cache_location(request, tmp_path, make_http_server):
+    """Returns a cache location for both backends."""
+    if request.param == "directory":
+        return str(tmp_path / "cache")
+    server = make_http_server(KeyValueHandler)
+    server.store = {}
+    server.lock = threading.Lock()
+    return server.url
+
+
+def test_cache_key_is_stable_and_safe():
+    """Keys only depend on location and candidates, and are path safe."""
+    key = cache_key("aws", "us-east-1", URLS)
+    assert key == cache_key("aws", "us-east-1", list(URLS))
+    assert key != cache_key("aws", "us-east-2", URLS)
+    assert key != cache_key("aws", "us-east-1", URLS[:1])
+    assert "/" not in cache_key("a/b", "../c", URLS)
+
+
+def test_miss_probes_and_publishes(cache_location):
+    """The first instance probes and later ones reuse its results."""
+    probe = CountingProbe()
+    first = ProbeCache(cache_location, jitter=0)
+    second = ProbeCache(cache_location, jitter=0)
+
+    assert first.get_or_probe("k", URLS, probe) == RESULTS
+    assert second.get_or_probe("k", URLS, probe) == RESULTS
+    assert probe.calls == 1
+
+
+def test_expired_entry_is_refreshed(cache_location):
+    """Entries older than the TTL are probed again."""
+    probe = CountingProbe()
+    cache = ProbeCache(cache_location, ttl=60, jitter=0)
+    cache.backend.write("k", {"created": time.time() - 120, "results": {}})
+
+    assert cache.get_or_probe("k", URLS, probe) == RESULTS
+    assert probe.calls == 1
+    assert cache.backend.read("k")["results"] == RESULTS
+
+
+def test_stale_entry_served_while_lease_held(cache_location):
+    """While another instance refreshes, the previous rankings are reused."""
+    probe = CountingProbe()
+    cache = ProbeCache(cache_location, ttl=60, jitter=0)
+    cache.backend.write("k", {"created": time.time() - 120, "results": RESULTS})
+    assert cache.backend.acquire("k", 60)
+
+    assert cache.get_or_probe("k", URLS, probe) == RESULTS
+    assert probe.calls == 0
+
+
+def test_waits_for_leader_then_probes_locally(cache_location):
+    """Without any entry, followers wait briefly and then probe themselves."""
+    probe = CountingProbe()
+    cache = ProbeCache(cache_location, leader_wait=0.3)
+    assert cache.backend.acquire("k", 60)
+
+    start = time.monotonic()
+    assert cache.get_or_probe("k", URLS, probe) == RESULTS
+    assert time.monotonic() - start >= 0.3
+    assert probe.calls == 1
+
+
+def test_abandoned_lease_is_broken(tmp_path):
+    """A lease left behind by a dead instance expires."""
+    cache = ProbeCache(str(tmp_path), lease_ttl=10)
+    assert cache.backend.acquire("k", 10)
+    lease = tmp_path / "k.lease"
+    os.utime(str(lease), (time.time() - 60, time.time() - 60))
+
+    assert cache.backend.acquire("k", 10)
+
+
+def test_lease_retaken_during_break_is_kept(tmp_path, monkeypatch):
+    """Only one of two instances breaking the same lease becomes leader."""
+    cache = ProbeCache(str(tmp_path / "cache"), lease_ttl=10)
+    assert cache.backend.acquire("k", 10)
+    lease = tmp_path / "cache" / "k.lease"
+    os.utime(str(lease), (time.time() - 60, time.time() - 60))
+    rename = os.rename
+
+    def retaken_then_rename(src, dst):
+        # Another instance broke the lease and took a new one meanwhile
+        lease.write_text("other:1")
+        rename(src, dst)
+
+    monkeypatch.setattr("rlc.cloud_repos.probe_cache.os.rename", retaken_then_rename)
+    assert not cache.backend.acquire("k", 10)
+    assert lease.read_text() == "other:1"
+    assert [path.name for path in lease.parent.iterdir()] == ["k.lease"]
+
+
+@pytest.mark.parametrize("lease", [b"not json", b"[1, 2]", b"{}"])
+def test_unreadable_http_lease_probes_locally(make_http_server, lease):
+    """A lease document the cache can't make sense of doesn't break boots."""
+    server = make_http_server(KeyValueHandler)
+    server.store = {"/k.lease": lease}
+    server.lock = threading.Lock()
+    probe = CountingProbe()
+    cache = ProbeCache(server.url, leader_wait=0)
+    assert cache.get_or_probe("k", URLS, probe) == RESULTS
+    assert probe.calls == 1
+
+
+def test_jitter_spreads_refreshes(tmp_path):
+    """With jitter some readers refresh an entry before it fully expires."""
+    cache = ProbeCache(str(tmp_path), ttl=100, jitter=0.5)
+    cache.backend.write("k", {"created": time.time() - 75, "results": RESULTS})
+
+    refreshed = 0
+    for _ in range(200):
+        probe = CountingProbe()
+        cache.get_or_probe("k", URLS, probe)
+        refreshed += probe.calls
+        cache.backend.write("k", {"created": time.time() - 75, "results": RESULTS})
+    assert 0 < refreshed < 200
+
+
+def test_single_writer_under_thundering_herd(cache_location):
+    """Many instances booting at once result in a single probe."""
+    probe = CountingProbe(delay=0.2)
+    results = []
+
+    def boot():
+        cache = ProbeCache(cache_location, jitter=0, leader_wait=5)
+        results.append(cache.get_or_probe("k", URLS, probe))
+
+    threads = [threading.Thread(target=boot) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert probe.calls == 1
+    assert results == [RESULTS] * 20
+
+
+def test_unavailable_cache_probes_locally():
+    """An unreachable cache endpoint doesn't block probing."""
+    probe = CountingProbe()
+    cache = ProbeCache("http://127.0.0.1:9", leader_wait=0)
+    assert cache.get_or_probe("k", URLS, probe) == RESULTS
+    assert probe.calls == 1
+
+
+def test_directory_entries_are_json(tmp_path):
+    """Directory entries are plain JSON documents."""
+    cache = ProbeCache(str(tmp_path))
+    cache.get_or_probe("k", URLS, CountingProbe())
+    entry = json.loads((tmp_path / "k.json").read_text())
+    assert entry["results"] == RESULTS
+    assert not (tmp_path / "k.lease").exists()
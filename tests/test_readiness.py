@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from rlc.cloud_repos import readiness
+from rlc.cloud_repos.main import main
+
+
+def test_wait_returns_immediately_when_nothing_pending(readiness_dir):
+    start = time.monotonic()
+    assert readiness.wait_until_ready(timeout=5) is None
+    assert time.monotonic() - start < 0.5
+
+
+def test_wait_returns_published_outcome(readiness_dir):
+    readiness.mark_ready(True)
+    assert readiness.wait_until_ready(timeout=5) == "ok"
+    readiness.mark_ready(False)
+    assert readiness.wait_until_ready(timeout=5) == "failed"
+
+
+def test_wait_blocks_until_pending_run_finishes(readiness_dir):
+    readiness.mark_pending(os.getpid())
+    timer = threading.Timer(0.3, readiness.mark_ready, args=(True,))
+    timer.start()
+
+    start = time.monotonic()
+    assert readiness.wait_until_ready(timeout=5) == "ok"
+    assert time.monotonic() - start >= 0.25
+    assert not (readiness_dir / readiness.PENDING_FILE).exists()
+
+
+def test_wait_ignores_dead_pending_run(readiness_dir):
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    readiness.mark_pending(process.pid)
+
+    assert readiness.pending_pid() is None
+    assert readiness.wait_until_ready(timeout=5) is None
+
+
+def test_wait_times_out(readiness_dir):
+    readiness.mark_pending(os.getpid())
+    start = time.monotonic()
+    assert readiness.wait_until_ready(timeout=0.2) is None
+    assert time.monotonic() - start < 1
+
+
+def test_wait_cli_exit_codes(readiness_dir):
+    assert readiness.main(["--timeout", "0"]) == 0
+    readiness.mark_pending(os.getpid())
+    assert readiness.main(["--timeout", "0.1"]) == 1
+    readiness.mark_ready(False)
+    assert readiness.main(["--timeout", "0"]) == 1
+    readiness.mark_ready(True)
+    assert readiness.main(["--timeout", "0"]) == 0
+
+
+def test_main_background_returns_immediately(
+    monkeypatch, tmp_path, readiness_dir, dnf_vars_dir, marker, mirrors_file
+):
+    """The background run hands off to dnf through the readiness files."""
+
+    def slow_metadata():
+        time.sleep(0.5)
+        return {"provider": "aws", "region": "us-east-2"}
+
+    monkeypatch.setattr("rlc.cloud_repos.main.get_cloud_metadata", slow_metadata)
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.BACKGROUND_LOG", str(tmp_path / "background.log")
+    )
+
+    start = time.monotonic()
+    assert main(["--background"]) == 0
+    assert time.monotonic() - start < 0.3
+    assert readiness.pending_pid() is not None
+
+    assert readiness.wait_until_ready(timeout=10) == "ok"
+    assert (dnf_vars_dir / "baseurl2").read_text().strip() == (
+        "https://depot.us-east-2.prod.ciqws.com"
+    )
+    assert marker.exists()
+    assert (tmp_path / "background.log").exists()
+
+
+def test_main_background_is_pending_before_clearing_outcome(
+    monkeypatch, tmp_path, readiness_dir, dnf_vars_dir, marker, mirrors_file
+):
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.get_cloud_metadata",
+        lambda: {"provider": "aws", "region": "us-east-2"},
+    )
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.BACKGROUND_LOG", str(tmp_path / "background.log")
+    )
+    readiness.mark_ready(True)
+    seen = []
+
+    def clear_ready():
+        seen.append(readiness.pending_pid())
+        readiness.clear_ready()
+
+    monkeypatch.setattr("rlc.cloud_repos.main.clear_ready", clear_ready)
+    assert main(["--background", "--mirror-file", str(mirrors_file)]) == 0
+    # A waiter arriving while the outcome is cleared still sees a live run
+    assert seen == [os.getpid()]
+    assert readiness.wait_until_ready(timeout=10) == "ok"
+
+
+def test_main_background_reports_failure(
+    monkeypatch, tmp_path, readiness_dir, dnf_vars_dir, marker
+):
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.BACKGROUND_LOG", str(tmp_path / "background.log")
+    )
+    assert main(["--background", "--mirror-file", "nonexistent.yaml"]) == 0
+    assert readiness.wait_until_ready(timeout=10) == "failed"
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+
+import pytest
+
+from rlc.cloud_repos import reevaluate
+from rlc.cloud_repos.main import main
+
+PRIMARY = "https://depot.prod.ciqws.com"
+BACKUP = "https://depot.us-east-2.prod.ciqws.com"
+
+
+@pytest.fixture(autouse=True)
+def trigger_stamp(tmp_path, monkeypatch):
+    path = tmp_path / "run" / "reevaluate-trigger"
+    path.parent.mkdir()
+    monkeypatch.setattr(reevaluate, "TRIGGER_PATH", str(path))
+    return path
+
+
+@pytest.fixture
+def configured(monkeypatch, dnf_vars_dir, marker, mirrors_file):
+    """Fixture running a first configuration, then forbidding cloud-init."""
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.get_cloud_metadata",
+        lambda: {"provider": "aws", "region": "us-east-2", "instance_id": "i-1"},
+    )
+    assert main(["--force"]) == 0
+
+    def fail():
+        raise AssertionError("cloud-init was queried")
+
+    monkeypatch.setattr("rlc.cloud_repos.main.get_cloud_metadata", fail)
+    return dnf_vars_dir
+
+
+def _args(*args):
+    return reevaluate.parse_args(list(args))
+
+
+def _primary_answers(monkeypatch, answers):
+    monkeypatch.setattr(
+        reevaluate, "probe_mirror", lambda url, timeout: 0.01 if answers else None
+    )
+
+
+def test_without_trigger_nothing_waits():
+    assert reevaluate.wait_for_quiet(60) == 0
+
+
+def test_waits_for_quiet_after_last_trigger(trigger_stamp):
+    trigger_stamp.touch()
+
+    def burst():
+        for _ in range(3):
+            time.sleep(0.1)
+            trigger_stamp.touch()
+
+    thread = threading.Thread(target=burst)
+    thread.start()
+    start = time.monotonic()
+    reevaluate.wait_for_quiet(0.3)
+    thread.join()
+    # Quiet for 0.3s after the last of the triggers, ~0.3s in
+    assert time.monotonic() - start >= 0.55
+    assert time.time() - os.stat(trigger_stamp).st_mtime >= 0.3
+
+
+def test_wait_for_quiet_is_bounded(trigger_stamp):
+    trigger_stamp.touch()
+    assert reevaluate.wait_for_quiet(60, max_wait=0.2) == pytest.approx(0.2, abs=0.1)
+
+
+def test_healthy_primary_is_kept(monkeypatch, configured, mirrors_file):
+    _primary_answers(monkeypatch, True)
+    baseurl1 = configured / "baseurl1"
+    before = baseurl1.stat().st_mtime_ns
+
+    assert reevaluate.reevaluate(str(mirrors_file), _args()) == "unchanged"
+    assert baseurl1.stat().st_mtime_ns == before
+
+
+def _latencies(monkeypatch, latencies):
+    def probe_mirrors(urls, timeout):
+        return {url: latencies.get(url, 0.5) for url in urls}
+
+    monkeypatch.setattr(reevaluate, "probe_mirrors", probe_mirrors)
+    monkeypatch.setattr("rlc.cloud_repos.main.probe_mirrors", probe_mirrors)
+
+
+def test_failed_primary_is_replaced(monkeypatch, configured):
+    _latencies(monkeypatch, {PRIMARY: None, BACKUP: 0.01})
+
+    assert reevaluate.main(["--probe"]) == 0
+    assert (configured / "baseurl1").read_text().strip() == BACKUP
+    assert (configured / "baseurl1.bak").read_text().strip() == PRIMARY
+
+
+def test_slow_primary_is_ranked_again_with_probe(monkeypatch, configured):
+    _primary_answers(monkeypatch, True)
+    _latencies(monkeypatch, {PRIMARY: 0.2, BACKUP: 0.01})
+
+    assert reevaluate.main(["--probe"]) == 0
+    assert (configured / "baseurl1").read_text().strip() == BACKUP
+
+
+def test_primary_within_margin_is_kept_with_probe(
+    monkeypatch, configured, mirrors_file
+):
+    _latencies(monkeypatch, {PRIMARY: 0.1, BACKUP: 0.08})
+    baseurl1 = configured / "baseurl1"
+    before = baseurl1.stat().st_mtime_ns
+
+    options = _args("--probe")
+    assert reevaluate.reevaluate(str(mirrors_file), options) == "unchanged"
+    assert baseurl1.stat().st_mtime_ns == before
+    options = _args("--probe", "--rerank-margin", "0.1")
+    assert reevaluate.reevaluate(str(mirrors_file), options) == "changed"
+    assert baseurl1.read_text().strip() == BACKUP
+
+
+def test_failed_primary_without_alternative(monkeypatch, configured, mirrors_file):
+    _primary_answers(monkeypatch, False)
+    assert reevaluate.reevaluate(str(mirrors_file), _args()) == "unchanged"
+    assert not (configured / "baseurl1.bak").exists()
+
+
+def test_changed_inputs_resolve_from_scratch(monkeypatch, configured, mirrors_file):
+    _primary_answers(monkeypatch, True)
+    with open(mirrors_file, "a") as f:
+        f.write("# edited\n")
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.get_cloud_metadata",
+        lambda: {"provider": "aws", "region": "us-east-2", "instance_id": "i-2"},
+    )
+    assert reevaluate.reevaluate(str(mirrors_file), _args()) == "resolved"
+    assert (configured / "baseurl1").read_text().strip() == PRIMARY
+
+
+def test_failure_exit_code(monkeypatch, tmp_path, dnf_vars_dir, marker):
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.get_cloud_metadata",
+        lambda: {"provider": "aws", "region": "us-east-2", "instance_id": "i-1"},
+    )
+    assert reevaluate.main(["--mirror-file", str(tmp_path / "missing.yaml")]) == 1
@@ -1,6 +1,7 @@
 import pytest
 
-from rlc.cloud_repos.repo_config import load_mirror_map, select_mirror
+from rlc.cloud_repos import repo_config
+from rlc.cloud_repos.repo_config import load_mirror_map, rank_pool, select_mirror
 
 
 def test_load_mirror_map_success(mirrors_file):
@@ -25,6 +26,53 @@ def test_load_mirror_map_invalid_yaml(tmp_path):
         load_mirror_map(str(invalid_yaml))
 
 
+def _write_shards(directory, sections):
+    directory.mkdir()
+    for name, text in sections.items():
+        (directory / f"{name}.yaml").write_text(text)
+    return directory
+
+
+SHARDS = {
+    "default": "primary: https://default\nbackup: https://default-backup\n",
+    "aws": "us-east-1:\n  primary: https://aws-use1\n",
+    "azure": "{ invalid: yaml: content",
+}
+
+
+def test_load_sharded_map_reads_only_provider_shard(tmp_path):
+    directory = _write_shards(tmp_path / "mirrors.d", SHARDS)
+    mirror_map = load_mirror_map(str(directory), "AWS")
+    assert set(mirror_map) == {"default", "aws"}
+    metadata = {"provider": "aws", "region": "us-east-1", "instance_id": ""}
+    assert select_mirror(metadata, mirror_map) == (
+        "https://aws-use1",
+        "https://default-backup",
+    )
+    # Unmapped providers get the default entry only
+    assert set(load_mirror_map(str(directory), "gcp")) == {"default"}
+    assert set(load_mirror_map(str(directory), "../aws")) == {"default"}
+    # Without a provider every shard is read
+    with pytest.raises(ValueError):
+        load_mirror_map(str(directory))
+
+
+def test_load_sharded_map_needs_default(tmp_path):
+    directory = _write_shards(tmp_path / "mirrors.d", {"aws": SHARDS["aws"]})
+    with pytest.raises(FileNotFoundError):
+        load_mirror_map(str(directory), "aws")
+
+
+def test_map_signature_tracks_shards(tmp_path, mirrors_file):
+    assert repo_config.map_signature(str(tmp_path / "missing")) is None
+    assert repo_config.map_signature(str(mirrors_file)) is not None
+
+    directory = _write_shards(tmp_path / "mirrors.d", {"default": SHARDS["default"]})
+    before = repo_config.map_signature(str(directory))
+    (directory / "default.yaml").write_text(SHARDS["default"] + "# edited\n")
+    assert repo_config.map_signature(str(directory)) != before
+
+
 @pytest.mark.parametrize(
     "provider,region",
     [
@@ -76,3 +124,219 @@ def test_select_mirror_no_fallback():
 
     with pytest.raises(ValueError):
         select_mirror({"provider": "unknown", "region": "unknown"}, mirror_map)
+
+
+POOL_MAP = {
+    "default": {"primary": "https://global", "backup": "https://global-backup"},
+    "aws": {
+        "us-east-1": {
+            "pool": [
+                "https://a.example.com",
+                {"url": "https://b.example.com"},
+                {"url": "https://c.example.com", "weight": 2},
+            ],
+            "backup": "https://backup.example.com",
+        },
+        "us-east-2": {"pool": ["https://a.example.com", "https://b.example.com"]},
+    },
+}
+INSTANCE_IDS = [f"i-{n:017x}" for n in range(20000)]
+
+
+def _primaries(pool, ids=INSTANCE_IDS):
+    return {iid: rank_pool(pool, iid)[0] for iid in ids}
+
+
+def test_select_mirror_pool_is_stable():
+    """The same instance always gets the same pool member."""
+    metadata = {"provider": "aws", "region": "us-east-1", "instance_id": "i-1"}
+    first = select_mirror(metadata, POOL_MAP)
+    assert first == select_mirror(dict(metadata), POOL_MAP)
+    assert first[1] == "https://backup.example.com"
+
+
+def test_select_mirror_pool_backup_defaults_to_next_member():
+    """Without an explicit backup the next ranked pool member is used."""
+    primary, backup = select_mirror(
+        {"provider": "aws", "region": "us-east-2", "instance_id": "i-1"}, POOL_MAP
+    )
+    assert {primary, backup} == {"https://a.example.com", "https://b.example.com"}
+
+
+def test_select_mirror_pool_without_instance_id():
+    """Pools still resolve when no instance id is known."""
+    primary, _ = select_mirror({"provider": "aws", "region": "us-east-1"}, POOL_MAP)
+    assert primary.endswith(".example.com")
+
+
+def test_pool_entries_without_url_are_skipped(capsys):
+    """A malformed pool entry is ignored with a warning, not a crash."""
+    pool = [{"weight": 2}, "https://a.example.com", {"url": "https://b", "weight": "x"}]
+    assert rank_pool(pool, "i-1") == ["https://a.example.com"]
+    assert "Ignoring invalid pool entry {'weight': 2}" in capsys.readouterr().out
+
+
+def test_pool_distribution_follows_weights():
+    """Synthetic instances spread over the pool in proportion to weights."""
+    counts = {}
+    for url in _primaries(POOL_MAP["aws"]["us-east-1"]["pool"]).values():
+        counts[url] = counts.get(url, 0) + 1
+
+    total = len(INSTANCE_IDS)
+    assert abs(counts["https://a.example.com"] / total - 0.25) < 0.02
+    assert abs(counts["https://b.example.com"] / total - 0.25) < 0.02
+    assert abs(counts["https://c.example.com"] / total - 0.50) < 0.02
+
+
+def test_pool_removal_only_moves_its_instances():
+    """Removing a member only reassigns the instances it was serving."""
+    pool = [f"https://m{n}.example.com" for n in range(5)]
+    before = _primaries(pool)
+    after = _primaries(pool[:-1])
+
+    moved = [iid for iid in INSTANCE_IDS if before[iid] != after[iid]]
+    assert all(before[iid] == pool[-1] for iid in moved)
+    assert abs(len(moved) / len(INSTANCE_IDS) - 1 / 5) < 0.02
+
+
+def test_pool_addition_moves_about_one_nth():
+    """Adding a member takes about 1/N of instances, all onto the new member."""
+    pool = [f"https://m{n}.example.com" for n in range(4)]
+    new_pool = pool + ["https://m4.example.com"]
+    before = _primaries(pool)
+    after = _primaries(new_pool)
+
+    moved = [iid for iid in INSTANCE_IDS if before[iid] != after[iid]]
+    assert all(after[iid] == new_pool[-1] for iid in moved)
+    assert abs(len(moved) / len(INSTANCE_IDS) - 1 / 5) < 0.02
+
+
+def test_pool_zero_weight_members_are_skipped():
+    """Members with weight 0 are drained."""
+    pool = ["https://a.example.com", {"url": "https://b.example.com", "weight": 0}]
+    assert set(_primaries(pool, INSTANCE_IDS[:500]).values()) == {
+        "https://a.example.com"
+    }
+
+
+def test_pool_load_sheds_its_share_of_instances():
+    """A half-loaded member keeps only the share its spare capacity allows,
+    and only its own instances move."""
+    pool = ["https://a.example.com", "https://b.example.com"]
+    before = _primaries(pool)
+    after = {
+        iid: rank_pool(pool, iid, {"https://a.example.com": 0.5})[0]
+        for iid in INSTANCE_IDS
+    }
+
+    share = sum(url == "https://a.example.com" for url in after.values())
+    assert abs(share / len(INSTANCE_IDS) - 1 / 3) < 0.02
+    moved = [iid for iid in INSTANCE_IDS if before[iid] != after[iid]]
+    assert all(before[iid] == "https://a.example.com" for iid in moved)
+
+
+def test_pool_overloaded_member_ranks_last():
+    pool = ["https://a.example.com", "https://b.example.com", "https://c.example.com"]
+    loads = {"https://a.example.com": 0.95, "https://b.example.com": None}
+    for iid in INSTANCE_IDS[:200]:
+        assert rank_pool(pool, iid, loads)[-1] == "https://a.example.com"
+
+
+def test_select_mirror_swaps_overloaded_primary(mirrors_file):
+    mirror_map = load_mirror_map(str(mirrors_file))
+    metadata = {"provider": "aws", "region": "us-east-2"}
+    primary, backup = select_mirror(metadata, mirror_map)
+
+    assert select_mirror(metadata, mirror_map, {primary: 1.0}) == (backup, primary)
+    # Both overloaded: nothing better to offer, keep the map order
+    assert select_mirror(metadata, mirror_map, {primary: 1.0, backup: 0.95}) == (
+        primary,
+        backup,
+    )
+    assert select_mirror(metadata, mirror_map, {primary: 0.5}) == (primary, backup)
+
+
+def test_candidate_urls_lists_pool_and_backup():
+    assert repo_config.candidate_urls(
+        {"provider": "aws", "region": "us-east-1"}, POOL_MAP
+    ) == [
+        "https://a.example.com",
+        "https://b.example.com",
+        "https://c.example.com",
+        "https://backup.example.com",
+    ]
+    assert repo_config.candidate_urls({"provider": "gcp", "region": "x"}, POOL_MAP) == [
+        "https://global",
+        "https://global-backup",
+    ]
+
+
+CLASS_MAP = {
+    "aws": {
+        "us-east-1": {
+            "primary": "https://use1",
+            "backup": "https://use2",
+            "classes": {
+                "bulk": {"pool": ["https://bulk-a", "https://bulk-b"]},
+                "meta": {"backup": "https://meta-backup"},
+            },
+        },
+        "us-west-2": {"primary": "https://usw2", "backup": "https://use2"},
+    },
+    "default": {
+        "primary": "https://global",
+        "backup": "https://global-backup",
+        "classes": {
+            "bulk": {"policy": "throughput", "primary": "https://global-bulk"},
+            "meta": None,
+        },
+    },
+}
+
+
+def test_repo_classes_lists_policies():
+    assert repo_config.repo_classes(CLASS_MAP) == {
+        "bulk": "throughput",
+        "meta": "latency",
+    }
+    assert repo_config.repo_classes(POOL_MAP) == {}
+
+
+@pytest.mark.parametrize(
+    "classes",
+    [{"bad-name": {}}, {"bulk": {"policy": "cheapest"}}],
+)
+def test_repo_classes_rejects_invalid(classes):
+    mirror_map = {"default": {"primary": "a", "backup": "b", "classes": classes}}
+    with pytest.raises(ValueError):
+        repo_config.repo_classes(mirror_map)
+
+
+def test_main_policy():
+    assert repo_config.main_policy(POOL_MAP) == "latency"
+    assert repo_config.main_policy({"default": {"policy": "throughput"}}) == (
+        "throughput"
+    )
+    with pytest.raises(ValueError):
+        repo_config.main_policy({"default": {"policy": "cheapest"}})
+
+
+def test_class_map_overlays_entries():
+    east = {"provider": "aws", "region": "us-east-1", "instance_id": "i-1"}
+    west = {"provider": "aws", "region": "us-west-2", "instance_id": "i-1"}
+    other = {"provider": "gcp", "region": "x", "instance_id": "i-1"}
+
+    bulk = repo_config.class_map(CLASS_MAP, "bulk")
+    primary, backup = select_mirror(east, bulk)
+    assert primary in ("https://bulk-a", "https://bulk-b")
+    assert backup == "https://use2"
+    # Entries without a section serve the class from their regular mirrors
+    assert select_mirror(west, bulk) == ("https://usw2", "https://use2")
+    assert select_mirror(other, bulk) == (
+        "https://global-bulk",
+        "https://global-backup",
+    )
+
+    meta = repo_config.class_map(CLASS_MAP, "meta")
+    assert select_mirror(east, meta) == ("https://use1", "https://meta-backup")
+    assert "classes" not in meta["default"]
@@ -0,0 +1,279 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+import yaml
+
+from rlc.cloud_repos import resolver_daemon
+from rlc.cloud_repos.main import parse_args
+
+MIRROR_MAP = {
+    "aws": {
+        "us-east-1": {
+            "primary": "https://use1.example",
+            "backup": "https://use2.example",
+        }
+    },
+    "gcp": {"us-central1": {"primary": "https://gcp.example", "backup": ""}},
+    "default": {"primary": "https://default.example", "backup": ""},
+}
+
+
+@pytest.fixture
+def resolver(tmp_path, monkeypatch):
+    """Starts a resolver daemon on a short socket path; yields (state, socket)."""
+    detections = []
+
+    def fake_detect():
+        detections.append(1)
+        return {"provider": "aws", "region": "us-east-1", "instance_id": "i-1"}
+
+    monkeypatch.setattr(resolver_daemon, "detect_metadata", fake_detect)
+    map_path = tmp_path / "mirrors.yaml"
+    map_path.write_text(yaml.safe_dump(MIRROR_MAP))
+
+    # Unix socket paths are limited to ~108 bytes, tmp_path can be longer
+    socket_dir = tempfile.mkdtemp(prefix="rlc-")
+    socket_path = os.path.join(socket_dir, "resolver.sock")
+    state = resolver_daemon.ResolverState(str(map_path), parse_args([]))
+    state.reload()
+    state.detections = detections
+    server = resolver_daemon.ResolverServer(socket_path, state)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    yield state, socket_path
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(socket_dir)
+
+
+def test_resolves_for_host(resolver):
+    state, socket_path = resolver
+    response = resolver_daemon.query({"op": "resolve"}, socket_path)
+    assert response == {
+        "ok": True,
+        "baseurl1": "https://use1.example",
+        "baseurl2": "https://use2.example",
+        "provider": "aws",
+        "region": "us-east-1",
+        "classes": {},
+    }
+    assert oct(os.stat(socket_path).st_mode & 0o777) == oct(0o666)
+
+
+def test_resolves_overrides(resolver):
+    _, socket_path = resolver
+    response = resolver_daemon.query(
+        {"op": "resolve", "provider": "gcp", "region": "us-central1"}, socket_path
+    )
+    assert response["baseurl1"] == "https://gcp.example"
+    assert response["provider"] == "gcp"
+
+
+def test_metadata_detected_once(resolver):
+    state, socket_path = resolver
+    for _ in range(5):
+        resolver_daemon.query({"op": "resolve"}, socket_path)
+    assert len(state.detections) == 1
+    status = resolver_daemon.query({"op": "status"}, socket_path)
+    assert status["cached_resolutions"] == 1
+    assert status["metadata"]["provider"] == "aws"
+
+
+def test_metadata_detected_before_serving(resolver):
+    state, socket_path = resolver
+    assert len(state.detections) == 1
+    assert state.metadata["region"] == "us-east-1"
+
+
+def test_daemon_does_not_listen_without_metadata(tmp_path, monkeypatch):
+    def failing_detect():
+        raise RuntimeError("cloud-init timed out")
+
+    monkeypatch.setattr(resolver_daemon, "detect_metadata", failing_detect)
+    map_path = tmp_path / "mirrors.yaml"
+    map_path.write_text(yaml.safe_dump(MIRROR_MAP))
+    socket_path = tmp_path / "resolver.sock"
+    args = ["--mirror-file", str(map_path), "--socket", str(socket_path)]
+    assert resolver_daemon.daemon_main(args) == 1
+    assert not socket_path.exists()
+
+
+def test_reloads_when_map_changes(resolver):
+    state, socket_path = resolver
+    resolver_daemon.query({"op": "resolve"}, socket_path)
+
+    updated = dict(MIRROR_MAP)
+    updated["aws"] = {
+        "us-east-1": {"primary": "https://new.example", "backup": "https://b.example"}
+    }
+    with open(state.mirror_path, "w") as f:
+        yaml.safe_dump(updated, f)
+    # Make sure the signature changes even on coarse mtime filesystems
+    stat = os.stat(state.mirror_path)
+    os.utime(state.mirror_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    response = resolver_daemon.query({"op": "resolve"}, socket_path)
+    assert response["baseurl1"] == "https://new.example"
+
+
+def test_reload_op_redetects_metadata(resolver):
+    state, socket_path = resolver
+    resolver_daemon.query({"op": "resolve"}, socket_path)
+    assert resolver_daemon.query({"op": "reload"}, socket_path) == {"ok": True}
+    resolver_daemon.query({"op": "resolve"}, socket_path)
+    assert len(state.detections) == 2
+
+
+def test_unknown_op(resolver):
+    _, socket_path = resolver
+    response = resolver_daemon.query({"op": "bogus"}, socket_path)
+    assert response["ok"] is False
+    assert "bogus" in response["error"]
+
+
+def test_client_prints_vars(resolver, capsys):
+    _, socket_path = resolver
+    assert resolver_daemon.client_main(["--socket", socket_path]) == 0
+    out = capsys.readouterr().out
+    assert "baseurl1=https://use1.example" in out
+    assert "baseurl2=https://use2.example" in out
+
+
+def test_client_writes_vars(resolver, tmp_path):
+    _, socket_path = resolver
+    vars_dir = tmp_path / "vars"
+    vars_dir.mkdir()
+    assert (
+        resolver_daemon.client_main(
+            ["--socket", socket_path, "--write-vars", str(vars_dir)]
+        )
+        == 0
+    )
+    assert (vars_dir / "baseurl1").read_text().strip() == "https://use1.example"
+    assert (vars_dir / "baseurl2").read_text().strip() == "https://use2.example"
+
+
+def test_client_handles_repo_classes(resolver, tmp_path, capsys):
+    state, socket_path = resolver
+    mirror_map = dict(MIRROR_MAP)
+    mirror_map["default"] = dict(
+        MIRROR_MAP["default"],
+        classes={"bulk": {"policy": "throughput", "primary": "https://bulk.example"}},
+    )
+    with open(state.mirror_path, "w") as f:
+        yaml.safe_dump(mirror_map, f)
+    state.reload()
+
+    assert resolver_daemon.client_main(["--socket", socket_path]) == 0
+    out = capsys.readouterr().out
+    # Regions without a bulk section use their regular mirrors
+    assert "bulk_baseurl1=https://use1.example" in out
+
+    response = resolver_daemon.query(
+        {"op": "resolve", "provider": "gcp", "region": "elsewhere"}, socket_path
+    )
+    assert response["classes"] == {
+        "bulk": {"baseurl1": "https://bulk.example", "baseurl2": ""}
+    }
+
+    vars_dir = tmp_path / "vars"
+    vars_dir.mkdir()
+    assert (
+        resolver_daemon.client_main(
+            ["--socket", socket_path, "--write-vars", str(vars_dir)]
+        )
+        == 0
+    )
+    assert (vars_dir / "bulk_baseurl1").read_text().strip() == "https://use1.example"
+
+
+def test_client_fails_without_daemon(tmp_path, capsys):
+    missing = str(tmp_path / "missing.sock")
+    assert resolver_daemon.client_main(["--socket", missing]) == 1
+    assert "unavailable" in capsys.readouterr().err
+
+
+def test_cached_queries_are_fast(resolver):
+    _, socket_path = resolver
+    resolver_daemon.query({"op": "resolve"}, socket_path)
+    count = 200
+    start = time.monotonic()
+    for _ in range(count):
+        resolver_daemon.query({"op": "resolve"}, socket_path)
+    # Generous bound for CI; a cached answer is typically well under 1ms
+    assert (time.monotonic() - start) / count < 0.005
+
+
+def _probing_state(tmp_path, monkeypatch, ttl, probe):
+    monkeypatch.setattr(
+        resolver_daemon,
+        "detect_metadata",
+        lambda: {"provider": "aws", "region": "us-east-1", "instance_id": "i-1"},
+    )
+    monkeypatch.setattr("rlc.cloud_repos.main.probe_mirrors", probe)
+    map_path = tmp_path / "mirrors.yaml"
+    map_path.write_text(yaml.safe_dump(MIRROR_MAP))
+    state = resolver_daemon.ResolverState(
+        str(map_path), parse_args(["--probe", "--private-timeout", "0"]), ttl
+    )
+    state.reload()
+    return state
+
+
+def test_probed_answers_expire(tmp_path, monkeypatch):
+    dead = set()
+    state = _probing_state(
+        tmp_path,
+        monkeypatch,
+        0.2,
+        lambda urls, timeout: {url: None if url in dead else 0.01 for url in urls},
+    )
+    assert state.resolve({})["baseurl1"] == "https://use1.example"
+
+    dead.add("https://use1.example")
+    assert state.resolve({})["baseurl1"] == "https://use1.example"
+    time.sleep(0.3)
+    assert state.resolve({})["baseurl1"] == "https://use2.example"
+
+
+def test_probing_does_not_block_other_clients(tmp_path, monkeypatch):
+    def probe(urls, timeout):
+        if "https://use1.example" in urls:
+            time.sleep(1)
+        return {url: 0.01 for url in urls}
+
+    state = _probing_state(tmp_path, monkeypatch, 60, probe)
+    slow = threading.Thread(target=state.resolve, args=({},))
+    slow.start()
+    time.sleep(0.1)
+    start = time.monotonic()
+    # Overridden metadata isn't probed, and must not wait for the host's probe
+    response = state.resolve({"provider": "gcp", "region": "us-central1"})
+    assert time.monotonic() - start < 0.5
+    assert response["baseurl1"] == "https://gcp.example"
+    slow.join()
+
+
+def test_reload_requires_root(resolver, monkeypatch):
+    state, socket_path = resolver
+    monkeypatch.setattr(resolver_daemon, "peer_uid", lambda sock: 4242)
+    monkeypatch.setattr(resolver_daemon.os, "geteuid", lambda: 0)
+    resolver_daemon.query({"op": "resolve"}, socket_path)
+    response = resolver_daemon.query({"op": "reload"}, socket_path)
+    assert response == {"ok": False, "error": "reload requires root"}
+    resolver_daemon.query({"op": "resolve"}, socket_path)
+    assert len(state.detections) == 1
+
+
+def test_peer_uid_of_local_client(resolver):
+    _, socket_path = resolver
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        assert resolver_daemon.peer_uid(client) == os.geteuid()
@@ -0,0 +1,78 @@
+import json
+
+from rlc.cloud_repos.main import main
+from rlc.cloud_repos.run_report import RunReport
+
+
+def _read(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def _metadata(monkeypatch, provider, region):
+    monkeypatch.setattr(
+        "rlc.cloud_repos.main.get_cloud_metadata",
+        lambda: {"provider": provider, "region": region, "instance_id": "i-1"},
+    )
+
+
+def test_report_phases():
+    report = RunReport()
+    with report.phase("detect"):
+        pass
+    report.fallbacks.append("region_unknown")
+    record = report.as_dict()
+    assert set(record["phases"]) == {"detect"}
+    assert record["total"] >= record["phases"]["detect"]
+    assert record["fallbacks"] == ["region_unknown"]
+    assert record["ok"] is False
+
+
+def test_main_appends_report(monkeypatch, tmp_path, dnf_vars_dir, marker, mirrors_file):
+    _metadata(monkeypatch, "aws", "us-east-2")
+    report_path = tmp_path / "runs.jsonl"
+    for _ in range(2):
+        assert main(["--force", "--report", str(report_path)]) == 0
+
+    records = _read(report_path)
+    assert len(records) == 2
+    record = records[0]
+    assert record["ok"] is True
+    assert (record["provider"], record["region"]) == ("aws", "us-east-2")
+    assert record["mirror"] == (dnf_vars_dir / "baseurl1").read_text().strip()
+    assert set(record["phases"]) == {"detect", "load_map", "resolve", "write"}
+    assert record["fallbacks"] == []
+
+
+def test_report_flags_fallbacks(
+    monkeypatch, tmp_path, dnf_vars_dir, marker, mirrors_file
+):
+    report_path = tmp_path / "runs.jsonl"
+    _metadata(monkeypatch, "aws", "")
+    assert main(["--force", "--report", str(report_path)]) == 0
+    _metadata(monkeypatch, "nimbus", "x-1")
+    assert main(["--force", "--report", str(report_path)]) == 0
+
+    first, second = _read(report_path)
+    assert first["fallbacks"] == ["region_unknown", "region_default"]
+    assert second["fallbacks"] == ["provider_default"]
+
+
+def test_report_records_failure(monkeypatch, tmp_path, dnf_vars_dir, marker):
+    _metadata(monkeypatch, "aws", "us-east-2")
+    report_path = tmp_path / "runs.jsonl"
+    assert (
+        main(["--force", "--mirror-file", "missing.yaml", "--report", str(report_path)])
+        == 1
+    )
+    (record,) = _read(report_path)
+    assert record["ok"] is False
+    assert "missing.yaml" in record["error"]
+    assert set(record["phases"]) == {"detect", "load_map"}
+
+
+def test_unwritable_report_does_not_fail_run(
+    monkeypatch, tmp_path, dnf_vars_dir, marker, mirrors_file
+):
+    _metadata(monkeypatch, "aws", "us-east-2")
+    report_path = tmp_path / "missing-dir" / "runs.jsonl"
+    assert main(["--force", "--report", str(report_path)]) == 0
@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+
+import pytest
+import yaml
+
+from rlc.cloud_repos.main import main
+from rlc.cloud_repos.single_flight import SingleFlight
+
+
+def _hold_lock(ready, release, complete):
+    with SingleFlight(key="k1") as flight:
+        ready.set()
+        release.wait(5)
+        if complete:
+            flight.complete()
+
+
+def _start_leader(complete=True):
+    ready, release = threading.Event(), threading.Event()
+    thread = threading.Thread(target=_hold_lock, args=(ready, release, complete))
+    thread.start()
+    assert ready.wait(5)
+    return thread, release
+
+
+def test_sequential_runs_each_lead(flight_lock):
+    for _ in range(2):
+        with SingleFlight(key="k1") as flight:
+            assert flight.locked
+            assert not flight.shared
+            flight.complete()
+    assert flight_lock.read_text().strip() == "2 k1"
+
+
+def test_waiter_reuses_concurrent_result():
+    leader, release = _start_leader()
+    threading.Timer(0.2, release.set).start()
+
+    start = time.monotonic()
+    with SingleFlight(key="k1") as flight:
+        assert time.monotonic() - start >= 0.15
+        assert flight.locked
+        assert flight.shared
+    leader.join()
+
+
+def test_waiter_with_other_arguments_resolves_itself():
+    leader, release = _start_leader()
+    threading.Timer(0.2, release.set).start()
+
+    with SingleFlight(key="k2") as flight:
+        assert flight.locked
+        assert not flight.shared
+    leader.join()
+
+
+def test_waiter_takes_over_after_failed_run():
+    leader, release = _start_leader(complete=False)
+    threading.Timer(0.2, release.set).start()
+
+    with SingleFlight(key="k1") as flight:
+        assert flight.locked
+        assert not flight.shared
+    leader.join()
+
+
+def test_waiter_gives_up_after_timeout():
+    leader, release = _start_leader()
+    try:
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            with SingleFlight(timeout=0.2, key="k1"):
+                raise AssertionError("ran alongside the lock holder")
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+        leader.join()
+
+
+def test_run_timing_out_on_the_lock_fails(monkeypatch, dnf_vars_dir, marker):
+    monkeypatch.setattr("rlc.cloud_repos.single_flight.DEFAULT_LOCK_TIMEOUT", 0.2)
+    leader, release = _start_leader()
+    try:
+        assert main(["--force"]) == 1
+        assert not list(dnf_vars_dir.iterdir())
+    finally:
+        release.set()
+        leader.join()
+
+
+def test_parallel_invocations_share_one_resolution(fault_lab, tmp_path):
+    """Many simultaneous runs query cloud-init once and agree on the vars."""
+    fault_lab.cloud_init.set("region", "us-east-1", delay=0.5)
+    map_path = tmp_path / "stress-mirrors.yaml"
+    map_path.write_text(
+        yaml.safe_dump(
+            {
+                "aws": {
+                    "us-east-1": {
+                        "primary": "https://primary.example",
+                        "backup": "https://backup.example",
+                    }
+                },
+                "default": {"primary": "https://default.example", "backup": ""},
+            }
+        )
+    )
+
+    pids = []
+    for _ in range(16):
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - child
+            code = 1
+            try:
+                code = main(["--force", "--mirror-file", str(map_path)])
+            finally:
+                os._exit(code)
+        pids.append(pid)
+    exit_codes = [os.WEXITSTATUS(os.waitpid(pid, 0)[1]) for pid in pids]
+
+    assert exit_codes == [0] * len(pids)
+    # One resolution: cloud_name and region were each queried once
+    assert sorted(fault_lab.cloud_init.calls) == [
+        "query cloud_name",
+        "query region",
+    ]
+    assert sorted(p.name for p in fault_lab.dnf_vars_dir.iterdir()) == [
+        "baseurl1",
+        "baseurl2",
+    ]
+    assert (fault_lab.dnf_vars_dir / "baseurl1").read_text() == (
+        "https://primary.example\n"
+    )
+    assert (fault_lab.dnf_vars_dir / "baseurl2").read_text() == (
+        "https://backup.example\n"
+    )
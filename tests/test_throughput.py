@@ -0,0 +1,170 @@
+import time
+
+import pytest
+
+from rlc.cloud_repos import freshness, throughput, url_utils
+
+REPO_PATH = "/" + url_utils.expand_release_vars(url_utils.DEFAULT_REPO_PATH)
+OBJECT_PATH = REPO_PATH + "/repodata/filelists.xml.gz"
+BODY = b"x" * (1024 * 1024)
+REPOMD = b"""<repomd xmlns="http://linux.duke.edu/metadata/repo">
+  <data type="primary">
+    <location href="repodata/primary.xml.gz"/><size>4096</size>
+  </data>
+  <data type="filelists">
+    <location href="repodata/filelists.xml.gz"/><size>1048576</size>
+  </data>
+</repomd>"""
+
+
+def _serving(fault_lab, **faults):
+    mirror = fault_lab.mirror()
+    mirror.responses[REPO_PATH + "/repodata/repomd.xml"] = {"body": REPOMD}
+    mirror.responses[OBJECT_PATH] = dict(faults, body=faults.get("body", BODY))
+    return mirror
+
+
+def test_faster_mirror_measures_higher(fault_lab):
+    fast = _serving(fault_lab, rate=4 * 1024 * 1024)
+    slow = _serving(fault_lab, rate=400 * 1024)
+
+    start = time.monotonic()
+    results = throughput.probe_throughput(
+        [slow.url, fast.url], timeout=1.0, byte_budget=2 * len(BODY)
+    )
+    assert time.monotonic() - start < 1.5
+    assert results[fast.url] > 2 * results[slow.url]
+    assert throughput.rank_by_throughput([slow.url, fast.url], results) == [
+        fast.url,
+        slow.url,
+    ]
+
+
+def test_byte_budget_is_split_between_mirrors(fault_lab):
+    mirrors = [_serving(fault_lab) for _ in range(2)]
+    results = throughput.probe_throughput(
+        [mirror.url for mirror in mirrors], timeout=1.0, byte_budget=512 * 1024
+    )
+    assert all(rate is not None for rate in results.values())
+    for mirror in mirrors:
+        method, path, headers = mirror.requests[-1]
+        assert (method, path) == ("GET", OBJECT_PATH)
+        assert headers["Range"] == f"bytes=0-{256 * 1024 - 1}"
+
+
+@pytest.mark.parametrize(
+    "fault",
+    [{"status": 404}, {"body": b"tiny"}, {"hang": True}],
+    ids=["missing", "too-small", "hang"],
+)
+def test_unmeasurable_mirrors(fault_lab, fault):
+    mirror = _serving(fault_lab, **fault)
+    start = time.monotonic()
+    assert throughput.probe_throughput([mirror.url], timeout=0.5) == {mirror.url: None}
+    assert time.monotonic() - start < 1.5
+
+
+def test_object_is_picked_from_repomd(fault_lab):
+    mirror = _serving(fault_lab)
+    repomd_path = freshness.DEFAULT_REPOMD_PATH
+    deadline = time.monotonic() + 1.0
+    assert throughput.object_url(mirror.url, "", repomd_path, deadline) == (
+        mirror.url + OBJECT_PATH
+    )
+    assert [path for _, path, _ in mirror.requests] == [
+        REPO_PATH + "/repodata/repomd.xml"
+    ]
+
+    del mirror.responses[REPO_PATH + "/repodata/repomd.xml"]
+    assert throughput.object_url(mirror.url, "", repomd_path, deadline) is None
+
+
+def test_explicit_path_skips_repomd(fault_lab):
+    mirror = fault_lab.mirror()
+    mirror.responses["/images/big.img"] = {"body": BODY}
+    results = throughput.probe_throughput(
+        [mirror.url], path="images/big.img", timeout=1.0
+    )
+    assert results[mirror.url] is not None
+    assert [path for _, path, _ in mirror.requests] == ["/images/big.img"]
+
+
+def test_zero_budget_disables_probe():
+    assert throughput.probe_throughput(["http://127.0.0.1:9"], timeout=0) == {}
+
+
+def test_rank_keeps_unmeasured_order():
+    results = {"a": None, "b": 10.0, "c": None, "d": 20.0}
+    assert throughput.rank_by_throughput(["a", "b", "c", "d"], results) == [
+        "d",
+        "b",
+        "a",
+        "c",
+    ]
+
+
+def test_throughput_classes_rank_by_throughput(fault_lab):
+    main_primary = fault_lab.mirror()
+    main_backup = fault_lab.mirror()
+    slow = _serving(fault_lab, rate=400 * 1024)
+    fast = _serving(fault_lab, rate=4 * 1024 * 1024)
+    fault_lab.map_region("aws", "us-east-1", main_primary.url, main_backup.url)
+    fault_lab.mirror_map["aws"]["us-east-1"]["classes"] = {
+        "bulk": {"primary": slow.url, "backup": fast.url}
+    }
+    fault_lab.mirror_map["default"] = {
+        "primary": main_primary.url,
+        "backup": main_backup.url,
+        "classes": {"bulk": {"policy": "throughput"}},
+    }
+
+    run = fault_lab.run("--throughput", "--throughput-timeout", "1")
+    assert run.exit_code == 0
+    assert run.dnf_vars["bulk_baseurl1"] == fast.url
+    assert run.dnf_vars["bulk_baseurl2"] == slow.url
+    # The main set keeps the latency policy and isn't downloaded from
+    assert run.dnf_vars["baseurl1"] == main_primary.url
+    assert not main_primary.requests and not main_backup.requests
+
+
+def test_main_set_ranks_by_throughput_with_its_policy(fault_lab):
+    slow = _serving(fault_lab, rate=400 * 1024)
+    fast = _serving(fault_lab, rate=4 * 1024 * 1024)
+    fault_lab.map_region("aws", "us-east-1", slow.url, fast.url)
+    fault_lab.mirror_map["default"] = {
+        "primary": slow.url,
+        "backup": fast.url,
+        "policy": "throughput",
+    }
+
+    run = fault_lab.run("--throughput", "--throughput-timeout", "1")
+    assert run.exit_code == 0
+    assert run.dnf_vars["baseurl1"] == fast.url
+    assert run.dnf_vars["baseurl2"] == slow.url
+
+
+def test_depot_root_mirrors_are_measured_by_default(fault_lab, capsys):
+    """Mirrors are depot roots, as in the shipped map, with no repodata/."""
+    slow = _serving(fault_lab, rate=400 * 1024)
+    fast = _serving(fault_lab, rate=4 * 1024 * 1024)
+    fault_lab.map_region("aws", "us-east-1", slow.url, fast.url)
+    fault_lab.mirror_map["default"] = {
+        "primary": slow.url,
+        "backup": fast.url,
+        "policy": "throughput",
+    }
+
+    run = fault_lab.run("--throughput", "--throughput-timeout", "1")
+    assert run.dnf_vars["baseurl1"] == fast.url
+    assert (
+        "GET",
+        REPO_PATH + "/repodata/repomd.xml",
+    ) in [(method, path) for method, path, _ in fast.requests]
+    assert "could be measured" not in capsys.readouterr().out
+
+    # Without a repository there, the fallback is reported
+    for mirror in (slow, fast):
+        mirror.responses.clear()
+    run = fault_lab.run("--throughput", "--throughput-timeout", "0.5")
+    assert run.dnf_vars["baseurl1"] == slow.url
+    assert "could be measured" in capsys.readouterr().out
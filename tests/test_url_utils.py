@@ -0,0 +1,16 @@
+from rlc.cloud_repos import url_utils
+
+
+def test_mirror_object_url_expands_release_vars(tmp_path, monkeypatch):
+    os_release = tmp_path / "os-release"
+    os_release.write_text('NAME="Rocky Linux"\nVERSION_ID="9.4"\n')
+    monkeypatch.setattr(url_utils, "OS_RELEASE_PATH", str(os_release))
+    monkeypatch.setattr(url_utils.platform, "machine", lambda: "aarch64")
+    assert url_utils.mirror_object_url(
+        "https://depot.example/", "$releasever/BaseOS/$basearch/os/repodata/repomd.xml"
+    ) == ("https://depot.example/9/BaseOS/aarch64/os/repodata/repomd.xml")
+
+
+def test_missing_os_release(tmp_path, monkeypatch):
+    monkeypatch.setattr(url_utils, "OS_RELEASE_PATH", str(tmp_path / "missing"))
+    assert url_utils.release_vars()["$releasever"] == ""